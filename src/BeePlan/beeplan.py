@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+BeePlan - Command-line scheduling
+Reads a data file in the example_data.json format, generates the schedule
+through ScheduleController and writes it as JSON or CSV, without the GUI
+(PyQt5 is never imported). With --check it instead validates a schedule
+written earlier (and possibly edited) and lists its violations. The exit
+status tells batch jobs what happened: 0 complete (or valid) schedule, 1 no
+schedule found, 2 invalid input, 3 partial schedule (a budget ran out),
+4 the checked schedule breaks hard constraints.
+
+Usage:
+    python beeplan.py example_data.json -o schedule.json
+    python beeplan.py example_data.json --format csv --engine local-search --time-limit 60
+    python beeplan.py example_data.json --check schedule.json
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from collections import defaultdict
+
+from controller import ScheduleController
+from loader import DatasetError, load_dataset
+from scheduler import ScheduleCancelled, TimeGrid
+
+EXIT_OK = 0
+EXIT_NO_SCHEDULE = 1
+EXIT_INPUT_ERROR = 2
+EXIT_PARTIAL = 3
+EXIT_VIOLATIONS = 4
+
+ENGINES = ("backtracking", "portfolio", "decomposed", "local-search", "optimize")
+
+CSV_COLUMNS = ["day", "hour", "course", "name", "instructor", "type", "room"]
+VIOLATION_COLUMNS = ["kind", "courses", "day", "hour", "room", "instructor", "hours", "limit"]
+
+
+def schedule_rows(schedule):
+    """One row per course and hour, ordered by day (as first listed), hour and course code."""
+    day_order = {}
+    for day, _ in schedule.keys():
+        day_order.setdefault(day, len(day_order))
+    rows = []
+    for (day, hour), entries in schedule.items():
+        for course, room in entries:
+            rows.append({
+                "day": day,
+                "hour": hour,
+                "course": course.code,
+                "name": course.name,
+                "instructor": course.instructor,
+                "type": course.course_type,
+                "room": room.name if room is not None else "",
+            })
+    rows.sort(key=lambda row: (day_order[row["day"]], TimeGrid.to_minutes(row["hour"]), row["course"]))
+    return rows
+
+
+def format_schedule(schedule, output_format):
+    """The schedule as a JSON or CSV document."""
+    rows = schedule_rows(schedule)
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue()
+    document = {
+        "schedule": rows,
+        "unplaced": [course.code for course in getattr(schedule, "unplaced", [])],
+    }
+    return json.dumps(document, indent=2, ensure_ascii=False) + "\n"
+
+
+def read_schedule(path, courses, rooms):
+    """(day, hour) schedule from a JSON or CSV file in the format this command writes.
+
+    Raises:
+        DatasetError: If the file cannot be read or names unknown courses or rooms.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            if path.lower().endswith(".csv"):
+                rows = list(csv.DictReader(file))
+            else:
+                rows = json.load(file)["schedule"]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise DatasetError([f"not a schedule file: {e}"], path) from e
+
+    courses_by_code = {}
+    for course in courses:
+        courses_by_code.setdefault(course.code, course)
+    rooms_by_name = {room.name: room for room in rooms}
+    schedule = defaultdict(list)
+    errors = []
+    for i, row in enumerate(rows):
+        try:
+            code, room_name, slot = row["course"], row["room"], (row["day"], row["hour"])
+        except (KeyError, TypeError):
+            errors.append(f"schedule[{i}]: expected day, hour, course and room")
+            continue
+        course, room = courses_by_code.get(code), rooms_by_name.get(room_name)
+        if course is None:
+            errors.append(f"schedule[{i}].course: unknown course {code!r}")
+        if room is None:
+            errors.append(f"schedule[{i}].room: unknown room {room_name!r}")
+        if course is not None and room is not None:
+            schedule[slot].append((course, room))
+    if errors:
+        raise DatasetError(errors, path)
+    return dict(schedule)
+
+
+def format_violations(violations, output_format):
+    """Violation records as a JSON or CSV document."""
+    records = [violation.as_dict() for violation in violations]
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=VIOLATION_COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        for record in records:
+            writer.writerow(dict(record, courses=" ".join(record["courses"])))
+        return buffer.getvalue()
+    return json.dumps({"violations": records}, indent=2, ensure_ascii=False) + "\n"
+
+
+def write_document(document, output):
+    """Write document to output, or standard output if None; False if that fails."""
+    if not output:
+        sys.stdout.write(document)
+        return True
+    try:
+        with open(output, 'w', encoding='utf-8', newline='') as file:
+            file.write(document)
+    except OSError as e:
+        print(f"beeplan: cannot write {output}: {e}", file=sys.stderr)
+        return False
+    return True
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="beeplan",
+        description="Generate a BeePlan course schedule without the GUI.",
+    )
+    parser.add_argument("data", help="data file in the example_data.json format")
+    parser.add_argument("-o", "--output", help="output file (default: standard output)")
+    parser.add_argument("--check", metavar="SCHEDULE",
+                        help="validate this schedule (JSON or CSV, as written by beeplan) instead of generating one")
+    parser.add_argument("--format", choices=("json", "csv"), default=None,
+                        help="output format (default: from the output file extension, else json)")
+    parser.add_argument("--engine", choices=ENGINES, default="backtracking", help="scheduling engine")
+    parser.add_argument("--courses", nargs="+", metavar="CODE", help="only schedule these course codes")
+    parser.add_argument("--ordering", choices=("static", "mrv"), default="mrv",
+                        help="course ordering of the backtracking search")
+    parser.add_argument("--forward-checking", action=argparse.BooleanOptionalAction, default=True,
+                        help="prune the options of unplaced courses after every placement")
+    parser.add_argument("--backjumping", action="store_true", help="conflict-directed backjumping")
+    parser.add_argument("--nogood-limit", type=int, default=0, help="number of learned nogoods kept")
+    parser.add_argument("--two-phase", action=argparse.BooleanOptionalAction, default=False,
+                        help="search time slots first and match rooms afterwards")
+    parser.add_argument("--time-limit", type=float, help="wall-clock limit in seconds")
+    parser.add_argument("--node-limit", type=int,
+                        help="search node limit (backtracking, portfolio and decomposed engines)")
+    parser.add_argument("--workers", type=int, help="worker processes (portfolio, decomposed)")
+    parser.add_argument("--seed", type=int, help="random seed (local-search engine)")
+    parser.add_argument("--soft-electives", action="store_true",
+                        help="let CENG and SENG electives overlap (optimize engine, --check)")
+    parser.add_argument("--cache-dir", help="reuse and store schedules in this directory")
+    parser.add_argument("--stats", action="store_true",
+                        help="print search statistics to standard error (backtracking engine)")
+    return parser
+
+
+def solve(controller, args, courses):
+    """Run the engine chosen in args on courses."""
+    if args.engine == "portfolio":
+        return controller.generate_schedule_portfolio(courses, workers=args.workers, node_limit=args.node_limit,
+                                                      time_limit=args.time_limit)
+    if args.engine == "decomposed":
+        return controller.generate_schedule_decomposed(
+            courses, workers=args.workers, ordering=args.ordering,
+            forward_checking=args.forward_checking, backjumping=args.backjumping,
+            nogood_limit=args.nogood_limit, two_phase=args.two_phase,
+            node_limit=args.node_limit, time_limit=args.time_limit)
+    if args.engine == "local-search":
+        return controller.generate_schedule_local_search(courses, time_limit=args.time_limit, seed=args.seed)
+    if args.engine == "optimize":
+        time_limit = args.time_limit if args.time_limit is not None else 10.0
+        return controller.generate_schedule_optimized(courses, time_limit=time_limit,
+                                                      soft_electives=args.soft_electives)
+    return controller.generate_schedule(
+        courses, ordering=args.ordering, forward_checking=args.forward_checking,
+        backjumping=args.backjumping, nogood_limit=args.nogood_limit, two_phase=args.two_phase,
+        node_limit=args.node_limit, time_limit=args.time_limit, collect_stats=args.stats)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.node_limit is not None and args.engine in ("local-search", "optimize"):
+        parser.error(f"--node-limit does not apply to the {args.engine} engine")
+
+    try:
+        dataset = load_dataset(args.data)
+    except DatasetError as e:
+        print(f"beeplan: cannot load {args.data}:", file=sys.stderr)
+        for error in e.errors:
+            print(f"  {error}", file=sys.stderr)
+        return EXIT_INPUT_ERROR
+    courses = dataset.courses or []
+
+    controller = ScheduleController(cache_dir=args.cache_dir)
+    controller.set_courses(courses)
+    controller.set_instructors(dataset.instructors or [])
+    controller.set_rooms(dataset.rooms or [])
+    controller.set_time_slots(dataset.time_slots or [])
+    is_valid, error_msg = controller.validate_schedule_data()
+    if not is_valid:
+        print(f"beeplan: {error_msg}", file=sys.stderr)
+        return EXIT_INPUT_ERROR
+
+    output_format = args.format
+    if output_format is None:
+        output_format = "csv" if args.output and args.output.lower().endswith(".csv") else "json"
+
+    if args.check:
+        try:
+            schedule = read_schedule(args.check, courses, dataset.rooms or [])
+        except DatasetError as e:
+            print(f"beeplan: cannot load {args.check}:", file=sys.stderr)
+            for error in e.errors:
+                print(f"  {error}", file=sys.stderr)
+            return EXIT_INPUT_ERROR
+        violations = controller.validate_schedule(schedule, soft_electives=args.soft_electives)
+        if not write_document(format_violations(violations, output_format), args.output):
+            return EXIT_INPUT_ERROR
+        if violations:
+            print(f"beeplan: {len(violations)} violation(s) in {args.check}", file=sys.stderr)
+            return EXIT_VIOLATIONS
+        return EXIT_OK
+
+    if args.courses:
+        wanted = set(args.courses)
+        courses = [course for course in courses if course.code in wanted]
+        missing = wanted - {course.code for course in courses}
+        if missing:
+            print(f"beeplan: unknown course codes: {', '.join(sorted(missing))}", file=sys.stderr)
+            return EXIT_INPUT_ERROR
+
+    try:
+        schedule = solve(controller, args, courses)
+    except ValueError as e:
+        print(f"beeplan: {e}", file=sys.stderr)
+        return EXIT_INPUT_ERROR
+    except (RuntimeError, ScheduleCancelled) as e:
+        print(f"beeplan: {e}", file=sys.stderr)
+        if args.stats and controller.get_stats() is not None:
+            print(controller.get_stats().report(), file=sys.stderr)
+        return EXIT_NO_SCHEDULE
+    if args.stats and controller.get_stats() is not None:
+        print(controller.get_stats().report(), file=sys.stderr)
+
+    if not write_document(format_schedule(schedule, output_format), args.output):
+        return EXIT_INPUT_ERROR
+
+    unplaced = getattr(schedule, "unplaced", [])
+    if unplaced:
+        print(f"beeplan: partial schedule, {len(unplaced)} course(s) not placed: "
+              f"{', '.join(course.code for course in unplaced)}", file=sys.stderr)
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
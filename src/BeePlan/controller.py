@@ -3,23 +3,109 @@ BeePlan Controller - Mediator between GUI and Algorithm
 This layer connects the GUI with the scheduling algorithm.
 """
 
-from scheduler import generate_schedule, Course, Instructor, Room
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from local_search import local_search_schedule
+from optimizer import optimize_schedule
+from scheduler import (generate_schedule, Course, Instructor, Room, Schedule, ScheduleCancelled, SearchStats,
+                       Violation, assign_rooms, build_constraint_graph, connected_components, find_violations,
+                       schedule_blocks)
+from solution_cache import SolutionCache, canonical_key
 from typing import List, Dict, Tuple, Optional
 
 
+# Kinds of data change repair_schedule understands
+CHANGE_KINDS = ("courses", "instructors", "rooms")
+
+# Search configurations raced by generate_schedule_portfolio, cycled with
+# increasing seeds when there are more workers than entries. The first one
+# to report that no schedule exists ends the race, so every entry must be a
+# complete search (two-phase mode is, since assign_rooms is exact).
+PORTFOLIO_VARIANTS = [
+    {"ordering": "mrv", "forward_checking": True, "two_phase": True},
+    {"ordering": "mrv", "forward_checking": True, "backjumping": True, "nogood_limit": 1000},
+    {"ordering": "mrv", "forward_checking": True},
+    {"ordering": "static", "backjumping": True},
+    {"ordering": "mrv", "backjumping": True, "nogood_limit": 1000},
+]
+
+_portfolio_cancel = None  # multiprocessing.Event shared by the portfolio workers
+
+
+def _init_portfolio_worker(cancel_event):
+    global _portfolio_cancel
+    _portfolio_cancel = cancel_event
+
+
+def _solve_in_worker(courses, rooms, time_slots, instructors, options):
+    """Run generate_schedule in a worker process.
+
+    Returns (blocks, unplaced): the placed blocks as (course index, room
+    index, [(day, hour), ...]) so the parent can rebuild the schedule with
+    its own objects, and the indices of the courses left out when a budget
+    ran out. None if the search was cancelled, or False if it proved that no
+    schedule exists.
+    """
+    try:
+        schedule = generate_schedule(courses, rooms, time_slots, instructors,
+                                     cancel_token=_portfolio_cancel, **options)
+    except ScheduleCancelled:
+        return None
+    except RuntimeError:
+        return False
+    course_index = {id(course): i for i, course in enumerate(courses)}
+    room_index = {id(room): i for i, room in enumerate(rooms)}
+    blocks = [(course_index[id(course)], room_index[id(room)], slots)
+              for course, room, slots in schedule.placements]
+    return blocks, [course_index[id(course)] for course in schedule.unplaced]
+
+
+def _build_schedule(placements, unplaced=None) -> Schedule:
+    """Schedule from (course, room, [(day, hour), ...]) blocks."""
+    placements = list(placements)
+    schedule = defaultdict(list)
+    for course, room, slots in placements:
+        for slot in slots:
+            schedule[slot].append((course, room))
+    return Schedule(schedule, placements=placements, unplaced=unplaced)
+
+
+def portfolio_variants(count: int) -> List[Dict]:
+    """The first count portfolio configurations (seeded copies past the base list)."""
+    variants = []
+    for i in range(count):
+        options = dict(PORTFOLIO_VARIANTS[i % len(PORTFOLIO_VARIANTS)])
+        if i >= len(PORTFOLIO_VARIANTS):
+            options["seed"] = i
+        variants.append(options)
+    return variants
+
+
 class ScheduleController:
     """
     Controller class that mediates between GUI and scheduling algorithm.
     This ensures separation of concerns while allowing them to work together.
     """
     
-    def __init__(self):
-        """Initialize the controller."""
+    def __init__(self, cache_dir: Optional[str] = None, cache_entries: int = 128):
+        """
+        Initialize the controller.
+        
+        Args:
+            cache_dir: Optional directory for cached schedules (see
+                solution_cache.py); None disables caching.
+            cache_entries: Number of cached schedules kept.
+        """
         self.courses: List[Course] = []
         self.instructors: List[Instructor] = []
         self.rooms: List[Room] = []
         self.time_slots: List[Tuple[str, str]] = []
         self.schedule: Dict = {}
+        self.stats: Optional[SearchStats] = None
+        self.cache = SolutionCache(cache_dir, cache_entries) if cache_dir else None
     
     def set_courses(self, courses: List[Course]) -> None:
         """Set the courses for scheduling."""
@@ -37,19 +123,65 @@ class ScheduleController:
         """Set the time slots for scheduling."""
         self.time_slots = time_slots
     
-    def generate_schedule(self, courses: Optional[List[Course]] = None) -> Dict:
+    def set_cache_dir(self, cache_dir: Optional[str], cache_entries: int = 128) -> None:
+        """Cache schedules in cache_dir from now on; None disables caching."""
+        self.cache = SolutionCache(cache_dir, cache_entries) if cache_dir else None
+    
+    def _cache_lookup(self, courses: List[Course], mode: str, options: Dict):
+        """(cache key, cached schedule or None) for solving courses with mode and options."""
+        if self.cache is None:
+            return None, None
+        key = canonical_key(courses, self.rooms, self.instructors, self.time_slots,
+                            dict(options, mode=mode))
+        return key, self.cache.get(key, courses, self.rooms, self.time_slots, self.instructors,
+                                   soft_electives=options.get("soft_electives", False))
+    
+    def _cache_store(self, key: Optional[str], schedule: Dict) -> None:
+        # A partial schedule only reflects the budget it was found with
+        if key is not None and not getattr(schedule, "unplaced", None):
+            self.cache.put(key, schedule)
+    
+    def generate_schedule(self, courses: Optional[List[Course]] = None, ordering: str = "static",
+                          forward_checking: bool = False, backjumping: bool = False,
+                          nogood_limit: int = 0, two_phase: bool = False,
+                          node_limit: Optional[int] = None,
+                          time_limit: Optional[float] = None,
+                          collect_stats: bool = False, progress=None,
+                          cancel_token=None) -> Dict:
         """
         Generate schedule using the algorithm.
         
         Args:
             courses: Optional list of courses. If None, uses self.courses.
+            ordering: Course ordering of the search, "static" (priority order)
+                or "mrv" (fewest remaining options first).
+            forward_checking: Prune the options of unplaced courses after
+                every placement and backtrack as soon as one runs out.
+            backjumping: On a dead end, jump back to the most recent placement
+                that caused it instead of the previous course.
+            nogood_limit: Number of learned dead-end combinations to remember
+                (0 disables nogood learning).
+            two_phase: Search time slots only, keeping per-slot room counts,
+                and assign concrete rooms afterwards (see assign_rooms).
+            node_limit: Optional maximum number of search nodes.
+            time_limit: Optional wall-clock limit in seconds.
+            collect_stats: Instrument the search; the SearchStats are then
+                available from get_stats() (also after a failure). The cache
+                is bypassed, since a cached result has no search to measure.
+            progress: Optional callable(courses placed, total courses, nodes,
+                best depth), called periodically from the search.
+            cancel_token: Optional object with is_set() (e.g. threading.Event);
+                once set, the search raises ScheduleCancelled.
         
         Returns:
-            Dictionary mapping (day, hour) to list of (course, room) tuples
+            Dictionary mapping (day, hour) to list of (course, room) tuples.
+            If a budget runs out this is the best partial schedule, with
+            the courses left out in its unplaced attribute.
         
         Raises:
             ValueError: If required data is missing
             RuntimeError: If schedule cannot be generated
+            ScheduleCancelled: If cancel_token was set during the search
         """
         # Use provided courses or default to self.courses
         courses_to_schedule = courses if courses is not None else self.courses
@@ -62,23 +194,430 @@ class ScheduleController:
         if not self.time_slots:
             raise ValueError("No time slots provided for scheduling.")
         
+        options = {"ordering": ordering, "forward_checking": forward_checking, "backjumping": backjumping,
+                   "nogood_limit": nogood_limit, "two_phase": two_phase,
+                   "node_limit": node_limit, "time_limit": time_limit}
+        self.stats = SearchStats() if collect_stats else None
+        cache_key, schedule = None, None
+        if not collect_stats:
+            cache_key, schedule = self._cache_lookup(courses_to_schedule, "backtracking", options)
+        if schedule is not None:
+            self.schedule = schedule
+            return schedule
+        
         # Call the algorithm
         schedule = generate_schedule(
             courses_to_schedule,
             self.rooms,
             self.time_slots,
-            self.instructors
+            self.instructors,
+            ordering=ordering,
+            forward_checking=forward_checking,
+            backjumping=backjumping,
+            nogood_limit=nogood_limit,
+            two_phase=two_phase,
+            node_limit=node_limit,
+            time_limit=time_limit,
+            stats=self.stats,
+            progress=progress,
+            cancel_token=cancel_token
         )
         
         # Store the schedule
         self.schedule = schedule
+        self._cache_store(cache_key, schedule)
         
         return schedule
     
+    def repair_schedule(self, previous_schedule: Dict, changes: Dict[str, List[str]],
+                        courses: Optional[List[Course]] = None, ordering: str = "mrv",
+                        forward_checking: bool = True, backjumping: bool = False,
+                        nogood_limit: int = 0, two_phase: bool = False) -> Dict:
+        """
+        Re-solve only the part of a schedule disturbed by a data change.
+        
+        The controller must already hold the new courses, instructors and
+        rooms; changes names what was edited, e.g. {"instructors": ["A. B."],
+        "rooms": ["Lab1"], "courses": ["SENG101"]} (course codes, instructor
+        and room names). The courses concerned - edited, taught by an edited
+        instructor, placed in an edited or removed room, or without their
+        blocks in previous_schedule - are placed anew and every other block
+        stays where it was. If no such schedule exists, the courses sharing
+        a constraint with the disturbed ones are freed as well, one ring at
+        a time, ending with a full re-solve.
+        
+        Args:
+            previous_schedule: Schedule (or (day, hour) dict) to repair.
+            changes: {"courses" | "instructors" | "rooms": [names]}.
+            courses: Optional list of courses. If None, uses self.courses.
+            ordering, forward_checking, backjumping, nogood_limit, two_phase:
+                Search options, as for generate_schedule.
+        
+        Returns:
+            Dictionary mapping (day, hour) to list of (course, room) tuples
+        
+        Raises:
+            ValueError: If required data is missing or a change kind is unknown
+            RuntimeError: If schedule cannot be generated even from scratch
+        """
+        courses_to_schedule = courses if courses is not None else self.courses
+        
+        if not courses_to_schedule:
+            raise ValueError("No courses provided for scheduling.")
+        if not self.rooms:
+            raise ValueError("No rooms provided for scheduling.")
+        if not self.time_slots:
+            raise ValueError("No time slots provided for scheduling.")
+        unknown = set(changes) - set(CHANGE_KINDS)
+        if unknown:
+            raise ValueError(f"Unknown change kinds: {sorted(unknown)} (expected {list(CHANGE_KINDS)}).")
+        
+        changed_courses = set(changes.get("courses", ()))
+        changed_instructors = set(changes.get("instructors", ()))
+        changed_rooms = set(changes.get("rooms", ()))
+        room_names = {room.name for room in self.rooms}
+        previous_blocks = defaultdict(list)  # course_id -> blocks
+        for block in schedule_blocks(previous_schedule):
+            previous_blocks[block[0].course_id].append(block)
+        
+        disturbed = set()
+        for i, course in enumerate(courses_to_schedule):
+            blocks = previous_blocks.get(course.course_id, [])
+            if (course.code in changed_courses or course.instructor in changed_instructors or
+                    len(blocks) != course.sections or
+                    any(room.name in changed_rooms or room.name not in room_names for _, room, _ in blocks)):
+                disturbed.add(i)
+        
+        neighbours = build_constraint_graph(courses_to_schedule)
+        while True:
+            keep = [block for i, course in enumerate(courses_to_schedule) if i not in disturbed
+                    for block in previous_blocks.get(course.course_id, [])]
+            try:
+                self.schedule = generate_schedule(
+                    courses_to_schedule,
+                    self.rooms,
+                    self.time_slots,
+                    self.instructors,
+                    ordering=ordering,
+                    forward_checking=forward_checking,
+                    backjumping=backjumping,
+                    nogood_limit=nogood_limit,
+                    two_phase=two_phase,
+                    keep=keep
+                )
+                return self.schedule
+            except RuntimeError:
+                if not keep:
+                    raise
+            # Widen the neighbourhood; once it stops growing, free everything
+            widened = disturbed.union(*(neighbours[i] for i in disturbed))
+            disturbed = widened if widened != disturbed else set(range(len(courses_to_schedule)))
+    
+    def generate_schedule_portfolio(self, courses: Optional[List[Course]] = None,
+                                    workers: Optional[int] = None,
+                                    variants: Optional[List[Dict]] = None,
+                                    node_limit: Optional[int] = None,
+                                    time_limit: Optional[float] = None) -> Dict:
+        """
+        Generate schedule by racing several search variants in worker processes.
+        
+        Each variant is a set of generate_schedule options (ordering, seed,
+        ...). The first variant to finish wins and the others are cancelled.
+        Every variant is a complete search, so one that fails proves that no
+        schedule exists. With node_limit or time_limit every variant gets
+        that budget; a variant that runs out does not end the race, and if
+        all of them do, the partial schedule with the fewest unplaced courses
+        is returned.
+        
+        Args:
+            courses: Optional list of courses. If None, uses self.courses.
+            workers: Number of worker processes (default: CPU count).
+            variants: Option dicts to race (default: portfolio_variants(workers)).
+            node_limit: Optional maximum number of search nodes per variant.
+            time_limit: Optional wall-clock limit in seconds.
+        
+        Returns:
+            Dictionary mapping (day, hour) to list of (course, room) tuples
+            (a partial schedule, see Schedule.unplaced, if every budget ran out)
+        
+        Raises:
+            ValueError: If required data is missing
+            RuntimeError: If schedule cannot be generated
+        """
+        courses_to_schedule = courses if courses is not None else self.courses
+        
+        if not courses_to_schedule:
+            raise ValueError("No courses provided for scheduling.")
+        if not self.rooms:
+            raise ValueError("No rooms provided for scheduling.")
+        if not self.time_slots:
+            raise ValueError("No time slots provided for scheduling.")
+        
+        if variants is None:
+            variants = portfolio_variants(workers or os.cpu_count() or 1)
+        budget = {name: limit for name, limit in (("node_limit", node_limit), ("time_limit", time_limit))
+                  if limit is not None}
+        variants = [dict(options, **budget) for options in variants]
+        workers = min(workers or len(variants), len(variants))
+        cache_key, schedule = self._cache_lookup(courses_to_schedule, "portfolio", {"variants": variants})
+        if schedule is not None:
+            self.schedule = schedule
+            return schedule
+        
+        cancel_event = multiprocessing.Event()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_portfolio_worker,
+                                       initargs=(cancel_event,))
+        try:
+            pending = {
+                executor.submit(_solve_in_worker, courses_to_schedule, self.rooms,
+                                self.time_slots, self.instructors, options)
+                for options in variants
+            }
+            outcome = None
+            best_partial = None
+            while pending and outcome is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result is None:
+                        continue
+                    if result and result[1]:
+                        # Out of budget: only wins if every other variant is too
+                        if best_partial is None or len(result[1]) < len(best_partial[1]):
+                            best_partial = result
+                        continue
+                    outcome = result
+                    break
+        finally:
+            cancel_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+        
+        if outcome is None:
+            outcome = best_partial
+        if not outcome:
+            raise RuntimeError("No valid schedule could be generated with the given constraints.")
+        
+        blocks, unplaced = outcome
+        self.schedule = _build_schedule(
+            ((courses_to_schedule[course_index], self.rooms[room_index], slots)
+             for course_index, room_index, slots in blocks),
+            [courses_to_schedule[course_index] for course_index in unplaced]
+        )
+        self._cache_store(cache_key, self.schedule)
+        
+        return self.schedule
+    
+    def generate_schedule_decomposed(self, courses: Optional[List[Course]] = None,
+                                     workers: Optional[int] = None, **options) -> Dict:
+        """
+        Generate schedule by solving independent groups of courses separately.
+        
+        Courses are split into the connected components of the constraint
+        graph (no shared instructor, year group, elective rule or lab pair
+        between components). Each component is solved in its own worker
+        process with the given generate_schedule options, then rooms are
+        reassigned across all components so no room is double-booked. If
+        that reassignment fails, the whole problem is solved at once instead.
+        A node_limit or time_limit applies to each component; the courses of
+        components that run out of budget are listed in the result's
+        unplaced attribute, as with generate_schedule.
+        
+        Args:
+            courses: Optional list of courses. If None, uses self.courses.
+            workers: Number of worker processes (default: CPU count).
+            **options: Options passed on to generate_schedule (ordering, ...).
+        
+        Returns:
+            Dictionary mapping (day, hour) to list of (course, room) tuples
+        
+        Raises:
+            ValueError: If required data is missing
+            RuntimeError: If schedule cannot be generated
+        """
+        courses_to_schedule = courses if courses is not None else self.courses
+        
+        if not courses_to_schedule:
+            raise ValueError("No courses provided for scheduling.")
+        if not self.rooms:
+            raise ValueError("No rooms provided for scheduling.")
+        if not self.time_slots:
+            raise ValueError("No time slots provided for scheduling.")
+        
+        components = connected_components(courses_to_schedule)
+        cache_key, schedule = self._cache_lookup(courses_to_schedule, "decomposed", options)
+        if schedule is not None:
+            self.schedule = schedule
+            return schedule
+        
+        if len(components) > 1:
+            cancel_event = multiprocessing.Event()
+            executor = ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(components)),
+                                           initializer=_init_portfolio_worker, initargs=(cancel_event,))
+            try:
+                futures = [
+                    executor.submit(_solve_in_worker, component, self.rooms,
+                                    self.time_slots, self.instructors, options)
+                    for component in components
+                ]
+                solved = []
+                unplaced = []
+                for component, future in zip(components, futures):
+                    result = future.result()
+                    if result is None or result is False:
+                        # One component without a schedule means no schedule at all
+                        raise RuntimeError("No valid schedule could be generated with the given constraints.")
+                    blocks, left_out = result
+                    solved.extend((component[course_index], slots) for course_index, _, slots in blocks)
+                    unplaced.extend(component[course_index] for course_index in left_out)
+            finally:
+                cancel_event.set()
+                executor.shutdown(wait=True, cancel_futures=True)
+            
+            rooms = assign_rooms(solved, self.rooms, self.time_slots)
+            if rooms is not None:
+                schedule = _build_schedule(
+                    ((course, room, slots) for (course, slots), room in zip(solved, rooms)), unplaced
+                )
+        
+        if schedule is None:
+            # A single component, or components competing for the same rooms:
+            # solve everything together, with the same options as the workers
+            schedule = generate_schedule(courses_to_schedule, self.rooms, self.time_slots,
+                                         self.instructors, **options)
+        self.schedule = schedule
+        self._cache_store(cache_key, self.schedule)
+        
+        return self.schedule
+    
+    def generate_schedule_local_search(self, courses: Optional[List[Course]] = None,
+                                       max_iterations: int = 100000,
+                                       time_limit: Optional[float] = None,
+                                       seed: Optional[int] = None) -> Dict:
+        """
+        Generate schedule with the min-conflicts local search engine.
+        
+        Faster than backtracking on large instances, but it gives up when
+        the budget runs out instead of proving that no schedule exists.
+        
+        Args:
+            courses: Optional list of courses. If None, uses self.courses.
+            max_iterations: Maximum number of repair moves.
+            time_limit: Optional wall-clock limit in seconds.
+            seed: Optional random seed.
+        
+        Returns:
+            Dictionary mapping (day, hour) to list of (course, room) tuples
+        
+        Raises:
+            ValueError: If required data is missing
+            RuntimeError: If no schedule is found within the budget
+        """
+        courses_to_schedule = courses if courses is not None else self.courses
+        
+        if not courses_to_schedule:
+            raise ValueError("No courses provided for scheduling.")
+        if not self.rooms:
+            raise ValueError("No rooms provided for scheduling.")
+        if not self.time_slots:
+            raise ValueError("No time slots provided for scheduling.")
+        
+        options = {"max_iterations": max_iterations, "time_limit": time_limit, "seed": seed}
+        cache_key, schedule = self._cache_lookup(courses_to_schedule, "local_search", options)
+        if schedule is not None:
+            self.schedule = schedule
+            return schedule
+        
+        self.schedule = local_search_schedule(
+            courses_to_schedule,
+            self.rooms,
+            self.time_slots,
+            self.instructors,
+            max_iterations=max_iterations,
+            time_limit=time_limit,
+            seed=seed
+        )
+        self._cache_store(cache_key, self.schedule)
+        
+        return self.schedule
+    
+    def generate_schedule_optimized(self, courses: Optional[List[Course]] = None,
+                                    weights: Optional[Dict[str, float]] = None,
+                                    time_limit: Optional[float] = 10.0,
+                                    soft_electives: bool = False) -> Dict:
+        """
+        Generate the schedule with the lowest soft-constraint cost.
+        
+        Branch-and-bound over instructor gaps, students' daily spread, late
+        hours and room over-capacity (see optimizer.DEFAULT_WEIGHTS); the
+        best schedule found within time_limit is returned.
+        
+        Args:
+            courses: Optional list of courses. If None, uses self.courses.
+            weights: Optional {criterion: cost per hour} overrides.
+            time_limit: Wall-clock limit in seconds (None searches to the end).
+            soft_electives: Let CENG and SENG electives overlap at a cost.
+        
+        Returns:
+            Dictionary mapping (day, hour) to list of (course, room) tuples
+        
+        Raises:
+            ValueError: If required data is missing or a weight is unknown
+            RuntimeError: If no schedule is found within the budget
+        """
+        courses_to_schedule = courses if courses is not None else self.courses
+        
+        if not courses_to_schedule:
+            raise ValueError("No courses provided for scheduling.")
+        if not self.rooms:
+            raise ValueError("No rooms provided for scheduling.")
+        if not self.time_slots:
+            raise ValueError("No time slots provided for scheduling.")
+        
+        options = {"weights": weights, "time_limit": time_limit, "soft_electives": soft_electives}
+        cache_key, schedule = self._cache_lookup(courses_to_schedule, "optimized", options)
+        if schedule is not None:
+            self.schedule = schedule
+            return schedule
+        
+        self.schedule = optimize_schedule(
+            courses_to_schedule,
+            self.rooms,
+            self.time_slots,
+            self.instructors,
+            weights=weights,
+            time_limit=time_limit,
+            soft_electives=soft_electives
+        )
+        self._cache_store(cache_key, self.schedule)
+        
+        return self.schedule
+    
     def get_schedule(self) -> Dict:
         """Get the current schedule."""
         return self.schedule
     
+    def get_stats(self) -> Optional[SearchStats]:
+        """Search statistics of the last generate_schedule(collect_stats=True), else None."""
+        return self.stats
+    
+    def validate_schedule(self, schedule: Optional[Dict] = None,
+                          soft_electives: bool = False) -> List[Violation]:
+        """
+        Find the hard-constraint violations of a schedule.
+        
+        Args:
+            schedule: Schedule to check. If None, uses self.schedule.
+            soft_electives: Accept overlapping CENG and SENG electives.
+        
+        Returns:
+            Violation records (see scheduler.ScheduleValidator); empty if valid.
+        """
+        if schedule is None:
+            schedule = self.schedule
+        if not schedule:
+            return []
+        return find_violations(schedule, self.instructors, self.courses, soft_electives)
+    
     def validate_schedule_data(self) -> Tuple[bool, Optional[str]]:
         """
         Validate that all required data is present.
@@ -0,0 +1,269 @@
+"""
+BeePlan - Dataset loader
+Turns the example_data.json format into Course, Instructor and Room
+objects. Every section is checked against a field table and all problems
+are reported together with their path (for example
+"courses[12].year: expected an integer, got 'two'"), instead of stopping
+at the first bad field. Repeated strings (instructor names, departments,
+course types, days and hours) are interned so a large catalog shares one
+copy of each. Used by both the GUI and the command-line interface.
+"""
+
+import json
+import re
+import sys
+from typing import List, NamedTuple, Optional, Tuple
+
+from scheduler import Course, Instructor, Room
+
+COURSE_TYPES = ("theory", "lab")
+
+_HOUR_PATTERN = re.compile(r"^([01]?\d|2[0-3]):[0-5]\d$")
+
+# Marks a field that has no default and must be present
+REQUIRED = object()
+
+
+class DatasetError(ValueError):
+    """Raised when a dataset cannot be loaded; errors lists every problem found."""
+    def __init__(self, errors: List[str], source: Optional[str] = None):
+        self.errors = errors
+        self.source = source
+        prefix = f"{source}: " if source else ""
+        super().__init__(prefix + "; ".join(errors))
+
+
+class Dataset(NamedTuple):
+    """Loaded objects; a section missing from the file is None rather than empty."""
+    courses: Optional[List[Course]]
+    instructors: Optional[List[Instructor]]
+    rooms: Optional[List[Room]]
+    time_slots: Optional[List[Tuple[str, str]]]
+
+
+def _type_name(value):
+    return "null" if value is None else type(value).__name__
+
+
+def _text(value):
+    if not isinstance(value, str):
+        raise ValueError(f"expected a string, got {_type_name(value)}")
+    return value
+
+
+def _label(value):
+    """A short string that repeats across records, interned."""
+    return sys.intern(_text(value))
+
+
+def _integer(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"expected an integer, got {value!r}")
+    if value < 0:
+        raise ValueError(f"must not be negative, got {value}")
+    return value
+
+
+def _positive_integer(value):
+    if _integer(value) == 0:
+        raise ValueError("must be at least 1, got 0")
+    return value
+
+
+def _boolean(value):
+    if not isinstance(value, bool):
+        raise ValueError(f"expected true or false, got {value!r}")
+    return value
+
+
+def _kind(value):
+    kind = _text(value).lower()
+    if kind not in COURSE_TYPES:
+        raise ValueError(f"expected one of {', '.join(COURSE_TYPES)}, got {value!r}")
+    return sys.intern(kind)
+
+
+def _credits(value):
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    return _text(value)
+
+
+def _groups(value):
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(group, str) for group in value):
+        raise ValueError(f"expected a list of strings, got {value!r}")
+    return [sys.intern(group) for group in value]
+
+
+def _slot(value):
+    """(day, "HH:MM") from a two-element list."""
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(f"expected [day, \"HH:MM\"], got {value!r}")
+    day, hour = value
+    if not isinstance(day, str) or not day:
+        raise ValueError(f"expected a day name, got {day!r}")
+    if not isinstance(hour, str) or not _HOUR_PATTERN.match(hour):
+        raise ValueError(f"expected an hour as \"HH:MM\", got {hour!r}")
+    return (sys.intern(day), sys.intern(hour))
+
+
+def _optional_slot(value):
+    return _slot(value) if value else None
+
+
+# JSON key -> (check and conversion, default), in constructor argument order
+INSTRUCTOR_FIELDS = {
+    "name": (_label, REQUIRED),
+    "max_daily_theory_hours": (_integer, 4),
+    "is_part_time": (_boolean, False),
+    "exclude_graduate_from_limit": (_boolean, False),
+}
+
+ROOM_FIELDS = {  # after room_id
+    "name": (_label, REQUIRED),
+    "capacity": (_integer, REQUIRED),
+    "type": (_kind, "theory"),
+}
+
+COURSE_FIELDS = {  # after course_id
+    "code": (_text, ""),
+    "name": (_text, ""),
+    "instructor": (_label, ""),
+    "hours": (_integer, 0),
+    "type": (_kind, "theory"),
+    "year": (_positive_integer, 1),
+    "is_mandatory": (_boolean, True),
+    "sections": (_positive_integer, 1),
+    "capacity": (_integer, 40),
+    "department": (_label, "SENG"),
+    "is_graduate": (_boolean, False),
+    "credits": (_credits, None),
+    "groups": (_groups, None),
+    "fixed_time_slot": (_optional_slot, None),
+}
+
+def _records(items, path, fields, errors) -> Optional[List[List]]:
+    """The converted constructor arguments of every record, or None if items is not a list.
+
+    Problems are appended to errors as (record index, message).
+    """
+    if not isinstance(items, list):
+        errors.append((0, f"{path}: expected a list, got {_type_name(items)}"))
+        return None
+    rows = []
+    for i, record in enumerate(items):
+        if not isinstance(record, dict):
+            errors.append((i, f"{path}[{i}]: expected an object, got {_type_name(record)}"))
+            rows.append([None] * len(fields))
+            continue
+        row = []
+        for key, (convert, default) in fields.items():
+            value = record.get(key, default)
+            if value is REQUIRED:
+                errors.append((i, f"{path}[{i}].{key}: missing required field"))
+            else:
+                try:
+                    value = convert(value)
+                except ValueError as e:
+                    errors.append((i, f"{path}[{i}].{key}: {e}"))
+            row.append(value)
+        rows.append(row)
+    return rows
+
+
+def _check_unique(names, path, errors) -> None:
+    """Report repeated names; rooms and instructors are looked up by name."""
+    if len(set(names)) == len(names):
+        return
+    seen = {}
+    for i, name in enumerate(names):
+        if not isinstance(name, str):
+            continue  # missing, reported already
+        if name in seen:
+            errors.append((i, f"{path}[{i}].name: duplicate of {path}[{seen[name]}] ({name!r})"))
+        else:
+            seen[name] = i
+
+
+def parse_time_slots(items, path: str = "time_slots") -> List[Tuple[str, str]]:
+    """(day, hour) tuples from a list of [day, "HH:MM"] pairs.
+
+    Raises:
+        DatasetError: If any entry is not a valid pair.
+    """
+    if not isinstance(items, list):
+        raise DatasetError([f"{path}: expected a list, got {_type_name(items)}"])
+    errors = []
+    slots = []
+    for i, item in enumerate(items):
+        try:
+            slots.append(_slot(item))
+        except ValueError as e:
+            errors.append(f"{path}[{i}]: {e}")
+    if errors:
+        raise DatasetError(errors)
+    return slots
+
+
+def parse_dataset(data) -> Dataset:
+    """Build the dataset from already decoded JSON.
+
+    Raises:
+        DatasetError: With every problem found, if any.
+    """
+    if not isinstance(data, dict):
+        raise DatasetError([f"expected an object at the top level, got {_type_name(data)}"])
+    sections = {}
+    errors = []
+    for section, fields in (("instructors", INSTRUCTOR_FIELDS), ("rooms", ROOM_FIELDS),
+                            ("courses", COURSE_FIELDS)):
+        if section in data:
+            section_errors = []
+            records = _records(data[section], section, fields, section_errors)
+            if records is not None and section != "courses":
+                _check_unique([row[0] for row in records], section, section_errors)
+            section_errors.sort(key=lambda error: error[0])  # stable: fields keep their order
+            errors.extend(message for _, message in section_errors)
+            sections[section] = records
+
+    time_slots = None
+    if "time_slots" in data:
+        try:
+            time_slots = parse_time_slots(data["time_slots"])
+        except DatasetError as e:
+            errors.extend(e.errors)
+
+    if errors:
+        raise DatasetError(errors)
+
+    instructors, rooms, courses = sections.get("instructors"), sections.get("rooms"), sections.get("courses")
+    return Dataset(
+        courses=None if courses is None else [Course(i, *row) for i, row in enumerate(courses)],
+        instructors=None if instructors is None else [Instructor(*row) for row in instructors],
+        rooms=None if rooms is None else [Room(i, *row) for i, row in enumerate(rooms)],
+        time_slots=time_slots,
+    )
+
+
+def load_dataset(path: str) -> Dataset:
+    """Read and parse a dataset file.
+
+    Raises:
+        DatasetError: If the file is unreadable, is not valid JSON (reported
+            with line and column) or does not match the schema.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise DatasetError([f"line {e.lineno}, column {e.colno}: {e.msg}"], path) from e
+    except (OSError, UnicodeDecodeError) as e:
+        raise DatasetError([str(e)], path) from e
+    try:
+        return parse_dataset(data)
+    except DatasetError as e:
+        raise DatasetError(e.errors, path) from None
@@ -0,0 +1,454 @@
+"""
+BeePlan - Min-conflicts local search
+A second scheduling engine next to the backtracking generate_schedule.
+Every course section gets a time up front (greedy), then the section
+involved in the most violations is moved to its least conflicting time
+until no hard constraint is violated. A tabu list and random walk steps
+keep the search out of local minima. Rooms are matched at the end, as in
+generate_schedule's two-phase mode. Each move only updates the violation
+counts of the sections it affects, so a step costs about as much as
+scoring the moved section's candidates, however large the problem.
+"""
+
+import random
+import time
+from collections import defaultdict
+from typing import List, Tuple, Optional
+
+from scheduler import (Course, Instructor, Room, Schedule, ScheduleCancelled,
+                       ScheduleState, StaticFeasibility, assign_rooms)
+
+
+class VarPool:
+    """Set of variables with constant-time add, discard and random choice."""
+    def __init__(self):
+        self.items = []
+        self.position = {}  # var -> index in items
+
+    def add(self, var):
+        if var not in self.position:
+            self.position[var] = len(self.items)
+            self.items.append(var)
+
+    def discard(self, var):
+        index = self.position.pop(var, None)
+        if index is None:
+            return
+        last = self.items.pop()
+        if last != var:
+            self.items[index] = last
+            self.position[last] = index
+
+    def choice(self, rng):
+        return self.items[rng.randrange(len(self.items))]
+
+    def __len__(self):
+        return len(self.items)
+
+
+class MinConflictsSearch:
+    """Complete assignment of course sections with incrementally kept violations.
+
+    Variables are course sections; their values are indexes into the course's
+    time candidates (StaticFeasibility.time_candidates), so fixed time slots,
+    the exam block, block length and the existence of a suitable room always
+    hold. The remaining hard rules (the same as is_valid_assignment) are
+    counted as violations:
+    - a pair of blocks sharing a slot with the same instructor, mandatory
+      year or clashing elective groups (once per shared slot),
+    - every block over the number of rooms of a room class at a slot,
+    - every hour an instructor's daily theory load is over the limit,
+    - a lab section not following a section of its theory course that day.
+
+    Besides the total, every section keeps the number of violations it is
+    involved in (score), and the sections with violations are pooled by
+    score, so picking the most conflicted one never scans all sections.
+    """
+    def __init__(self, courses, rooms, time_slots, instructors_dict=None, seed=None):
+        self.state = state = ScheduleState(courses, rooms, time_slots, instructors_dict)
+        self.candidates = StaticFeasibility(state).time_candidates()
+        self.time_slots = time_slots
+        self.rng = random.Random(seed)
+
+        # Courses whose blocks clash when they share a slot
+        self.clashes = []
+        for course_idx in range(len(courses)):
+            conflict_ids = set(state.conflict_ids[course_idx])
+            self.clashes.append({other for other in range(len(courses))
+                                 if conflict_ids.intersection(state.mark_ids[other])})
+        self.clashed_by = [[] for _ in courses]  # course index -> courses its blocks clash with
+        for course_idx, clashes in enumerate(self.clashes):
+            for other in clashes:
+                self.clashed_by[other].append(course_idx)
+
+        self.var_course = [i for i, course in enumerate(courses) for _ in range(course.sections)]
+        self.course_vars = defaultdict(list)
+        for var, course_idx in enumerate(self.var_course):
+            self.course_vars[course_idx].append(var)
+        self.theory_labs = defaultdict(list)  # theory course index -> lab course indexes
+        for course_idx, theory_idx in enumerate(state.lab_theory):
+            if theory_idx >= 0:
+                self.theory_labs[theory_idx].append(course_idx)
+
+        self.value = [-1] * len(self.var_course)  # var -> candidate index
+        self.occupants = [set() for _ in state.slots]  # slot id -> vars
+        self.load = [0] * len(state.theory_load)  # instructor * days + day -> counted theory hours
+        self.load_vars = defaultdict(set)  # load id -> theory vars counted in it
+        self.usage = [0] * len(state.room_class_usage)  # slot * classes + class -> blocks
+        self.pair_conflicts = [0] * len(self.var_course)
+        self.cost = 0
+        self.rooms = None  # Room per var once matched
+
+        # Per-section violation counts, kept current by move()
+        self.candidate_slots = [sorted({slot_id for slot_ids, _ in course_candidates for slot_id in slot_ids})
+                                for course_candidates in self.candidates]
+        self.clash_count = [[0] * len(state.slots) for _ in courses]  # course -> slot id -> clashing occupants
+        self.var_within = [set(state.room_class_within[state.course_room_class[course_idx]])
+                           for course_idx in self.var_course]
+        self.score = [0] * len(self.var_course)  # var -> violations it is involved in
+        self.by_score = {}  # score -> VarPool of the vars with that score
+        self.conflicted = VarPool()  # vars with a score
+        self.short = [0] * len(self.var_course)  # var -> overused room class counters in its block
+        self.lab_flag = [0] * len(self.var_course)  # var -> 1 if a placed lab section breaks lab order
+
+    # --- Value helpers -------------------------------------------------
+
+    def block(self, var, candidate):
+        return self.candidates[self.var_course[var]][candidate][0]
+
+    def load_hours(self, var, candidate):
+        """(load id, hours) a theory section placed at candidate adds, or (None, 0)."""
+        course_idx = self.var_course[var]
+        course = self.state.courses[course_idx]
+        instructor_id = self.state.course_instructor[course_idx]
+        if candidate < 0 or course.course_type != 'theory' or (
+                course.is_graduate and self.state.instructor_excludes_graduate[instructor_id]):
+            return None, 0
+        start = self.block(var, candidate)[0]
+        return instructor_id * self.state.n_days + self.state.slot_day[start], course.theory_hours
+
+    def excess(self, load_id, load):
+        return max(0, load - self.state.instructor_limit[load_id // self.state.n_days])
+
+    def usage_ids(self, var, candidate):
+        """Room class usage counters a block of var at candidate takes."""
+        state = self.state
+        if candidate < 0:
+            return []
+        within = state.room_class_within[state.course_room_class[self.var_course[var]]]
+        return [slot_id * state.n_room_classes + k for slot_id in self.block(var, candidate) for k in within]
+
+    def overused(self, usage_id):
+        return self.usage[usage_id] > self.state.room_class_size[usage_id % self.state.n_room_classes]
+
+    def lab_violated(self, var):
+        """1 if a placed lab section follows no theory section of its course that day."""
+        state = self.state
+        theory_idx = state.lab_theory[self.var_course[var]]
+        if theory_idx < 0:
+            return 1
+        start = self.block(var, self.value[var])[0]
+        for theory_var in self.course_vars[theory_idx]:
+            if self.value[theory_var] < 0:
+                continue
+            theory_start = self.block(theory_var, self.value[theory_var])[0]
+            if (state.slot_day[theory_start] == state.slot_day[start] and
+                    state.slot_minute[start] > state.slot_minute[theory_start]):
+                return 0
+        return 1
+
+    def affected_labs(self, var):
+        """Placed lab sections whose violation depends on where var is."""
+        course_idx = self.var_course[var]
+        if self.state.courses[course_idx].course_type == 'lab':
+            lab_vars = [var]
+        else:
+            lab_vars = [lab_var for lab_idx in self.theory_labs.get(course_idx, ())
+                        for lab_var in self.course_vars[lab_idx]]
+        return [lab_var for lab_var in lab_vars if self.value[lab_var] >= 0]
+
+    def slot_clashes(self, var, slot_ids):
+        """{slot id: number of other occupants clashing with var} for slot_ids."""
+        course_idx = self.var_course[var]
+        counts = self.clash_count[course_idx]
+        if course_idx not in self.clashes[course_idx]:
+            return {slot_id: counts[slot_id] for slot_id in slot_ids}
+        occupants = self.occupants  # var's own block counts against its course's other sections
+        return {slot_id: counts[slot_id] - (var in occupants[slot_id]) for slot_id in slot_ids}
+
+    # --- Violation counts per section ------------------------------------
+
+    def adjust(self, var, amount):
+        """Add amount to the number of violations var is involved in."""
+        if not amount:
+            return
+        old = self.score[var]
+        new = self.score[var] = old + amount
+        if old:
+            pool = self.by_score[old]
+            pool.discard(var)
+            if not pool:
+                del self.by_score[old]
+        if new:
+            self.by_score.setdefault(new, VarPool()).add(var)
+            self.conflicted.add(var)
+        else:
+            self.conflicted.discard(var)
+
+    def change_short(self, var, amount):
+        """Count overused room class counters in var's block; var has a violation while any is."""
+        was_short = self.short[var] > 0
+        self.short[var] += amount
+        self.adjust(var, (self.short[var] > 0) - was_short)
+
+    def change_load(self, load_id, var, hours, joining):
+        """Count var's theory hours into (joining) or out of a daily load."""
+        members = self.load_vars[load_id]
+        was_over = self.excess(load_id, self.load[load_id]) > 0
+        if joining:
+            self.load[load_id] += hours
+            members.add(var)
+        else:
+            self.load[load_id] -= hours
+            members.discard(var)
+        is_over = self.excess(load_id, self.load[load_id]) > 0
+        self.adjust(var, is_over if joining else -was_over)
+        if was_over != is_over:
+            for other in members:
+                if other != var:
+                    self.adjust(other, 1 if is_over else -1)
+
+    def change_usage(self, usage_id, var, amount):
+        """Count var's block into (1) or out of (-1) a room class counter.
+
+        The other occupants of the slot that need the class are updated if
+        the counter becomes or stops being overused; var itself is not.
+        """
+        was_over = self.overused(usage_id)
+        self.usage[usage_id] += amount
+        is_over = self.overused(usage_id)
+        if was_over != is_over:
+            slot_id, k = divmod(usage_id, self.state.n_room_classes)
+            for other in self.occupants[slot_id]:
+                if other != var and k in self.var_within[other]:
+                    self.change_short(other, 1 if is_over else -1)
+
+    # --- Moves ---------------------------------------------------------
+
+    def delta(self, var, candidate, clashing):
+        """Change of the total violation count if var moved to candidate."""
+        old = self.value[var]
+        change = sum(clashing[slot_id] for slot_id in self.block(var, candidate))
+        if old >= 0:
+            change -= self.pair_conflicts[var]
+
+        before = sum(self.lab_violated(lab_var) for lab_var in self.affected_labs(var))
+        self.value[var] = candidate
+        after = sum(self.lab_violated(lab_var) for lab_var in self.affected_labs(var))
+        self.value[var] = old
+        change += after - before
+
+        old_load_id, hours = self.load_hours(var, old)
+        new_load_id, hours = self.load_hours(var, candidate)
+        if old_load_id != new_load_id:
+            if old_load_id is not None:
+                load = self.load[old_load_id]
+                change += self.excess(old_load_id, load - hours) - self.excess(old_load_id, load)
+            if new_load_id is not None:
+                load = self.load[new_load_id]
+                change += self.excess(new_load_id, load + hours) - self.excess(new_load_id, load)
+
+        # One more block over a class's size adds a violation, one less removes one
+        old_ids = set(self.usage_ids(var, old))
+        new_ids = self.usage_ids(var, candidate)
+        sizes, n_classes = self.state.room_class_size, self.state.n_room_classes
+        for usage_id in new_ids:
+            if usage_id in old_ids:
+                old_ids.discard(usage_id)
+            elif self.usage[usage_id] >= sizes[usage_id % n_classes]:
+                change += 1
+        for usage_id in old_ids:
+            if self.usage[usage_id] > sizes[usage_id % n_classes]:
+                change -= 1
+        return change
+
+    def move(self, var, candidate, change):
+        """Move var to candidate; change is its delta()."""
+        clashes = self.clashes[self.var_course[var]]
+        old = self.value[var]
+        if old >= 0:
+            load_id, hours = self.load_hours(var, old)
+            if load_id is not None:
+                self.change_load(load_id, var, hours, joining=False)
+            for slot_id in self.block(var, old):
+                self.occupants[slot_id].discard(var)
+                for other_course in self.clashed_by[self.var_course[var]]:
+                    self.clash_count[other_course][slot_id] -= 1
+                for other in self.occupants[slot_id]:
+                    if self.var_course[other] in clashes:
+                        self.pair_conflicts[other] -= 1
+                        self.adjust(other, -1)
+            self.adjust(var, -self.pair_conflicts[var])
+            self.pair_conflicts[var] = 0
+            self.change_short(var, -self.short[var])
+            for usage_id in self.usage_ids(var, old):
+                self.change_usage(usage_id, var, -1)
+        self.value[var] = candidate
+        for slot_id in self.block(var, candidate):
+            for other in self.occupants[slot_id]:
+                if self.var_course[other] in clashes:
+                    self.pair_conflicts[other] += 1
+                    self.pair_conflicts[var] += 1
+                    self.adjust(other, 1)
+                    self.adjust(var, 1)
+            self.occupants[slot_id].add(var)
+            for other_course in self.clashed_by[self.var_course[var]]:
+                self.clash_count[other_course][slot_id] += 1
+        usage_ids = self.usage_ids(var, candidate)
+        for usage_id in usage_ids:
+            self.change_usage(usage_id, var, 1)
+        self.change_short(var, sum(1 for usage_id in usage_ids if self.overused(usage_id)))
+        load_id, hours = self.load_hours(var, candidate)
+        if load_id is not None:
+            self.change_load(load_id, var, hours, joining=True)
+        for lab_var in self.affected_labs(var):
+            flag = self.lab_violated(lab_var)
+            self.adjust(lab_var, flag - self.lab_flag[lab_var])
+            self.lab_flag[lab_var] = flag
+        self.cost += change
+
+    def best_candidate(self, var, tabu=None, iteration=0, best_cost=None):
+        """Least-violation candidate for var (ties broken randomly); (candidate, delta)."""
+        clashing = self.slot_clashes(var, self.candidate_slots[self.var_course[var]])
+        best, best_change = [], None
+        for candidate in range(len(self.candidates[self.var_course[var]])):
+            if candidate == self.value[var]:
+                continue
+            change = self.delta(var, candidate, clashing)
+            if (tabu is not None and tabu.get((var, candidate), -1) > iteration and
+                    self.cost + change >= best_cost):
+                continue  # tabu, and not good enough to override it
+            if best_change is None or change < best_change:
+                best, best_change = [candidate], change
+            elif change == best_change:
+                best.append(candidate)
+        if not best:
+            return -1, 0
+        return self.rng.choice(best), best_change
+
+    def match_rooms(self):
+        """Rooms for the current (violation-free) assignment, or None if it has none."""
+        state = self.state
+        blocks = [(state.courses[self.var_course[var]],
+                   [state.slots[slot_id] for slot_id in self.block(var, candidate)])
+                  for var, candidate in enumerate(self.value)]
+        return assign_rooms(blocks, state.rooms, self.time_slots)
+
+    # --- Search --------------------------------------------------------
+
+    def greedy_start(self):
+        """Place sections one by one (fewest options, theory before lab) at their best candidate."""
+        courses = self.state.courses
+        order = sorted(range(len(self.var_course)),
+                       key=lambda var: (courses[self.var_course[var]].course_type != 'theory',
+                                        len(self.candidates[self.var_course[var]]), var))
+        for var in order:
+            candidate, change = self.best_candidate(var)
+            self.move(var, candidate, change)
+
+    def run(self, max_iterations=100000, time_limit=None, tabu_tenure=10,
+            walk_probability=0.05, cancel_token=None):
+        """Repair the assignment until no violations remain and rooms match; True on success."""
+        deadline = time.monotonic() + time_limit if time_limit is not None else None
+        tabu = {}  # (var, candidate) -> iteration until which moving back is tabu
+        best_cost = self.cost
+        for iteration in range(max_iterations):
+            walk = self.rng.random() < walk_probability
+            if self.cost == 0:
+                self.rooms = self.match_rooms()
+                if self.rooms is not None:
+                    return True
+                walk = True  # rooms cannot be matched after all: shake the assignment
+            if iteration % 100 == 0:
+                if cancel_token is not None and cancel_token.is_set():
+                    raise ScheduleCancelled("Schedule generation was cancelled.")
+                if deadline is not None and time.monotonic() > deadline:
+                    return False
+
+            if walk:
+                # Random walk: any option for any conflicted section
+                if self.conflicted:
+                    var = self.conflicted.choice(self.rng)
+                else:
+                    var = self.rng.randrange(len(self.var_course))
+                candidate = self.rng.randrange(len(self.candidates[self.var_course[var]]))
+                if candidate == self.value[var]:
+                    continue
+                change = self.delta(var, candidate, self.slot_clashes(var, self.block(var, candidate)))
+            else:
+                if not self.by_score:
+                    continue
+                var = self.by_score[max(self.by_score)].choice(self.rng)
+                candidate, change = self.best_candidate(var, tabu, iteration, best_cost)
+                if candidate < 0:
+                    continue
+            tabu[(var, self.value[var])] = iteration + tabu_tenure
+            self.move(var, candidate, change)
+            best_cost = min(best_cost, self.cost)
+        return False
+
+    def to_schedule(self):
+        """Build the (day, hour) -> [(course, room), ...] Schedule after a successful run()."""
+        state = self.state
+        schedule = defaultdict(list)
+        placements = []
+        for var, candidate in enumerate(self.value):
+            course, room = state.courses[self.var_course[var]], self.rooms[var]
+            slots = [state.slots[slot_id] for slot_id in self.block(var, candidate)]
+            for slot in slots:
+                schedule[slot].append((course, room))
+            placements.append((course, room, slots))
+        return Schedule(schedule, placements=placements)
+
+
+def local_search_schedule(courses: List[Course], rooms: List[Room], time_slots: List[Tuple[str, str]],
+                          instructors: List[Instructor] = None, max_iterations: int = 100000,
+                          time_limit: Optional[float] = None, seed: Optional[int] = None,
+                          tabu_tenure: int = 10, walk_probability: float = 0.05,
+                          cancel_token=None):
+    """
+    Generates a conflict-free schedule with min-conflicts local search.
+    Returns the schedule if one is found within the budget, otherwise raises
+    RuntimeError. Unlike generate_schedule it cannot prove that no schedule
+    exists; it is meant for instances too large to search exhaustively.
+
+    Args:
+        courses: List of Course objects
+        rooms: List of Room objects
+        time_slots: List of (day, hour) tuples, e.g., [("Monday", "09:00"), ...]
+        instructors: Optional list of Instructor objects for constraint checking
+        max_iterations: Maximum number of repair moves
+        time_limit: Optional wall-clock limit in seconds
+        seed: Optional random seed
+        tabu_tenure: Moves during which a section may not return to a time it left
+        walk_probability: Probability of a random move instead of the best one
+        cancel_token: Optional object with is_set(); once set, ScheduleCancelled is raised
+
+    Returns:
+        Dictionary mapping (day, hour) to list of (course, room) tuples
+    """
+    if not courses or not rooms or not time_slots:
+        raise ValueError("Courses, rooms, and time slots must be non-empty lists.")
+
+    instructors_dict = {inst.name: inst for inst in instructors} if instructors else {}
+    search = MinConflictsSearch(courses, rooms, time_slots, instructors_dict, seed)
+    unpaired_lab = any(course.course_type == 'lab' and search.state.lab_theory[i] < 0
+                       for i, course in enumerate(courses))
+    if not all(search.candidates) or unpaired_lab:
+        raise RuntimeError("No valid schedule could be generated with the given constraints.")
+
+    search.greedy_start()
+    if search.run(max_iterations, time_limit, tabu_tenure, walk_probability, cancel_token):
+        return search.to_schedule()
+
+    raise RuntimeError("No valid schedule could be found within the search budget.")
@@ -3,8 +3,11 @@ BeePlan - Çankaya Üniversitesi Ders Programı Hazırlama Sistemi
 GUI Application for course schedule generation and management.
 """
 
+import os
 import sys
 import json
+import threading
+import time
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, 
     QTableWidget, QTableWidgetItem, QFileDialog, QMessageBox, QWidget,
@@ -13,9 +16,60 @@ from PyQt5.QtWidgets import (
     QDialog, QScrollArea
 )
 from PyQt5.QtGui import QColor, QFont
-from PyQt5.QtCore import Qt
-from scheduler import Course, Instructor, Room, time_to_decimal
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from scheduler import Course, Instructor, Room, ScheduleCancelled, time_to_decimal, pair_labs_with_theory
+from scheduler import (find_violations, IncrementalValidator, EXAM_BLOCK, FIXED_TIME_SLOT, ROOM_TYPE, ROOM_CAPACITY, DAILY_THEORY_LIMIT,
+                       LAB_BEFORE_THEORY, INSTRUCTOR_CONFLICT, ROOM_CONFLICT, YEAR_MANDATORY_CONFLICT,
+                       ELECTIVE_CONFLICT)
 from controller import ScheduleController
+from loader import DatasetError, load_dataset, parse_time_slots
+from solution_cache import SolutionCache
+
+# Schedules already generated for an unchanged configuration are reused from
+# here, once the cache is switched on in the settings tab (off by default)
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".beeplan", "cache")
+
+# Longest list of data file problems shown in a message box
+MAX_SHOWN_ERRORS = 20
+
+
+class ScheduleWorker(QThread):
+    """Runs the controller's schedule generation off the GUI thread.
+
+    Progress, the result and failures come back as signals, which Qt
+    delivers on the GUI thread; cancel() stops the search at its next node.
+    """
+    progress = pyqtSignal(int, int, float, int)  # courses placed, total courses, nodes per second, best depth
+    succeeded = pyqtSignal(object)  # the schedule
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, controller, courses, parent=None):
+        super().__init__(parent)
+        self.controller = controller
+        self.courses = courses
+        self.cancel_event = threading.Event()
+        self.started_at = time.monotonic()
+
+    def run(self):
+        self.started_at = time.monotonic()
+        try:
+            schedule = self.controller.generate_schedule(self.courses, progress=self.report_progress,
+                                                         cancel_token=self.cancel_event)
+        except ScheduleCancelled:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.succeeded.emit(schedule)
+
+    def report_progress(self, placed, total, nodes, best_depth):
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        self.progress.emit(placed, total, nodes / elapsed, best_depth)
+
+    def cancel(self):
+        self.cancel_event.set()
 
 
 class BeePlanGUI(QMainWindow):
@@ -34,10 +88,16 @@ class BeePlanGUI(QMainWindow):
         self.time_slots = []
         self.schedule = {}
         self.all_available_courses = []  # Tüm mevcut dersler (JSON'dan yüklenecek)
+        self.lab_pairs = {}  # lab course_id -> teori dersi
+        self.theory_labs = {}  # teori course_id -> lab dersleri
         self.selected_courses = []  # Kullanıcının seçtiği dersler
         self.student_year = None  # Öğrencinin sınıfı
         self.max_credits = 17  # Maksimum kredi hakkı
         self.selected_credits = 0  # Seçilen toplam kredi
+        self.schedule_worker = None  # Çalışan program oluşturma iş parçacığı
+        self.schedule_validator = None  # Elle düzenlemeleri izleyen IncrementalValidator
+        self.reset_table_cells()
+        self.generation_status_label = None  # İlerlemenin gösterildiği etiket
         
     def init_ui(self):
         """Initialize the user interface."""
@@ -121,6 +181,9 @@ class BeePlanGUI(QMainWindow):
         self.generate_button = QPushButton("Program Oluştur")
         self.generate_button.clicked.connect(self.generate_schedule)
         self.generate_button.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
+        self.cancel_button = QPushButton("İptal")
+        self.cancel_button.clicked.connect(self.cancel_generation)
+        self.cancel_button.setEnabled(False)
         self.save_button = QPushButton("Programı Kaydet")
         self.save_button.clicked.connect(self.save_schedule)
         self.clear_button = QPushButton("Temizle")
@@ -132,6 +195,7 @@ class BeePlanGUI(QMainWindow):
         
         button_layout.addWidget(self.load_data_button)
         button_layout.addWidget(self.generate_button)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addWidget(self.view_report_button)
         button_layout.addWidget(self.save_button)
         button_layout.addWidget(self.clear_button)
@@ -212,10 +276,16 @@ class BeePlanGUI(QMainWindow):
         layout.addLayout(content_layout)
         
         # Generate schedule button
-        generate_from_selection_button = QPushButton("🎓 Seçilen Derslerle Program Oluştur")
-        generate_from_selection_button.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold; padding: 10px;")
-        generate_from_selection_button.clicked.connect(self.generate_schedule_from_selection)
-        layout.addWidget(generate_from_selection_button)
+        self.generate_from_selection_button = QPushButton("🎓 Seçilen Derslerle Program Oluştur")
+        self.generate_from_selection_button.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold; padding: 10px;")
+        self.generate_from_selection_button.clicked.connect(self.generate_schedule_from_selection)
+        self.selection_cancel_button = QPushButton("İptal")
+        self.selection_cancel_button.clicked.connect(self.cancel_generation)
+        self.selection_cancel_button.setEnabled(False)
+        generate_layout = QHBoxLayout()
+        generate_layout.addWidget(self.generate_from_selection_button, 1)
+        generate_layout.addWidget(self.selection_cancel_button)
+        layout.addLayout(generate_layout)
         
         # Credit info label
         self.credit_info_label = QLabel(f"Seçmeli dersler için {self.max_credits} kredi hakkınız var.")
@@ -238,34 +308,18 @@ class BeePlanGUI(QMainWindow):
         year = int(self.year_selection_combo.currentText())
         self.update_available_courses(year)
         
-    def find_lab_for_theory(self, theory_course):
-        """Find the corresponding lab course for a theory course."""
-        theory_code = theory_course.code
-        
+    def update_lab_pairs(self):
+        """Resolve theory/lab pairs of the available courses once (shared with the scheduler)."""
+        self.lab_pairs = pair_labs_with_theory(self.all_available_courses)
+        self.theory_labs = {}
         for course in self.all_available_courses:
-            if (course.course_type == 'lab' and 
-                course.year == theory_course.year and
-                course.instructor == theory_course.instructor):
-                lab_code = course.code
-                
-                # Check various patterns:
-                # 1. SENG101 -> SENG101L
-                # 2. SENG101 -> SENG101Lab
-                # 3. SENG101 -> SENG101 LAB
-                # 4. Theory code is prefix of lab code
-                theory_base = theory_code.strip()
-                lab_base = lab_code.strip()
-                
-                # Remove common lab suffixes from lab code
-                lab_without_suffix = lab_base.replace('L', '').replace('Lab', '').replace('LAB', '').strip()
-                
-                # Check if theory code matches lab code (with or without suffix)
-                if (theory_code in lab_code or  # SENG101 in SENG101L
-                    theory_base == lab_without_suffix or  # SENG101 == SENG101 (after removing L)
-                    lab_code.startswith(theory_code)):  # SENG101L starts with SENG101
-                    return course
+            theory_course = self.lab_pairs.get(course.course_id)
+            if theory_course:
+                self.theory_labs.setdefault(theory_course.course_id, []).append(course)
         
-        return None
+    def find_labs_for_theory(self, theory_course):
+        """Find every lab course of a theory course (empty list if it has none)."""
+        return self.theory_labs.get(theory_course.course_id, [])
     
     def get_course_credits(self, course):
         """Calculate total credits for a course."""
@@ -289,16 +343,12 @@ class BeePlanGUI(QMainWindow):
                        if c.year == year and c.course_type == 'theory']
         
         for course in year_courses:
-            # Check if this course has a lab
-            lab_course = self.find_lab_for_theory(course)
-            has_lab = lab_course is not None
+            # Check if this course has labs
+            has_lab = bool(self.find_labs_for_theory(course))
             
-            # Get credits
+            # Get credits (lab credits are usually included in the theory
+            # course credits, so they are not counted again)
             credits = self.get_course_credits(course)
-            if has_lab and lab_course:
-                lab_credits = self.get_course_credits(lab_course)
-                # Lab credits are usually included in the theory course credits
-                # So we don't double count
             
             course_text = f"{course.code} - {course.name}"
             if credits > 0:
@@ -371,9 +421,8 @@ class BeePlanGUI(QMainWindow):
                 if not course.is_mandatory:
                     self.selected_credits += course_credits
                 
-                # Check if this course has a lab and add it automatically
-                lab_course = self.find_lab_for_theory(course)
-                if lab_course:
+                # Add the labs of this course automatically
+                for lab_course in self.find_labs_for_theory(course):
                     # Check if lab is already selected
                     lab_already_selected = False
                     for i in range(self.selected_courses_list.count()):
@@ -409,32 +458,27 @@ class BeePlanGUI(QMainWindow):
         selected_items = self.selected_courses_list.selectedItems()
         courses_to_remove = []
         
+        selected_ids = {c.course_id for c in self.selected_courses}
         for item in selected_items:
             course = item.data(Qt.UserRole)
             courses_to_remove.append(course)
             
-            # If removing a theory course, also remove its lab
-            if course.course_type == 'theory':
-                lab_course = self.find_lab_for_theory(course)
-                if lab_course:
-                    # Check if lab is in selected courses
-                    for i in range(self.selected_courses_list.count()):
-                        existing_item = self.selected_courses_list.item(i)
-                        existing_course = existing_item.data(Qt.UserRole)
-                        if existing_course.course_id == lab_course.course_id:
-                            courses_to_remove.append(lab_course)
-                            break
-            # If removing a lab course, also remove its theory
-            elif course.course_type == 'lab':
-                # Find the theory course for this lab
-                for theory_course in self.all_available_courses:
-                    if (theory_course.course_type == 'theory' and
-                        theory_course.year == course.year and
-                        theory_course.instructor == course.instructor):
-                        lab_course = self.find_lab_for_theory(theory_course)
-                        if lab_course and lab_course.course_id == course.course_id:
-                            courses_to_remove.append(theory_course)
-                            break
+            # If removing a lab course, also remove its theory (and with it the theory's other labs)
+            theory_course = course
+            if course.course_type == 'lab':
+                theory_course = self.lab_pairs.get(course.course_id)
+                if theory_course and theory_course.course_id in selected_ids:
+                    courses_to_remove.append(theory_course)
+            # If removing a theory course, also remove its labs
+            if theory_course and theory_course.course_type == 'theory':
+                courses_to_remove.extend(lab_course for lab_course in self.find_labs_for_theory(theory_course)
+                                         if lab_course.course_id in selected_ids)
+        
+        # A course reached both directly and through its theory/lab is removed once
+        unique_courses = {}
+        for course_to_remove in courses_to_remove:
+            unique_courses.setdefault(course_to_remove.course_id, course_to_remove)
+        courses_to_remove = list(unique_courses.values())
         
         # Remove all courses (including related labs/theories) and update credits
         for course_to_remove in courses_to_remove:
@@ -477,30 +521,26 @@ class BeePlanGUI(QMainWindow):
             QMessageBox.warning(self, "Uyarı", "Lütfen zaman dilimlerini ayarlayın.")
             return
         
-        try:
-            # Update controller with current data
-            self.controller.set_courses(self.selected_courses)
-            self.controller.set_instructors(self.instructors)
-            self.controller.set_rooms(self.rooms)
-            self.controller.set_time_slots(self.time_slots)
-            
-            self.selection_status_label.setText("Program oluşturuluyor...")
-            QApplication.processEvents()
-            
-            # Use selected courses to generate schedule through controller
-            schedule = self.controller.generate_schedule(self.selected_courses)
-            self.schedule = schedule
-            
-            # Switch to schedule tab and populate
-            self.tabs.setCurrentIndex(0)  # Switch to schedule tab
-            self.populate_table(schedule)
-            
-            self.selection_status_label.setText(f"Program başarıyla oluşturuldu! {len(self.selected_courses)} ders planlandı.")
-            QMessageBox.information(self, "Başarılı", f"Seçtiğiniz {len(self.selected_courses)} ders için program oluşturuldu!")
-            
-        except Exception as e:
-            self.selection_status_label.setText(f"Hata: {str(e)}")
-            QMessageBox.critical(self, "Hata", f"Program oluşturulamadı: {e}")
+        # Update controller with current data
+        self.controller.set_courses(self.selected_courses)
+        self.controller.set_instructors(self.instructors)
+        self.controller.set_rooms(self.rooms)
+        self.controller.set_time_slots(self.time_slots)
+        
+        # Use selected courses to generate schedule through controller, off the GUI thread
+        self.start_generation(self.selected_courses, self.selection_status_label,
+                              self.on_selection_schedule_generated)
+    
+    def on_selection_schedule_generated(self, schedule):
+        """Show the schedule generated from the selected courses."""
+        self.schedule = schedule
+        
+        # Switch to schedule tab and populate
+        self.tabs.setCurrentIndex(0)  # Switch to schedule tab
+        self.populate_table(schedule)
+        
+        self.selection_status_label.setText(f"Program başarıyla oluşturuldu! {len(self.selected_courses)} ders planlandı.")
+        QMessageBox.information(self, "Başarılı", f"Seçtiğiniz {len(self.selected_courses)} ders için program oluşturuldu!")
         
     def create_courses_tab(self):
         """Create tab for managing courses."""
@@ -679,8 +719,40 @@ class BeePlanGUI(QMainWindow):
         apply_button.clicked.connect(self.apply_time_slots)
         layout.addWidget(apply_button)
         
+        # Solution cache (opt-in)
+        cache_group = QGroupBox("Çözüm Önbelleği")
+        cache_layout = QVBoxLayout(cache_group)
+        self.cache_checkbox = QCheckBox(f"Oluşturulan programları önbelleğe al ({CACHE_DIR})")
+        self.cache_checkbox.setChecked(False)
+        self.cache_checkbox.toggled.connect(self.toggle_cache)
+        cache_layout.addWidget(self.cache_checkbox)
+        clear_cache_button = QPushButton("Önbelleği Temizle")
+        clear_cache_button.clicked.connect(self.clear_cache)
+        cache_layout.addWidget(clear_cache_button)
+        layout.addWidget(cache_group)
+        
         self.tabs.addTab(settings_widget, "⚙️ Ayarlar")
         
+    def toggle_cache(self, enabled):
+        """Switch the on-disk solution cache on or off."""
+        try:
+            self.controller.set_cache_dir(CACHE_DIR if enabled else None)
+        except OSError as e:
+            QMessageBox.critical(self, "Hata", f"Önbellek dizini oluşturulamadı: {e}")
+            self.cache_checkbox.setChecked(False)
+    
+    def clear_cache(self):
+        """Delete every cached schedule."""
+        if not os.path.isdir(CACHE_DIR):
+            QMessageBox.information(self, "Önbellek", "Önbellek zaten boş.")
+            return
+        try:
+            removed = SolutionCache(CACHE_DIR).clear()
+        except OSError as e:
+            QMessageBox.critical(self, "Hata", f"Önbellek temizlenemedi: {e}")
+            return
+        QMessageBox.information(self, "Önbellek", f"{removed} kayıtlı program silindi.")
+        
     def load_default_instructors(self):
         """Load default instructors from Çankaya University."""
         default_instructors = [
@@ -737,7 +809,7 @@ class BeePlanGUI(QMainWindow):
         """Apply time slots from text input."""
         try:
             text = self.time_slots_text.toPlainText()
-            self.time_slots = [tuple(ts) for ts in json.loads(text)]
+            self.time_slots = parse_time_slots(json.loads(text))
             QMessageBox.information(self, "Başarılı", f"{len(self.time_slots)} zaman dilimi yüklendi.")
         except Exception as e:
             QMessageBox.critical(self, "Hata", f"Zaman dilimleri yüklenemedi: {e}")
@@ -886,72 +958,41 @@ class BeePlanGUI(QMainWindow):
             return
         
         try:
-            with open(file_name, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-            
-            # Load instructors
-            if "instructors" in data:
-                self.instructors = [
-                    Instructor(
-                        inst["name"], 
-                        inst.get("max_daily_theory_hours", 4),
-                        is_part_time=inst.get("is_part_time", False),
-                        exclude_graduate_from_limit=inst.get("exclude_graduate_from_limit", False)
-                    )
-                    for inst in data["instructors"]
-                ]
-                self.update_instructors_table()
-                self.update_instructor_combos()
-            
-            # Load rooms
-            if "rooms" in data:
-                self.rooms = [
-                    Room(i, room["name"], room["capacity"], room.get("type", "theory"))
-                    for i, room in enumerate(data["rooms"])
-                ]
-                self.update_rooms_table()
-            
-            # Load courses
-            if "courses" in data:
-                self.courses = [
-                    Course(
-                        course_id=i,
-                        code=c.get("code", ""),
-                        name=c.get("name", ""),
-                        instructor=c.get("instructor", ""),
-                        hours=c.get("hours", 0),
-                        course_type=c.get("type", "theory").lower(),
-                        year=c.get("year", 1),
-                        is_mandatory=c.get("is_mandatory", True),
-                        sections=c.get("sections", 1),
-                        capacity=c.get("capacity", 40),
-                        department=c.get("department", "SENG"),
-                        is_graduate=c.get("is_graduate", False),
-                        credits=c.get("credits", None),
-                        groups=c.get("groups", None),
-                        fixed_time_slot=tuple(c.get("fixed_time_slot")) if c.get("fixed_time_slot") else None
-                    )
-                    for i, c in enumerate(data["courses"])
-                ]
-                # Also populate all_available_courses for course selection
-                self.all_available_courses = self.courses.copy()
-                self.update_courses_table()
-                
-                # Update course selection tab if year is selected
-                if hasattr(self, 'year_selection_combo') and self.year_selection_combo.currentText():
-                    year = int(self.year_selection_combo.currentText())
-                    self.update_available_courses(year)
-            
-            # Load time slots
-            if "time_slots" in data:
-                self.time_slots = [tuple(ts) for ts in data["time_slots"]]
-                self.time_slots_text.setPlainText(json.dumps(data["time_slots"], indent=2))
-            
-            QMessageBox.information(self, "Başarılı", "Veri başarıyla yüklendi!")
-            self.status_label.setText(f"Veri yüklendi: {len(self.courses)} ders, {len(self.rooms)} derslik")
+            dataset = load_dataset(file_name)
+        except DatasetError as e:
+            shown = e.errors[:MAX_SHOWN_ERRORS]
+            if len(e.errors) > len(shown):
+                shown.append(f"... ve {len(e.errors) - len(shown)} hata daha")
+            QMessageBox.critical(self, "Hata", "Veri yüklenemedi:\n" + "\n".join(shown))
+            return
+        
+        if dataset.instructors is not None:
+            self.instructors = dataset.instructors
+            self.update_instructors_table()
+            self.update_instructor_combos()
+        
+        if dataset.rooms is not None:
+            self.rooms = dataset.rooms
+            self.update_rooms_table()
+        
+        if dataset.courses is not None:
+            self.courses = dataset.courses
+            # Also populate all_available_courses for course selection
+            self.all_available_courses = self.courses.copy()
+            self.update_lab_pairs()
+            self.update_courses_table()
             
-        except Exception as e:
-            QMessageBox.critical(self, "Hata", f"Veri yüklenemedi: {e}")
+            # Update course selection tab if year is selected
+            if hasattr(self, 'year_selection_combo') and self.year_selection_combo.currentText():
+                year = int(self.year_selection_combo.currentText())
+                self.update_available_courses(year)
+        
+        if dataset.time_slots is not None:
+            self.time_slots = dataset.time_slots
+            self.time_slots_text.setPlainText(json.dumps([list(ts) for ts in self.time_slots], indent=2))
+        
+        QMessageBox.information(self, "Başarılı", "Veri başarıyla yüklendi!")
+        self.status_label.setText(f"Veri yüklendi: {len(self.courses)} ders, {len(self.rooms)} derslik")
     
     def generate_schedule(self):
         """Generate and display the schedule using the controller."""
@@ -967,21 +1008,72 @@ class BeePlanGUI(QMainWindow):
             QMessageBox.warning(self, "Uyarı", error_msg)
             return
         
-        try:
-            self.status_label.setText("Program oluşturuluyor...")
-            QApplication.processEvents()
-            
-            # Generate schedule through controller (which calls the algorithm)
-            schedule = self.controller.generate_schedule()
-            self.schedule = schedule
-            self.populate_table(schedule)
-            
-            self.status_label.setText("Program başarıyla oluşturuldu!")
-            QMessageBox.information(self, "Başarılı", "Ders programı başarıyla oluşturuldu!")
-            
-        except Exception as e:
-            self.status_label.setText(f"Hata: {str(e)}")
-            QMessageBox.critical(self, "Hata", f"Program oluşturulamadı: {e}")
+        # Generate schedule through controller (which calls the algorithm), off the GUI thread
+        self.start_generation(self.courses, self.status_label, self.on_schedule_generated)
+    
+    def on_schedule_generated(self, schedule):
+        """Show the generated schedule."""
+        self.schedule = schedule
+        self.populate_table(schedule)
+        
+        self.status_label.setText("Program başarıyla oluşturuldu!")
+        QMessageBox.information(self, "Başarılı", "Ders programı başarıyla oluşturuldu!")
+    
+    def start_generation(self, courses, status_label, on_success):
+        """Generate a schedule on a ScheduleWorker; on_success receives the schedule."""
+        if self.schedule_worker is not None:
+            QMessageBox.warning(self, "Uyarı", "Program oluşturma zaten devam ediyor.")
+            return
+        
+        self.generation_status_label = status_label
+        status_label.setText("Program oluşturuluyor...")
+        
+        worker = ScheduleWorker(self.controller, courses, self)
+        worker.progress.connect(self.on_generation_progress)
+        worker.succeeded.connect(on_success)
+        worker.failed.connect(self.on_generation_failed)
+        worker.cancelled.connect(self.on_generation_cancelled)
+        worker.finished.connect(self.on_generation_finished)
+        self.schedule_worker = worker
+        self.set_generation_running(True)
+        worker.start()
+    
+    def set_generation_running(self, running):
+        """Enable the cancel buttons (and disable the generate buttons) while a solve runs."""
+        self.generate_button.setEnabled(not running)
+        self.generate_from_selection_button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+        self.selection_cancel_button.setEnabled(running)
+    
+    def cancel_generation(self):
+        """Stop the running schedule generation."""
+        if self.schedule_worker is not None:
+            self.generation_status_label.setText("İptal ediliyor...")
+            self.schedule_worker.cancel()
+    
+    def on_generation_progress(self, placed, total, nodes_per_second, best_depth):
+        self.generation_status_label.setText(
+            f"Program oluşturuluyor... {placed}/{total} ders yerleşti, "
+            f"en iyi derinlik: {best_depth}, {nodes_per_second:.0f} düğüm/sn"
+        )
+    
+    def on_generation_failed(self, message):
+        self.generation_status_label.setText(f"Hata: {message}")
+        QMessageBox.critical(self, "Hata", f"Program oluşturulamadı: {message}")
+    
+    def on_generation_cancelled(self):
+        self.generation_status_label.setText("Program oluşturma iptal edildi.")
+    
+    def on_generation_finished(self):
+        self.schedule_worker = None
+        self.set_generation_running(False)
+    
+    def closeEvent(self, event):
+        """Stop a running solve before the window closes."""
+        if self.schedule_worker is not None:
+            self.schedule_worker.cancel()
+            self.schedule_worker.wait()
+        super().closeEvent(event)
     
     def validate_data(self):
         """Validate that the required data is loaded."""
@@ -998,12 +1090,16 @@ class BeePlanGUI(QMainWindow):
     
     def populate_table(self, schedule):
         """Populate the table widget with the generated schedule."""
+        blocked = self.schedule_table.blockSignals(True)  # filling cells is not an edit
         self.schedule_table.clear()
+        self.reset_table_cells()
         
         # Get all days and hours
         days = sorted(set(day for day, _ in schedule.keys()))
         hours = sorted(set(hour for _, hour in schedule.keys()), 
                       key=lambda x: (int(x.split(':')[0]), int(x.split(':')[1])))
+        self.table_days = days
+        self.table_hours = hours
         
         # Setup table
         self.schedule_table.setRowCount(len(hours))
@@ -1016,45 +1112,32 @@ class BeePlanGUI(QMainWindow):
         
         # Group courses by their time ranges - find start and end times for each course
         course_sessions = {}  # (course_id, day, room_name) -> [hours]
+        session_rooms = {}  # (course_id, day, room_name) -> room
         
         for (day, hour), entries in schedule.items():
             for course, room in entries:
                 key = (course.course_id, day, room.name)
                 if key not in course_sessions:
                     course_sessions[key] = []
+                    session_rooms[key] = room
                 course_sessions[key].append(hour)
         
+        courses_by_id = {}
+        for c in self.courses + self.all_available_courses:
+            courses_by_id.setdefault(c.course_id, c)
+        
         # Process each course session
         for (course_id, day, room_name), hour_list in course_sessions.items():
             # Sort hours
             hour_list.sort(key=lambda x: (int(x.split(':')[0]), int(x.split(':')[1])))
             
             # Find course object
-            course = None
-            for c in self.courses + self.all_available_courses:
-                if c.course_id == course_id:
-                    course = c
-                    break
-            
+            course = courses_by_id.get(course_id)
             if not course:
                 continue
             
-            # Get start and end hours
-            start_hour = hour_list[0]
-            end_hour = hour_list[-1]
-            
-            # Calculate time range string
-            start_decimal = time_to_decimal(start_hour)
-            end_decimal = time_to_decimal(end_hour) + 1  # Add 1 hour for end time
-            
-            start_h = int(start_decimal)
-            start_m = int((start_decimal % 1) * 60)
-            end_h = int(end_decimal)
-            end_m = int((end_decimal % 1) * 60)
-            
-            time_range = f"{start_h:02d}:{start_m:02d}-{end_h:02d}:{end_m:02d}"
-            
             # Find row for start hour
+            start_hour = hour_list[0]
             if start_hour not in hours:
                 continue
             row = hours.index(start_hour)
@@ -1063,21 +1146,16 @@ class BeePlanGUI(QMainWindow):
             # Check if this cell is already filled (conflict)
             has_conflict = (row, col) in filled_cells
             
-            # Create cell text
-            course_name_short = course.name[:20] if len(course.name) > 20 else course.name
-            num_hours = len(hour_list)
-            cell_text = f"{course.code}\n{course_name_short}\n{room_name}\n{course.instructor}\n{time_range} ({num_hours} saat)"
+            # Remember the session shown in the cell, for manual edits
+            self.table_cells[(row, col)] = [day, hour_list, course, session_rooms[(course_id, day, room_name)],
+                                            has_conflict]
+            self.session_cells.setdefault((course_id, day), []).append((row, col))
             
-            cell_item = QTableWidgetItem(cell_text)
+            cell_item = QTableWidgetItem(self.session_text(course, room_name, hour_list))
             cell_item.setFlags(cell_item.flags() | Qt.ItemIsEditable)
             
             # Color coding
-            if has_conflict:
-                cell_item.setBackground(QColor(255, 200, 200))  # Light red for conflicts
-            elif course.course_type == 'lab':
-                cell_item.setBackground(QColor(200, 255, 200))  # Light green for labs
-            else:
-                cell_item.setBackground(QColor(240, 240, 255))  # Light blue for theory
+            cell_item.setBackground(self.session_color(course, has_conflict))
             
             self.schedule_table.setItem(row, col, cell_item)
             filled_cells.add((row, col))
@@ -1091,10 +1169,7 @@ class BeePlanGUI(QMainWindow):
                         continue_item = QTableWidgetItem("↓")
                         continue_item.setFlags(Qt.NoItemFlags)  # Not editable
                         continue_item.setTextAlignment(Qt.AlignCenter)
-                        if course.course_type == 'lab':
-                            continue_item.setBackground(QColor(200, 255, 200))
-                        else:
-                            continue_item.setBackground(QColor(240, 240, 255))
+                        continue_item.setBackground(self.session_color(course))
                         self.schedule_table.setItem(next_row, col, continue_item)
                         filled_cells.add((next_row, col))
         
@@ -1109,12 +1184,152 @@ class BeePlanGUI(QMainWindow):
         # Resize columns
         self.schedule_table.resizeColumnsToContents()
         self.schedule_table.resizeRowsToContents()
+        self.schedule_table.blockSignals(blocked)
+        
+        # Validate once; edits then only re-check what they touch
+        self.schedule_validator = IncrementalValidator(schedule, self.courses + self.all_available_courses,
+                                                       self.instructors)
+        self.update_violation_flags([], self.schedule_validator.all_violations())
+    
+    def reset_table_cells(self):
+        """Forget the sessions and violation flags of the schedule table."""
+        self.table_days = []
+        self.table_hours = []
+        self.table_cells = {}  # (row, col) -> [day, hours, course, room, overlapped]
+        self.session_cells = {}  # (course_id, day) -> [(row, col)] of its sessions
+        self.cell_violations = {}  # (row, col) -> [Violation]
+        self.violation_cells = {}  # Violation -> [[(row, col)]], one list per occurrence
+    
+    def session_text(self, course, room_name, hour_list):
+        """Cell text of a course session: code, name, room, instructor and time range."""
+        start_decimal = time_to_decimal(hour_list[0])
+        end_decimal = time_to_decimal(hour_list[-1]) + 1  # Add 1 hour for end time
+        
+        start_h = int(start_decimal)
+        start_m = int((start_decimal % 1) * 60)
+        end_h = int(end_decimal)
+        end_m = int((end_decimal % 1) * 60)
+        
+        time_range = f"{start_h:02d}:{start_m:02d}-{end_h:02d}:{end_m:02d}"
+        course_name_short = course.name[:20] if len(course.name) > 20 else course.name
+        return f"{course.code}\n{course_name_short}\n{room_name}\n{course.instructor}\n{time_range} ({len(hour_list)} saat)"
+    
+    def session_color(self, course, has_conflict=False):
+        """Background of a course session cell."""
+        if has_conflict:
+            return QColor(255, 200, 200)  # Light red for conflicts
+        if course is None:
+            return QColor(255, 255, 255)
+        if course.course_type == 'lab':
+            return QColor(200, 255, 200)  # Light green for labs
+        return QColor(240, 240, 255)  # Light blue for theory
     
     def on_cell_changed(self, row, col):
-        """Handle manual cell editing."""
-        # This allows manual editing of the schedule
-        # No popup message - silent editing
-        pass
+        """Apply a manual edit of a course cell and flag what it breaks or fixes.
+        
+        The first line of the cell is the course code and the third the room
+        (kept if left out); an emptied cell frees its hours. Only the
+        violations touching the changed hours are re-checked.
+        """
+        cell = self.table_cells.get((row, col))
+        item = self.schedule_table.item(row, col)
+        if cell is None or item is None or self.schedule_validator is None:
+            return
+        day, hour_list, course, room, _ = cell
+        
+        lines = [line.strip() for line in item.text().split("\n")]
+        new_course, new_room = None, None
+        if lines[0]:
+            new_course = next((c for c in self.courses + self.all_available_courses if c.code == lines[0]), None)
+            room_name = lines[2] if len(lines) > 2 and lines[2] else (room.name if room else "")
+            new_room = next((r for r in self.rooms if r.name == room_name), None)
+            if new_course is None or new_room is None:
+                self.status_label.setText(f"Bilinmeyen ders veya derslik: {lines[0]} / {room_name}")
+                self.show_cell(row, col)
+                return
+        if new_course is course and new_room is room:
+            self.show_cell(row, col)
+            return
+        
+        slots = [(day, hour) for hour in hour_list]
+        resolved, introduced = self.schedule_validator.edit(
+            [(course, room, slots)] if course else [],
+            [(new_course, new_room, slots)] if new_course else [])
+        if course:
+            self.session_cells[(course.course_id, day)].remove((row, col))
+        if new_course:
+            self.session_cells.setdefault((new_course.course_id, day), []).append((row, col))
+        cell[2], cell[3] = new_course, new_room
+        if getattr(self.schedule, "placements", None):
+            self.schedule.placements = []  # blocks are rebuilt from the edited hours
+        
+        self.show_cell(row, col)
+        self.update_violation_flags(resolved, introduced)
+        self.status_label.setText(
+            f"Program düzenlendi: {len(self.schedule_validator.all_violations())} ihlal")
+    
+    def show_cell(self, row, col):
+        """Redraw a session cell, and its continuation cells, from the table records."""
+        day, hour_list, course, room, _ = self.table_cells[(row, col)]
+        blocked = self.schedule_table.blockSignals(True)
+        item = self.schedule_table.item(row, col)
+        item.setText(self.session_text(course, room.name, hour_list) if course else "")
+        for hour in hour_list[1:]:
+            if hour in self.table_hours:
+                next_row = self.table_hours.index(hour)
+                next_item = self.schedule_table.item(next_row, col)
+                if (next_row, col) not in self.table_cells and next_item is not None:
+                    next_item.setText("↓" if course else "")
+                    next_item.setBackground(self.session_color(course))
+        self.style_cell(row, col)
+        self.schedule_table.blockSignals(blocked)
+    
+    def style_cell(self, row, col):
+        """Color a session cell by its violations (listed in the tooltip) or its course type."""
+        item = self.schedule_table.item(row, col)
+        if item is None:
+            return
+        violations = self.cell_violations.get((row, col))
+        if violations:
+            item.setBackground(QColor(255, 150, 150))  # Red for broken constraints
+            item.setToolTip("\n".join(self.describe_violation(violation) for violation in violations))
+        else:
+            _, _, course, _, has_conflict = self.table_cells[(row, col)]
+            item.setBackground(self.session_color(course, has_conflict))
+            item.setToolTip("")
+    
+    def violation_cell_list(self, violation):
+        """Session cells of the courses a violation involves, on its day (and hour)."""
+        cells = []
+        for course in violation.courses:
+            for cell in self.session_cells.get((course.course_id, violation.day), []):
+                if cell not in cells and (violation.hour is None or violation.hour in self.table_cells[cell][1]):
+                    cells.append(cell)
+        return cells
+    
+    def update_violation_flags(self, resolved, introduced):
+        """Unflag the cells of resolved violations and flag those of introduced ones."""
+        changed = set()
+        for violation in resolved:
+            occurrences = self.violation_cells.get(violation)
+            if not occurrences:
+                continue
+            for cell in occurrences.pop():
+                self.cell_violations[cell].remove(violation)
+                changed.add(cell)
+            if not occurrences:
+                del self.violation_cells[violation]
+        for violation in introduced:
+            cells = self.violation_cell_list(violation)
+            self.violation_cells.setdefault(violation, []).append(cells)
+            for cell in cells:
+                self.cell_violations.setdefault(cell, []).append(violation)
+                changed.add(cell)
+        
+        blocked = self.schedule_table.blockSignals(True)
+        for row, col in changed:
+            self.style_cell(row, col)
+        self.schedule_table.blockSignals(blocked)
     
     def save_schedule(self):
         """Save the current schedule to a JSON file."""
@@ -1155,6 +1370,8 @@ class BeePlanGUI(QMainWindow):
         """Clear the current schedule."""
         self.schedule_table.clear()
         self.schedule = {}
+        self.schedule_validator = None
+        self.reset_table_cells()
         self.status_label.setText("Program temizlendi.")
     
     def view_report(self):
@@ -1191,7 +1408,7 @@ class BeePlanGUI(QMainWindow):
             report_lines.append("=" * 60 + "\n\n")
             
             for i, violation in enumerate(violations, 1):
-                report_lines.append(f"{i}. {violation}\n")
+                report_lines.append(f"{i}. {self.describe_violation(violation)}\n")
             
             report_text.setPlainText("\n".join(report_lines))
             report_text.setStyleSheet("background-color: #FFF3E0;")
@@ -1206,118 +1423,51 @@ class BeePlanGUI(QMainWindow):
         report_dialog.exec_()
     
     def validate_schedule(self):
-        """Validate the current schedule and return list of violations."""
-        violations = []
-        
+        """Validate the current schedule and return its violations."""
         if not self.schedule:
-            return violations
-        
-        # Create instructors dictionary
-        instructors_dict = {}
-        for inst in self.instructors:
-            instructors_dict[inst.name] = inst
-        
-        # Check for various violations
-        from scheduler import (
-            is_exam_block, exceeds_daily_theory_limit, has_instructor_conflict,
-            has_room_conflict, has_year_mandatory_conflict, has_elective_conflict,
-            is_lab_after_theory, is_valid_room_for_course, time_to_decimal
-        )
-        
-        # Track instructor daily hours
-        instructor_daily_hours = {}
-        
-        # Check each time slot
-        for (day, hour), entries in self.schedule.items():
-            # Check for multiple courses in same slot (room/instructor conflicts)
-            if len(entries) > 1:
-                course_codes = [e[0].code for e in entries]
-                violations.append(
-                    f"Çakışma: {day} {hour} - Aynı zaman diliminde birden fazla ders: {', '.join(course_codes)}"
-                )
-            
-            for course, room in entries:
-                # Check exam block
-                if is_exam_block(day, hour):
-                    violations.append(
-                        f"Sınav Bloğu İhlali: {course.code} - Cuma 13:20-15:10 arası planlanamaz ({day} {hour})"
-                    )
-                
-                # Check room capacity and type
-                if not is_valid_room_for_course(room, course):
-                    if course.course_type == 'lab' and room.room_type != 'lab':
-                        violations.append(
-                            f"Kapasite/Tip Hatası: {course.code} - Lab dersi lab dersliğinde olmalı (Derslik: {room.name})"
-                        )
-                    elif course.course_type == 'lab' and room.capacity < course.capacity:
-                        violations.append(
-                            f"Kapasite Hatası: {course.code} - Derslik kapasitesi yetersiz "
-                            f"(Gerekli: {course.capacity}, Mevcut: {room.capacity}, Derslik: {room.name})"
-                        )
-                
-                # Check instructor daily theory limit
-                if course.course_type == 'theory':
-                    instructor_obj = instructors_dict.get(course.instructor)
-                    if instructor_obj:
-                        day_key = (day, course.instructor)
-                        if day_key not in instructor_daily_hours:
-                            instructor_daily_hours[day_key] = 0
-                        instructor_daily_hours[day_key] += course.theory_hours or course.hours
-                        
-                        if instructor_daily_hours[day_key] > instructor_obj.max_daily_theory_hours:
-                            violations.append(
-                                f"Öğretim Elemanı Sınırı: {course.instructor} - {day} günü "
-                                f"{instructor_daily_hours[day_key]} saat teorik ders "
-                                f"(Maksimum: {instructor_obj.max_daily_theory_hours} saat)"
-                            )
-                
-                # Check lab after theory
-                if course.course_type == 'lab':
-                    if not is_lab_after_theory(course, self.schedule, day, hour, self.courses + self.all_available_courses):
-                        violations.append(
-                            f"Lab Sıralama: {course.code} - Lab dersi teorik dersinden önce planlanamaz ({day} {hour})"
-                        )
-                
-                # Check for instructor conflicts (same instructor, different courses)
-                for other_course, _ in entries:
-                    if other_course.course_id != course.course_id and other_course.instructor == course.instructor:
-                        violations.append(
-                            f"Öğretim Elemanı Çakışması: {course.instructor} - "
-                            f"Aynı anda iki ders ({course.code} ve {other_course.code}) - {day} {hour}"
-                        )
-                
-                # Check for room conflicts
-                for other_course, other_room in entries:
-                    if other_course.course_id != course.course_id and other_room.name == room.name:
-                        violations.append(
-                            f"Derslik Çakışması: {room.name} - "
-                            f"Aynı anda iki ders ({course.code} ve {other_course.code}) - {day} {hour}"
-                        )
-                
-                # Check for same year mandatory conflicts
-                for other_course, _ in entries:
-                    if (other_course.course_id != course.course_id and
-                        other_course.year == course.year and
-                        course.is_mandatory and other_course.is_mandatory):
-                        violations.append(
-                            f"Aynı Sınıf Zorunlu Ders Çakışması: {course.code} ve {other_course.code} "
-                            f"({course.year}. sınıf) - {day} {hour}"
-                        )
-                
-                # Check for 3rd year courses and electives conflict
-                for other_course, _ in entries:
-                    if other_course.course_id != course.course_id:
-                        # 3rd year courses should not overlap with electives
-                        if ((course.year == 3 and not other_course.is_mandatory) or
-                            (other_course.year == 3 and not course.is_mandatory)):
-                            violations.append(
-                                f"3. Sınıf Ders-Seçmeli Çakışması: {course.code} (Yıl {course.year}, "
-                                f"{'Zorunlu' if course.is_mandatory else 'Seçmeli'}) ve "
-                                f"{other_course.code} (Yıl {other_course.year}, "
-                                f"{'Zorunlu' if other_course.is_mandatory else 'Seçmeli'}) - {day} {hour}"
-                            )
-        
-        return violations
+            return []
+        if self.schedule_validator is not None and self.schedule_validator.schedule is self.schedule:
+            return self.schedule_validator.all_violations()  # kept current through manual edits
+        return find_violations(self.schedule, self.instructors, self.courses + self.all_available_courses)
+    
+    def describe_violation(self, violation):
+        """Report line for a scheduler.Violation."""
+        codes = [course.code for course in violation.courses]
+        where = f"{violation.day} {violation.hour}"
+        if violation.kind == EXAM_BLOCK:
+            return f"Sınav Bloğu İhlali: {codes[0]} - Cuma 13:20-15:10 arası planlanamaz ({where})"
+        if violation.kind == FIXED_TIME_SLOT:
+            fixed_day, fixed_hour = violation.courses[0].fixed_time_slot
+            return f"Sabit Saat İhlali: {codes[0]} - {fixed_day} {fixed_hour} saatinde olmalı ({where})"
+        if violation.kind == ROOM_TYPE:
+            return f"Kapasite/Tip Hatası: {codes[0]} - Lab dersi lab dersliğinde olmalı (Derslik: {violation.room.name})"
+        if violation.kind == ROOM_CAPACITY:
+            return (f"Kapasite Hatası: {codes[0]} - Derslik kapasitesi yetersiz "
+                    f"(Gerekli: {violation.courses[0].capacity}, Mevcut: {violation.room.capacity}, "
+                    f"Derslik: {violation.room.name})")
+        if violation.kind == DAILY_THEORY_LIMIT:
+            return (f"Öğretim Elemanı Sınırı: {violation.instructor} - {violation.day} günü "
+                    f"{violation.hours} saat teorik ders (Maksimum: {violation.limit} saat)")
+        if violation.kind == LAB_BEFORE_THEORY:
+            if len(codes) == 1:
+                return f"Lab Sıralama: {codes[0]} - Teorik dersi bulunamadı ({where})"
+            return f"Lab Sıralama: {codes[0]} - Lab dersi teorik dersinden ({codes[1]}) sonra olmalı ({where})"
+        if violation.kind == INSTRUCTOR_CONFLICT:
+            return (f"Öğretim Elemanı Çakışması: {violation.instructor} - "
+                    f"Aynı anda iki ders ({codes[0]} ve {codes[1]}) - {where}")
+        if violation.kind == ROOM_CONFLICT:
+            return (f"Derslik Çakışması: {violation.room.name} - "
+                    f"Aynı anda iki ders ({codes[0]} ve {codes[1]}) - {where}")
+        if violation.kind == YEAR_MANDATORY_CONFLICT:
+            return (f"Aynı Sınıf Zorunlu Ders Çakışması: {codes[0]} ve {codes[1]} "
+                    f"({violation.courses[0].year}. sınıf) - {where}")
+        if violation.kind == ELECTIVE_CONFLICT:
+            course, other = violation.courses
+            return (f"Seçmeli Ders Çakışması: {course.code} (Yıl {course.year}, "
+                    f"{'Zorunlu' if course.is_mandatory else 'Seçmeli'}) ve "
+                    f"{other.code} (Yıl {other.year}, "
+                    f"{'Zorunlu' if other.is_mandatory else 'Seçmeli'}) - {where}")
+        return str(violation)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,440 @@
+"""
+BeePlan - Soft-constraint optimization
+A third scheduling engine next to generate_schedule and the local search.
+The hard constraints stay hard; among the schedules that satisfy them it
+looks for the one with the lowest weighted cost on the soft criteria
+(instructor gaps, students' daily spread, late hours, room over-capacity
+and, optionally, rule 6 on CENG/SENG electives). Depth-first
+branch-and-bound: a branch is cut as soon as a lower bound on every
+schedule below it is no better than the best schedule found so far, so
+the alternatives are never enumerated one by one.
+"""
+
+import time
+from collections import defaultdict
+from typing import List, Tuple, Optional, Dict
+
+from scheduler import (Course, Instructor, Room, Schedule, ScheduleCancelled, ScheduleState,
+                       StaticFeasibility, CourseDomains, TimeGrid, build_constraint_graph,
+                       is_valid_room_for_course)
+
+
+# Cost of one hour of each soft criterion
+DEFAULT_WEIGHTS = {
+    "instructor_gaps": 1.0,   # idle hours between an instructor's classes on a day
+    "student_gaps": 1.0,      # idle hours between a year's mandatory classes on a day
+    "late_hours": 0.5,        # class hours starting at or after the late hour
+    "over_capacity": 2.0,     # theory hours in a room smaller than the course capacity
+    "elective_overlap": 5.0,  # hours a CENG and a SENG elective overlap (soft_electives only)
+}
+
+LATE_HOUR = "16:00"
+
+OTHER_ELECTIVE_DEPARTMENT = {"CENG": "SENG", "SENG": "CENG"}
+
+
+def day_gaps(minutes):
+    """Idle hours between the first and the last of a day's occupied hour slots."""
+    if not minutes:
+        return 0
+    return (max(minutes) - min(minutes)) // 60 + 1 - len(minutes)
+
+
+def resolve_weights(weights=None):
+    """DEFAULT_WEIGHTS updated with weights; unknown criteria are an error."""
+    weights = weights or {}
+    unknown = set(weights) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Unknown soft criteria: {sorted(unknown)} (expected {sorted(DEFAULT_WEIGHTS)}).")
+    return dict(DEFAULT_WEIGHTS, **weights)
+
+
+def score_schedule(schedule, weights=None, late_hour: str = LATE_HOUR) -> Dict[str, float]:
+    """
+    Measure the soft criteria of a schedule.
+
+    Returns the number of hours of every criterion in DEFAULT_WEIGHTS plus
+    "total", the weighted sum. Students are grouped by year (the mandatory
+    courses of a year, as in the hard rule); elective overlaps are counted
+    per pair of overlapping CENG and SENG electives and hour.
+    """
+    weights = resolve_weights(weights)
+    late_minute = TimeGrid.to_minutes(late_hour)
+    scores = dict.fromkeys(DEFAULT_WEIGHTS, 0)
+    instructor_minutes = defaultdict(set)  # (instructor, day) -> start minutes
+    year_minutes = defaultdict(set)  # (year, day) -> start minutes
+    for (day, hour), entries in schedule.items():
+        minute = TimeGrid.to_minutes(hour)
+        electives = defaultdict(int)
+        for course, room in entries:
+            instructor_minutes[(course.instructor, day)].add(minute)
+            if course.is_mandatory:
+                year_minutes[(course.year, day)].add(minute)
+            else:
+                electives[course.department] += 1
+            if minute >= late_minute:
+                scores["late_hours"] += 1
+            if course.course_type == 'theory' and room is not None and room.capacity < course.capacity:
+                scores["over_capacity"] += 1
+        scores["elective_overlap"] += electives["CENG"] * electives["SENG"]
+    scores["instructor_gaps"] = sum(day_gaps(minutes) for minutes in instructor_minutes.values())
+    scores["student_gaps"] = sum(day_gaps(minutes) for minutes in year_minutes.values())
+    scores["total"] = sum(weights[name] * scores[name] for name in DEFAULT_WEIGHTS)
+    return scores
+
+
+class BranchAndBound:
+    """Depth-first branch-and-bound over course sections.
+
+    A value is a time candidate (StaticFeasibility.time_candidates) plus a
+    room group: rooms of the same type and capacity are interchangeable for
+    every constraint and criterion, so the search only counts how many of a
+    group are in use per slot and concrete rooms are handed out at the end
+    (any block fits, as in interval colouring). The search is ordered like
+    generate_schedule's mrv mode with forward checking, and the values of a
+    course are tried cheapest lower bound first.
+
+    The lower bound of a partial schedule adds up
+    - the cost of the placed blocks that later placements cannot lower
+      (late hours, over-capacity, elective overlaps),
+    - per instructor and per year: the idle hours so far, less the hours
+      still to be placed for it (each placed hour fills at most one gap),
+    - per unplaced section: its cheapest late/over-capacity cost.
+    None of these can overestimate, so pruning never loses the optimum.
+    """
+    def __init__(self, courses, rooms, time_slots, instructors_dict=None, weights=None,
+                 soft_electives=False, late_hour=LATE_HOUR):
+        self.state = state = ScheduleState(courses, rooms, time_slots, instructors_dict,
+                                           soft_electives=soft_electives)
+        self.weights = weights = resolve_weights(weights)
+        self.candidates = StaticFeasibility(state).time_candidates()
+        self.domains = CourseDomains(state, self.candidates)
+        self.neighbours = build_constraint_graph(courses)
+        n_slots = len(state.slots)
+
+        # Room groups: identical rooms
+        group_ids = {}
+        self.group_rooms = []  # group -> room indexes
+        for room_idx, room in enumerate(rooms):
+            group = group_ids.setdefault((room.room_type, room.capacity), len(group_ids))
+            if group == len(self.group_rooms):
+                self.group_rooms.append([])
+            self.group_rooms[group].append(room_idx)
+        self.n_groups = len(self.group_rooms)
+        self.group_usage = [0] * (n_slots * self.n_groups)  # slot * groups + group -> blocks
+
+        # Placement costs that do not depend on other placements
+        late_minute = TimeGrid.to_minutes(late_hour)
+        self.late_cost = []  # course index -> candidate -> cost
+        self.group_cost = []  # course index -> [(group, cost)], cheapest first
+        self.min_cost = []  # course index -> cheapest cost of one section
+        for course_idx, course in enumerate(courses):
+            late = [weights["late_hours"] * sum(1 for slot_id in slot_ids if state.slot_minute[slot_id] >= late_minute)
+                    for slot_ids, _ in self.candidates[course_idx]]
+            group_cost = []
+            for group, members in enumerate(self.group_rooms):
+                room = rooms[members[0]]
+                if not is_valid_room_for_course(room, course):
+                    continue
+                over = course.course_type == 'theory' and room.capacity < course.capacity
+                hours = len(self.candidates[course_idx][0][0]) if self.candidates[course_idx] else 0
+                group_cost.append((group, weights["over_capacity"] * hours if over else 0.0))
+            group_cost.sort(key=lambda item: item[1])
+            self.late_cost.append(late)
+            self.group_cost.append(group_cost)
+            self.min_cost.append(min(late, default=0.0) + (group_cost[0][1] if group_cost else 0.0))
+
+        # Gap groups: instructors, then the mandatory courses of every year
+        n_instructors = max(state.course_instructor, default=-1) + 1
+        year_groups = {}
+        self.course_gap_groups = []
+        for course_idx, course in enumerate(courses):
+            gap_groups = [state.course_instructor[course_idx]]
+            if course.is_mandatory:
+                gap_groups.append(n_instructors + year_groups.setdefault(course.year, len(year_groups)))
+            self.course_gap_groups.append(gap_groups)
+        n_gap_groups = n_instructors + len(year_groups)
+        self.gap_weight = [weights["instructor_gaps"]] * n_instructors + [weights["student_gaps"]] * len(year_groups)
+        self.day_minutes = [[] for _ in range(n_gap_groups * state.n_days)]  # group * days + day
+        self.gaps = [0] * n_gap_groups  # idle hours so far
+        self.remaining = [0] * n_gap_groups  # hours still to be placed
+        for course_idx, course in enumerate(courses):
+            if self.candidates[course_idx]:
+                for group in self.course_gap_groups[course_idx]:
+                    self.remaining[group] += len(self.candidates[course_idx][0][0]) * course.sections
+
+        self.elective_department = [
+            course.department if soft_electives and not course.is_mandatory and
+            course.department in OTHER_ELECTIVE_DEPARTMENT else None
+            for course in courses
+        ]
+        self.electives_at = {department: [0] * n_slots for department in OTHER_ELECTIVE_DEPARTMENT}
+
+        self.fixed_cost = 0.0  # placed cost later placements cannot lower
+        self.gap_bound = 0.0  # weighted sum of max(0, gaps - remaining)
+        self.unplaced_cost = sum(self.min_cost[i] * course.sections for i, course in enumerate(courses))
+        self.placed = [course.sections < 1 for course in courses]
+        self.picks = [[] for _ in courses]  # course index -> (candidate, group) per placed section
+        self.assignment = []  # (course index, slot ids, group)
+        self.n_sections = sum(course.sections for course in courses)
+
+        self.best = None
+        self.best_cost = float("inf")
+        self.nodes = 0
+        self.complete = False  # True once the whole tree has been searched
+
+    # --- Cost bookkeeping ----------------------------------------------
+
+    def gap_term(self, group, gaps, remaining):
+        return self.gap_weight[group] * max(0, gaps - remaining)
+
+    def overlap_hours(self, course_idx, slot_ids):
+        department = self.elective_department[course_idx]
+        if department is None:
+            return 0
+        electives_at = self.electives_at[OTHER_ELECTIVE_DEPARTMENT[department]]
+        return sum(electives_at[slot_id] for slot_id in slot_ids)
+
+    def child_bound(self, course_idx, candidate, group_cost):
+        """Lower bound after placing one section of course_idx at candidate."""
+        state = self.state
+        slot_ids = self.candidates[course_idx][candidate][0]
+        day_id = state.slot_day[slot_ids[0]]
+        hours = len(slot_ids)
+        bound = (self.fixed_cost + self.late_cost[course_idx][candidate] + group_cost +
+                 self.weights["elective_overlap"] * self.overlap_hours(course_idx, slot_ids) +
+                 self.unplaced_cost - self.min_cost[course_idx] + self.gap_bound)
+        for group in self.course_gap_groups[course_idx]:
+            minutes = self.day_minutes[group * state.n_days + day_id]
+            gaps = self.gaps[group] - day_gaps(minutes) + day_gaps(
+                minutes + [state.slot_minute[slot_id] for slot_id in slot_ids])
+            bound += (self.gap_term(group, gaps, self.remaining[group] - hours) -
+                      self.gap_term(group, self.gaps[group], self.remaining[group]))
+        return bound
+
+    def apply(self, course_idx, candidate, group, group_cost):
+        """Place one section; returns what undo() needs."""
+        state = self.state
+        slot_ids = self.candidates[course_idx][candidate][0]
+        day_id = state.slot_day[slot_ids[0]]
+        saved = (self.fixed_cost, self.gap_bound, self.unplaced_cost, list(self.gaps), list(self.remaining))
+        self.fixed_cost += (self.late_cost[course_idx][candidate] + group_cost +
+                            self.weights["elective_overlap"] * self.overlap_hours(course_idx, slot_ids))
+        self.unplaced_cost -= self.min_cost[course_idx]
+        for group_id in self.course_gap_groups[course_idx]:
+            minutes = self.day_minutes[group_id * state.n_days + day_id]
+            old_term = self.gap_term(group_id, self.gaps[group_id], self.remaining[group_id])
+            self.gaps[group_id] -= day_gaps(minutes)
+            minutes.extend(state.slot_minute[slot_id] for slot_id in slot_ids)
+            self.gaps[group_id] += day_gaps(minutes)
+            self.remaining[group_id] -= len(slot_ids)
+            self.gap_bound += self.gap_term(group_id, self.gaps[group_id], self.remaining[group_id]) - old_term
+        department = self.elective_department[course_idx]
+        for slot_id in slot_ids:
+            self.group_usage[slot_id * self.n_groups + group] += 1
+            if department is not None:
+                self.electives_at[department][slot_id] += 1
+        mark = state.mark()
+        state.place(course_idx, slot_ids, -1)
+        picks = self.picks[course_idx]
+        picks.append((candidate, group))
+        self.placed[course_idx] = len(picks) == state.courses[course_idx].sections
+        self.assignment.append((course_idx, slot_ids, group))
+        return saved, mark
+
+    def undo(self, course_idx, candidate, group, record):
+        state = self.state
+        saved, mark = record
+        self.fixed_cost, self.gap_bound, self.unplaced_cost, self.gaps, self.remaining = saved
+        slot_ids = self.candidates[course_idx][candidate][0]
+        day_id = state.slot_day[slot_ids[0]]
+        for group_id in self.course_gap_groups[course_idx]:
+            del self.day_minutes[group_id * state.n_days + day_id][-len(slot_ids):]
+        department = self.elective_department[course_idx]
+        for slot_id in slot_ids:
+            self.group_usage[slot_id * self.n_groups + group] -= 1
+            if department is not None:
+                self.electives_at[department][slot_id] -= 1
+        state.restore(mark)
+        self.picks[course_idx].pop()
+        self.placed[course_idx] = False
+        self.assignment.pop()
+
+    # --- Search --------------------------------------------------------
+
+    def select_course(self):
+        """Unplaced course with the fewest live options, then the most unplaced neighbours."""
+        state = self.state
+        best = None
+        best_key = None
+        for course_idx, course in enumerate(state.courses):
+            if self.placed[course_idx]:
+                continue
+            theory_idx = state.lab_theory[course_idx]
+            if course.course_type == 'lab' and theory_idx >= 0 and not self.placed[theory_idx]:
+                continue
+            options = self.domains.size(course_idx)
+            if options == 0:
+                return course_idx
+            degree = sum(1 for other in self.neighbours[course_idx] if not self.placed[other])
+            key = (options, -degree, course_idx)
+            if best_key is None or key < best_key:
+                best, best_key = course_idx, key
+        return best
+
+    def values(self, course_idx):
+        """(bound, candidate, group, cost) of the placements still worth trying, best first."""
+        state = self.state
+        picks = self.picks[course_idx]
+        last = picks[-1] if picks else (-1, -1)  # sections take values in increasing order
+        values = []
+        for candidate in range(max(last[0], 0), len(self.candidates[course_idx])):
+            slot_ids = self.candidates[course_idx][candidate][0]
+            if not self.domains.contains(course_idx, candidate) or not state.can_place(course_idx, slot_ids, -1):
+                continue
+            for group, group_cost in self.group_cost[course_idx]:
+                if (candidate, group) <= last:
+                    continue
+                size = len(self.group_rooms[group])
+                if any(self.group_usage[slot_id * self.n_groups + group] >= size for slot_id in slot_ids):
+                    continue
+                bound = self.child_bound(course_idx, candidate, group_cost)
+                if bound < self.best_cost:
+                    values.append((bound, candidate, group, group_cost))
+        values.sort(key=lambda value: value[:3])
+        return values
+
+    def branch(self, deadline, cancel_token):
+        """Search the whole tree; False once the budget is spent.
+
+        Every level places one section. The open levels are kept on an
+        explicit stack of [course index, values left, applied value] rather
+        than the call stack, so the number of sections is not bounded by
+        Python's recursion limit.
+        """
+        levels = []
+        try:
+            descend = True
+            while True:
+                if descend:
+                    if cancel_token is not None and cancel_token.is_set():
+                        raise ScheduleCancelled("Schedule generation was cancelled.")
+                    if deadline is not None and time.monotonic() > deadline:
+                        return False
+                    self.nodes += 1
+                    if len(levels) == self.n_sections:
+                        cost = self.fixed_cost + sum(weight * gaps for weight, gaps in zip(self.gap_weight, self.gaps))
+                        if cost < self.best_cost:
+                            self.best_cost = cost
+                            self.best = list(self.assignment)
+                    else:
+                        course_idx = self.select_course()
+                        levels.append([course_idx, iter(self.values(course_idx)), None])
+                if not levels:
+                    return True
+                descend = self.advance(levels[-1])
+                if not descend:
+                    levels.pop()
+        finally:
+            for level in reversed(levels):
+                self.retract(level)
+
+    def advance(self, level):
+        """Replace the level's applied value by its next one; False once none is left."""
+        self.retract(level)
+        course_idx, values, _ = level
+        for bound, candidate, group, group_cost in values:
+            if bound >= self.best_cost:
+                break  # a better schedule was found meanwhile
+            record = self.apply(course_idx, candidate, group, group_cost)
+            level[2] = (candidate, group, record, self.domains.mark())
+            unplaced = [i for i, done in enumerate(self.placed) if not done]
+            if self.domains.prune(course_idx, self.candidates[course_idx][candidate][0], unplaced):
+                return True
+            self.retract(level)
+        return False
+
+    def retract(self, level):
+        """Undo the level's applied value, if any."""
+        if level[2] is not None:
+            candidate, group, record, domain_mark = level[2]
+            self.domains.restore(domain_mark)
+            self.undo(level[0], candidate, group, record)
+            level[2] = None
+
+    def run(self, time_limit=None, cancel_token=None):
+        """Search until the tree is exhausted or time_limit seconds have passed."""
+        deadline = time.monotonic() + time_limit if time_limit is not None else None
+        if all(self.domains.alive):
+            self.complete = self.branch(deadline, cancel_token)
+        else:
+            self.complete = True
+        return self.best is not None
+
+    def to_schedule(self):
+        """Build the best schedule, giving every block a room of its group."""
+        state = self.state
+        busy = [0] * len(state.rooms)
+        rooms = [None] * len(self.best)
+        order = sorted(range(len(self.best)),
+                       key=lambda i: (state.slot_day[self.best[i][1][0]], state.slot_minute[self.best[i][1][0]]))
+        for i in order:
+            _, slot_ids, group = self.best[i]
+            bits = 0
+            for slot_id in slot_ids:
+                bits |= 1 << slot_id
+            # Blocks are processed by start time, so a room free at the start stays free
+            room_idx = next(r for r in self.group_rooms[group] if not busy[r] & bits)
+            busy[room_idx] |= bits
+            rooms[i] = state.rooms[room_idx]
+        schedule = defaultdict(list)
+        placements = []
+        for (course_idx, slot_ids, _), room in zip(self.best, rooms):
+            course = state.courses[course_idx]
+            slots = [state.slots[slot_id] for slot_id in slot_ids]
+            for slot in slots:
+                schedule[slot].append((course, room))
+            placements.append((course, room, slots))
+        return Schedule(schedule, placements=placements)
+
+
+def optimize_schedule(courses: List[Course], rooms: List[Room], time_slots: List[Tuple[str, str]],
+                      instructors: List[Instructor] = None, weights: Optional[Dict[str, float]] = None,
+                      time_limit: Optional[float] = 10.0, soft_electives: bool = False,
+                      late_hour: str = LATE_HOUR, cancel_token=None):
+    """
+    Generates the schedule with the lowest soft-constraint cost.
+    Returns the best schedule found within time_limit (the optimum if the
+    search finishes), otherwise raises RuntimeError. See score_schedule for
+    the criteria; weights overrides entries of DEFAULT_WEIGHTS.
+
+    With soft_electives=True rule 6 is no longer a hard constraint: CENG and
+    SENG electives may overlap, every overlapping hour costing
+    weights["elective_overlap"].
+
+    Args:
+        courses: List of Course objects
+        rooms: List of Room objects
+        time_slots: List of (day, hour) tuples, e.g., [("Monday", "09:00"), ...]
+        instructors: Optional list of Instructor objects for constraint checking
+        weights: Optional {criterion: cost per hour} overrides
+        time_limit: Wall-clock limit in seconds (None searches to the end)
+        soft_electives: Treat rule 6 as a weighted objective
+        late_hour: Hours starting at or after this count as late
+        cancel_token: Optional object with is_set(); once set, ScheduleCancelled is raised
+
+    Returns:
+        Dictionary mapping (day, hour) to list of (course, room) tuples
+    """
+    if not courses or not rooms or not time_slots:
+        raise ValueError("Courses, rooms, and time slots must be non-empty lists.")
+
+    instructors_dict = {inst.name: inst for inst in instructors} if instructors else {}
+    search = BranchAndBound(courses, rooms, time_slots, instructors_dict, weights,
+                            soft_electives, late_hour)
+    if search.run(time_limit, cancel_token):
+        return search.to_schedule()
+
+    if search.complete:
+        raise RuntimeError("No valid schedule could be generated with the given constraints.")
+    raise RuntimeError("No valid schedule could be found within the search budget.")
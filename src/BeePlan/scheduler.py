@@ -11,8 +11,17 @@ CONSTRAINTS & RULES (Hard Constraints):
 6. CENG ve SENG seçmeli derslerinin çakışmaması önceliği.
 """
 
-from collections import defaultdict
-from typing import List, Dict, Tuple, Optional
+import random
+import sys
+import time
+from collections import Counter, OrderedDict, defaultdict
+from itertools import combinations, groupby
+from typing import List, Dict, NamedTuple, Tuple, Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; StaticFeasibility falls back to bytearrays
+    np = None
 
 
 class Course:
@@ -25,7 +34,7 @@ class Course:
         self.name = name
         self.instructor = instructor
         self.hours = hours  # Weekly hours (kept for backward compatibility)
-        self.course_type = course_type.lower()  # 'theory' or 'lab'
+        self.course_type = sys.intern(course_type.lower())  # 'theory' or 'lab'
         self.year = year  # 1, 2, 3, 4
         self.is_mandatory = is_mandatory  # True for mandatory, False for elective
         self.sections = sections  # Number of sections
@@ -96,7 +105,7 @@ class Room:
         self.room_id = room_id
         self.name = name
         self.capacity = capacity
-        self.room_type = room_type.lower()  # 'theory' or 'lab'
+        self.room_type = sys.intern(room_type.lower())  # 'theory' or 'lab'
         
     def __repr__(self):
         return f"{self.name} ({self.room_type}, cap:{self.capacity})"
@@ -123,19 +132,28 @@ def exceeds_daily_theory_limit(schedule, course, instructor_obj, day):
     """Checks if an instructor exceeds the daily theory limit (4 hours).
     
     For instructors with exclude_graduate_from_limit=True, graduate courses
-    are not counted towards the 4-hour limit.
+    are not counted towards the 4-hour limit. Every placed block counts once
+    with its theory hours; a course's hours in one room are cut into blocks
+    as schedule_blocks does, so two sections on the same day count twice.
     """
     total_hours = 0
+    block_hours = defaultdict(int)  # (course_id, room name) -> hours on day
+    courses_by_id = {}
     for (sched_day, sched_hour), entries in schedule.items():
         if sched_day == day:
-            for scheduled_course, _ in entries:
+            for scheduled_course, room in entries:
                 if (scheduled_course.instructor == course.instructor and 
                     scheduled_course.course_type == 'theory'):
                     # If excluding graduate courses and this is a graduate course, skip
                     if (instructor_obj and instructor_obj.exclude_graduate_from_limit and 
                         scheduled_course.is_graduate):
                         continue
-                    total_hours += scheduled_course.theory_hours
+                    courses_by_id[scheduled_course.course_id] = scheduled_course
+                    block_hours[(scheduled_course.course_id, room.name)] += 1
+    for (course_id, _), hours in block_hours.items():
+        scheduled_course = courses_by_id[course_id]
+        blocks = -(-hours // required_block_hours(scheduled_course))
+        total_hours += scheduled_course.theory_hours * blocks
     
     # Also count the current course being scheduled
     if course.course_type == 'theory':
@@ -175,6 +193,20 @@ def has_year_mandatory_conflict(schedule, course, day, start_hour):
     return False
 
 
+def electives_clash(course, other, soft_electives=False):
+    """True if the elective rules forbid course and other in the same slot.
+
+    CENG and SENG electives must not overlap (unless soft_electives, see
+    optimizer.py), and 3rd-year courses must not overlap any elective; this
+    also keeps 3rd-year technical electives apart from each other.
+    """
+    if not course.is_mandatory and not other.is_mandatory and not soft_electives:
+        if {course.department, other.department} == {"CENG", "SENG"}:
+            return True
+    return ((course.year == 3 and not other.is_mandatory) or
+            (other.year == 3 and not course.is_mandatory))
+
+
 def has_elective_conflict(schedule, course, day, start_hour):
     """Check if CENG and SENG electives conflict.
     
@@ -183,23 +215,8 @@ def has_elective_conflict(schedule, course, day, start_hour):
     Also: 3rd-year courses should not overlap with electives.
     """
     for scheduled_course, _ in schedule.get((day, start_hour), []):
-        # CENG and SENG electives should not conflict
-        if (not course.is_mandatory and not scheduled_course.is_mandatory):
-            if ((course.department == "CENG" and scheduled_course.department == "SENG") or
-                (course.department == "SENG" and scheduled_course.department == "CENG")):
-                return True
-            
-            # 3rd year technical electives should not conflict with each other
-            if (course.year == 3 and scheduled_course.year == 3 and
-                course.department in ["SENG", "CENG"] and 
-                scheduled_course.department in ["SENG", "CENG"]):
-                return True
-        
-        # 3rd-year courses should not overlap with electives
-        if ((course.year == 3 and not scheduled_course.is_mandatory) or
-            (scheduled_course.year == 3 and not course.is_mandatory)):
+        if electives_clash(course, scheduled_course):
             return True
-    
     return False
 
 
@@ -220,6 +237,89 @@ def find_corresponding_theory_course(lab_course, all_courses):
                 return course
     return None
 
+
+def pair_labs_with_theory(all_courses):
+    """Resolve every lab course to its theory course once.
+
+    Returns a dictionary mapping lab course_id to the theory Course found by
+    find_corresponding_theory_course; labs without a theory course are left out.
+    """
+    pairs = {}
+    for course in all_courses:
+        if course.course_type == 'lab':
+            theory_course = find_corresponding_theory_course(course, all_courses)
+            if theory_course:
+                pairs[course.course_id] = theory_course
+    return pairs
+
+
+def build_constraint_graph(courses):
+    """Return, for each course index, the set of course indices it shares a hard constraint with.
+
+    Two courses are linked when they have the same instructor, are mandatory
+    courses of the same year, are CENG/SENG electives, one is a 3rd-year
+    course and the other an elective, or they form a theory/lab pair.
+    """
+    neighbours = [set() for _ in courses]
+
+    def link_all(group):
+        for i in group:
+            neighbours[i].update(group)
+
+    by_instructor = defaultdict(list)
+    by_mandatory_year = defaultdict(list)
+    for i, course in enumerate(courses):
+        by_instructor[course.instructor].append(i)
+        if course.is_mandatory:
+            by_mandatory_year[course.year].append(i)
+    for group in list(by_instructor.values()) + list(by_mandatory_year.values()):
+        link_all(group)
+
+    electives = [i for i, c in enumerate(courses) if not c.is_mandatory]
+    ceng_electives = [i for i in electives if courses[i].department == "CENG"]
+    seng_electives = [i for i in electives if courses[i].department == "SENG"]
+    third_year = [i for i, c in enumerate(courses) if c.year == 3]
+    for group_a, group_b in ((ceng_electives, seng_electives), (third_year, electives)):
+        for i in group_a:
+            neighbours[i].update(group_b)
+        for j in group_b:
+            neighbours[j].update(group_a)
+
+    course_index = {course.course_id: i for i, course in enumerate(courses)}
+    for lab_id, theory_course in pair_labs_with_theory(courses).items():
+        lab_idx, theory_idx = course_index[lab_id], course_index[theory_course.course_id]
+        neighbours[lab_idx].add(theory_idx)
+        neighbours[theory_idx].add(lab_idx)
+
+    for i, linked in enumerate(neighbours):
+        linked.discard(i)
+    return neighbours
+
+
+def connected_components(courses):
+    """Split courses into groups that share no hard constraint except rooms.
+
+    Components of build_constraint_graph, each a list of courses in input order.
+    """
+    neighbours = build_constraint_graph(courses)
+    component_of = [-1] * len(courses)
+    components = []
+    for start in range(len(courses)):
+        if component_of[start] >= 0:
+            continue
+        component_of[start] = len(components)
+        members = [start]
+        stack = [start]
+        while stack:
+            for j in neighbours[stack.pop()]:
+                if component_of[j] < 0:
+                    component_of[j] = len(components)
+                    members.append(j)
+                    stack.append(j)
+        components.append([courses[i] for i in sorted(members)])
+    return components
+
+
 def is_lab_after_theory(course, schedule, day, start_hour, all_courses):
     """Check if lab course can be scheduled (must be after corresponding theory course).
     
@@ -315,11 +415,1338 @@ def is_valid_assignment(schedule, course, day, start_hour, room, instructors_dic
     return True
 
 
+class TimeGrid:
+    """Integer model of the time slots, parsed once per schedule generation.
+
+    Every (day, hour) slot gets a dense id, a day id and its start time in
+    minutes since midnight, so "9:20" and "09:20" are the same slot. The
+    consecutive blocks of each duration are computed once for all slots:
+    blocks(n)[slot_id] is the tuple of slot ids covering n hours from
+    slot_id, or None if one of the following hours is missing that day.
+    """
+    def __init__(self, time_slots):
+        self.slot_ids = {}  # (day, hour) as given -> slot id
+        self.slots = []  # slot id -> (day, hour)
+        self.slot_day = []  # slot id -> day id
+        self.slot_minute = []  # slot id -> minutes since midnight
+        self.day_ids = {}
+        self.minute_ids = {}  # (day id, minute) -> slot id
+        for day, hour in time_slots:
+            day_id = self.day_ids.setdefault(day, len(self.day_ids))
+            minute = self.to_minutes(hour)
+            if (day_id, minute) in self.minute_ids:
+                self.slot_ids.setdefault((day, hour), self.minute_ids[(day_id, minute)])
+                continue
+            slot_id = len(self.slots)
+            self.slot_ids[(day, hour)] = slot_id
+            self.minute_ids[(day_id, minute)] = slot_id
+            self.slots.append((day, hour))
+            self.slot_day.append(day_id)
+            self.slot_minute.append(minute)
+        self.slot_exam = [is_exam_block(day, hour) for day, hour in self.slots]
+        self._blocks = {}
+        self._usable = {}
+
+    @staticmethod
+    def to_minutes(hour):
+        """Minutes since midnight of an "HH:MM" string (or a decimal hour)."""
+        return int(round(time_to_decimal(hour) * 60))
+
+    def lookup(self, day, hour):
+        """Slot id of (day, hour), or None if there is no such slot."""
+        slot_id = self.slot_ids.get((day, hour))
+        if slot_id is None and day in self.day_ids:
+            slot_id = self.minute_ids.get((self.day_ids[day], self.to_minutes(hour)))
+        return slot_id
+
+    def blocks(self, required_hours):
+        """Per slot id, the slot ids of required_hours consecutive hours, or None."""
+        table = self._blocks.get(required_hours)
+        if table is None:
+            table = []
+            for slot_id, day_id in enumerate(self.slot_day):
+                start_minute = self.slot_minute[slot_id]
+                block = [slot_id]
+                for hour_num in range(1, required_hours):
+                    next_id = self.minute_ids.get((day_id, start_minute + 60 * hour_num))
+                    if next_id is None:
+                        block = None
+                        break
+                    block.append(next_id)
+                table.append(tuple(block) if block else None)
+            self._blocks[required_hours] = table
+        return table
+
+    def usable_blocks(self, required_hours):
+        """Like blocks(), without blocks that touch the Friday exam period."""
+        table = self._usable.get(required_hours)
+        if table is None:
+            table = [block if block is not None and not any(self.slot_exam[i] for i in block) else None
+                     for block in self.blocks(required_hours)]
+            self._usable[required_hours] = table
+        return table
+
+
+class ScheduleState:
+    """Integer-indexed schedule state mutated by generate_schedule.
+
+    Slots, rooms, instructors and year/department groups get dense ids and
+    occupancy is kept as Python-int bitmasks (bit i = slot i): one mask per
+    instructor, room and mandatory year, plus elective group masks. Conflict
+    checks become bitwise ANDs. Every section is placed separately, and each
+    value a placement overwrites is pushed on a trail, so restore() undoes
+    exactly the placements made since mark() without rescanning anything.
+    With soft_electives=True CENG and SENG electives may overlap (rule 6 is
+    then left to an objective, see optimizer.py).
+    """
+    def __init__(self, courses, rooms, time_slots, instructors_dict=None, soft_electives=False):
+        instructors_dict = instructors_dict or {}
+        self.courses = courses
+        self.rooms = rooms
+
+        # Dense slot and day ids, parsed once
+        self.grid = TimeGrid(time_slots)
+        self.slots = self.grid.slots  # slot id -> (day, hour)
+        self.slot_day = self.grid.slot_day
+        self.slot_minute = self.grid.slot_minute
+
+        # Mask layout: instructors, mandatory years, elective departments,
+        # then one mask for all electives, one for 3rd-year courses, then rooms.
+        instructor_ids = {}
+        year_ids = {}
+        department_ids = {}
+        for course in courses:
+            instructor_ids.setdefault(course.instructor, len(instructor_ids))
+            year_ids.setdefault(course.year, len(year_ids))
+            department_ids.setdefault(course.department, len(department_ids))
+        year_offset = len(instructor_ids)
+        department_offset = year_offset + len(year_ids)
+        elective_id = department_offset + len(department_ids)
+        year3_id = elective_id + 1
+        self.room_offset = year3_id + 1
+        self.masks = [0] * (self.room_offset + len(rooms))
+
+        # Per-instructor daily limits; loads are indexed by instructor * days + day
+        self.n_days = len(self.grid.day_ids)
+        self.instructor_limit = [4] * len(instructor_ids)
+        self.instructor_excludes_graduate = [False] * len(instructor_ids)
+        for name, instructor_id in instructor_ids.items():
+            instructor_obj = instructors_dict.get(name)
+            if instructor_obj:
+                self.instructor_limit[instructor_id] = instructor_obj.max_daily_theory_hours
+                self.instructor_excludes_graduate[instructor_id] = instructor_obj.exclude_graduate_from_limit
+        self.theory_load = [0] * (len(instructor_ids) * self.n_days)
+        self.graduate_load = [0] * (len(instructor_ids) * self.n_days)
+
+        # Per-course mask ids: which masks a placement sets, and which masks
+        # it must not overlap (see has_*_conflict for the rules).
+        course_index = {course.course_id: i for i, course in enumerate(courses)}
+        lab_pairs = pair_labs_with_theory(courses)
+        self.course_instructor = []
+        self.mark_ids = []
+        self.conflict_ids = []
+        self.conflict_rules = []  # course index -> [(rule name, mask ids)], for SearchStats
+        self.lab_theory = []
+        for course in courses:
+            instructor_id = instructor_ids[course.instructor]
+            mark = [instructor_id]
+            rules = {"has_instructor_conflict": [instructor_id]}
+            if course.is_mandatory:
+                mark.append(year_offset + year_ids[course.year])
+                rules["has_year_mandatory_conflict"] = [year_offset + year_ids[course.year]]
+            else:
+                mark.append(elective_id)
+                mark.append(department_offset + department_ids[course.department])
+                rules["has_elective_conflict"] = [year3_id]
+                other = {"CENG": "SENG", "SENG": "CENG"}.get(course.department)
+                if other in department_ids and not soft_electives:
+                    rules["has_elective_conflict"].append(department_offset + department_ids[other])
+            if course.year == 3:
+                mark.append(year3_id)
+                rules.setdefault("has_elective_conflict", []).append(elective_id)
+            self.course_instructor.append(instructor_id)
+            self.mark_ids.append(mark)
+            self.conflict_ids.append([mask_id for mask_ids in rules.values() for mask_id in mask_ids])
+            self.conflict_rules.append(list(rules.items()))
+            theory_course = lab_pairs.get(course.course_id)
+            self.lab_theory.append(course_index[theory_course.course_id] if theory_course else -1)
+
+        # Room classes for placements without a concrete room (room index -1):
+        # a class is a set of compatible rooms. A roomless placement uses one
+        # unit of its class and of every class containing it, per slot; with
+        # nested classes (as is_valid_room_for_course gives) keeping every
+        # count within its class size is exactly Hall's matching condition.
+        class_ids = {}
+        self.course_room_class = []
+        for course in courses:
+            compatible = frozenset(r for r, room in enumerate(rooms) if is_valid_room_for_course(room, course))
+            self.course_room_class.append(class_ids.setdefault(compatible, len(class_ids)))
+        self.n_room_classes = len(class_ids)
+        self.room_class_size = [len(compatible) for compatible in class_ids]
+        self.room_class_within = [[k for k, other in enumerate(class_ids) if compatible <= other]
+                                  for compatible in class_ids]
+        self.room_class_usage = [0] * (len(self.slots) * self.n_room_classes)  # slot * classes + class
+
+        self.starts = [[] for _ in courses]  # course index -> start slot ids of placed sections
+        self.placements = []  # (course index, room index, slot ids)
+        self.slot_owners = [[] for _ in self.slots]  # slot id -> positions in self.placements
+        self.trail = []  # (list, index, previous value) for every overwritten value
+        self.stats = None  # SearchStats: when set, can_place counts every rule it checks
+
+    def exceeds_daily_theory_limit(self, course_idx, day_id):
+        """Constant-time daily theory limit check for placing course on day_id."""
+        course = self.courses[course_idx]
+        instructor_id = self.course_instructor[course_idx]
+        load_id = instructor_id * self.n_days + day_id
+        excluding_graduate = self.instructor_excludes_graduate[instructor_id]
+        total_hours = self.theory_load[load_id]
+        if excluding_graduate:
+            total_hours -= self.graduate_load[load_id]
+        if not (excluding_graduate and course.is_graduate):
+            total_hours += course.theory_hours
+        return total_hours > self.instructor_limit[instructor_id]
+
+    def is_fully_placed(self, course_idx):
+        return len(self.starts[course_idx]) == self.courses[course_idx].sections
+
+    def is_lab_after_theory(self, course_idx, start_id):
+        """Lab must start after a placed section of its theory course on the same day."""
+        theory_idx = self.lab_theory[course_idx]
+        if theory_idx < 0:
+            return False
+        day_id = self.slot_day[start_id]
+        minute = self.slot_minute[start_id]
+        for theory_start in self.starts[theory_idx]:
+            if self.slot_day[theory_start] == day_id and minute > self.slot_minute[theory_start]:
+                return True
+        return False
+
+    def room_class_full(self, course_idx, slot_id):
+        """Room class (of course_idx or one containing it) with no room left at slot_id, or -1."""
+        base = slot_id * self.n_room_classes
+        for k in self.room_class_within[self.course_room_class[course_idx]]:
+            if self.room_class_usage[base + k] >= self.room_class_size[k]:
+                return k
+        return -1
+
+    def can_place(self, course_idx, slot_ids, room_idx, require_theory=True):
+        """Check the schedule-dependent constraints for a course block.
+
+        room_idx -1 places the block without a concrete room; it then only
+        needs a free room of its class in every slot. With
+        require_theory=False a lab whose theory course is not fully placed
+        yet is not rejected for that reason (used when pruning future
+        domains).
+        """
+        if self.stats is not None:
+            return self.can_place_counted(course_idx, slot_ids, room_idx, require_theory)
+        course = self.courses[course_idx]
+        day_id = self.slot_day[slot_ids[0]]
+        if course.course_type == 'theory' and self.exceeds_daily_theory_limit(course_idx, day_id):
+            return False
+        bits = 0
+        for slot_id in slot_ids:
+            bits |= 1 << slot_id
+        masks = self.masks
+        occupied = masks[self.room_offset + room_idx] if room_idx >= 0 else 0
+        for mask_id in self.conflict_ids[course_idx]:
+            occupied |= masks[mask_id]
+        if occupied & bits:
+            return False
+        if room_idx < 0:
+            for slot_id in slot_ids:
+                if self.room_class_full(course_idx, slot_id) >= 0:
+                    return False
+        if course.course_type == 'lab' and not self.is_lab_after_theory(course_idx, slot_ids[0]):
+            theory_idx = self.lab_theory[course_idx]
+            if require_theory or theory_idx < 0 or self.is_fully_placed(theory_idx):
+                return False
+        return True
+
+    def can_place_counted(self, course_idx, slot_ids, room_idx, require_theory=True):
+        """can_place checking one rule at a time, each counted and timed in self.stats."""
+        check = self.stats.check
+        course = self.courses[course_idx]
+        if course.course_type == 'theory' and check(
+                "exceeds_daily_theory_limit",
+                lambda: self.exceeds_daily_theory_limit(course_idx, self.slot_day[slot_ids[0]])):
+            return False
+        bits = 0
+        for slot_id in slot_ids:
+            bits |= 1 << slot_id
+        rules = self.conflict_rules[course_idx]
+        if room_idx >= 0:
+            rules = rules + [("has_room_conflict", [self.room_offset + room_idx])]
+        for rule, mask_ids in rules:
+            if check(rule, lambda: any(self.masks[mask_id] & bits for mask_id in mask_ids)):
+                return False
+        if room_idx < 0 and check("room_class_full",
+                                  lambda: any(self.room_class_full(course_idx, slot_id) >= 0
+                                              for slot_id in slot_ids)):
+            return False
+        if course.course_type == 'lab':
+            theory_idx = self.lab_theory[course_idx]
+            if check("is_lab_after_theory",
+                     lambda: not self.is_lab_after_theory(course_idx, slot_ids[0]) and (
+                         require_theory or theory_idx < 0 or self.is_fully_placed(theory_idx))):
+                return False
+        return True
+
+    def place(self, course_idx, slot_ids, room_idx):
+        """Place one section of a course; undone by restore()."""
+        course = self.courses[course_idx]
+        bits = 0
+        for slot_id in slot_ids:
+            bits |= 1 << slot_id
+        masks = self.masks
+        trail = self.trail
+        mask_ids = self.mark_ids[course_idx]
+        if room_idx >= 0:
+            mask_ids = mask_ids + [self.room_offset + room_idx]
+        for mask_id in mask_ids:
+            trail.append((masks, mask_id, masks[mask_id]))
+            masks[mask_id] |= bits
+        if room_idx < 0:
+            usage = self.room_class_usage
+            for slot_id in slot_ids:
+                base = slot_id * self.n_room_classes
+                for k in self.room_class_within[self.course_room_class[course_idx]]:
+                    trail.append((usage, base + k, usage[base + k]))
+                    usage[base + k] += 1
+        if course.course_type == 'theory':
+            load_id = self.course_instructor[course_idx] * self.n_days + self.slot_day[slot_ids[0]]
+            trail.append((self.theory_load, load_id, self.theory_load[load_id]))
+            self.theory_load[load_id] += course.theory_hours
+            if course.is_graduate:
+                trail.append((self.graduate_load, load_id, self.graduate_load[load_id]))
+                self.graduate_load[load_id] += course.theory_hours
+        self.starts[course_idx].append(slot_ids[0])
+        for slot_id in slot_ids:
+            self.slot_owners[slot_id].append(len(self.placements))
+        self.placements.append((course_idx, room_idx, slot_ids))
+
+    def mark(self):
+        return len(self.trail), len(self.placements)
+
+    def restore(self, mark):
+        """Undo every place() since mark()."""
+        trail_size, n_placements = mark
+        trail = self.trail
+        while len(trail) > trail_size:
+            values, index, value = trail.pop()
+            values[index] = value
+        while len(self.placements) > n_placements:
+            course_idx, _, slot_ids = self.placements.pop()
+            self.starts[course_idx].pop()
+            for slot_id in slot_ids:
+                self.slot_owners[slot_id].pop()
+
+    def explain_conflict(self, course_idx, slot_ids, room_idx, require_theory=True):
+        """Return positions in self.placements that together make a placement invalid.
+
+        Every violated rule is a sufficient explanation on its own: a single
+        instructor, room, year or elective clash, the blocks filling a room
+        class, the same-day theory blocks behind a daily-limit hit, or the
+        theory sections a lab does not follow. The
+        explanation whose most recent culprit is oldest is returned, so that
+        backjumping can go as far back as possible. An empty set means the
+        placement can never be valid. Returns None if the rejection is not
+        caused by placements at all (a lab whose theory course is not fully
+        placed yet, unless require_theory=False as in can_place).
+        """
+        course = self.courses[course_idx]
+        reasons = []
+        conflict_ids = set(self.conflict_ids[course_idx])
+        for slot_id in slot_ids:
+            for position in self.slot_owners[slot_id]:
+                other_idx, other_room, _ = self.placements[position]
+                if ((room_idx >= 0 and other_room == room_idx) or
+                        conflict_ids.intersection(self.mark_ids[other_idx])):
+                    reasons.append({position})
+            if room_idx < 0:
+                full_class = self.room_class_full(course_idx, slot_id)
+                if full_class >= 0:
+                    reasons.append({position for position in self.slot_owners[slot_id]
+                                    if full_class in self.room_class_within[
+                                        self.course_room_class[self.placements[position][0]]]})
+        day_id = self.slot_day[slot_ids[0]]
+        if course.course_type == 'theory' and self.exceeds_daily_theory_limit(course_idx, day_id):
+            instructor_id = self.course_instructor[course_idx]
+            excluding_graduate = self.instructor_excludes_graduate[instructor_id]
+            same_day = set()
+            for position, (other_idx, _, other_slots) in enumerate(self.placements):
+                other = self.courses[other_idx]
+                if (self.course_instructor[other_idx] == instructor_id and
+                    other.course_type == 'theory' and
+                    self.slot_day[other_slots[0]] == day_id and
+                    not (excluding_graduate and other.is_graduate)):
+                    same_day.add(position)
+            reasons.append(same_day)
+        if course.course_type == 'lab' and not self.is_lab_after_theory(course_idx, slot_ids[0]):
+            theory_idx = self.lab_theory[course_idx]
+            if theory_idx < 0:
+                reasons.append(set())
+            elif self.is_fully_placed(theory_idx):
+                reasons.append({position for position, (other_idx, _, _) in enumerate(self.placements)
+                                if other_idx == theory_idx})
+            elif require_theory:
+                return None
+        if not reasons:
+            return None
+        return min(reasons, key=lambda reason: max(reason, default=-1))
+
+    def to_schedule(self, placement_rooms=None):
+        """Build the (day, hour) -> [(course, room), ...] Schedule.
+
+        placement_rooms gives the Room of each placement when they were made
+        without a concrete room (see assign_rooms).
+        """
+        schedule = defaultdict(list)
+        placements = []
+        for position, (course_idx, room_idx, slot_ids) in enumerate(self.placements):
+            course = self.courses[course_idx]
+            room = placement_rooms[position] if placement_rooms is not None else self.rooms[room_idx]
+            for slot_id in slot_ids:
+                schedule[self.slots[slot_id]].append((course, room))
+            placements.append((course, room, [self.slots[slot_id] for slot_id in slot_ids]))
+        return Schedule(schedule, placements=placements)
+
+
+class Schedule(dict):
+    """Schedule dictionary (day, hour) -> [(course, room), ...].
+
+    placements holds the same content once per placed block, as
+    (course, room, [(day, hour), ...]) in placement order. unplaced lists
+    the courses a partial schedule leaves out (see generate_schedule's
+    budgets); it is empty for a complete schedule.
+    """
+    def __init__(self, *args, placements=None, unplaced=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.placements = placements if placements is not None else []
+        self.unplaced = unplaced if unplaced is not None else []
+
+
+def schedule_blocks(schedule):
+    """The (course, room, [(day, hour), ...]) blocks of a schedule.
+
+    A Schedule knows its placements; for a plain (day, hour) dict they are
+    rebuilt by cutting each course's hours per room and day into blocks of
+    required_block_hours.
+    """
+    placements = getattr(schedule, "placements", None)
+    if placements:
+        return list(placements)
+    hours = defaultdict(list)  # (course, room, day) -> hours
+    entries = {}
+    for (day, hour), scheduled in schedule.items():
+        for course, room in scheduled:
+            key = (id(course), id(room), day)
+            entries[key] = (course, room)
+            hours[key].append(hour)
+    blocks = []
+    for key, block_hours in hours.items():
+        course, room = entries[key]
+        block_hours.sort(key=TimeGrid.to_minutes)
+        size = required_block_hours(course)
+        for start in range(0, len(block_hours), size):
+            blocks.append((course, room, [(key[2], hour) for hour in block_hours[start:start + size]]))
+    return blocks
+
+
+def hopcroft_karp(adjacency, n_right, match_left=None):
+    """Maximum bipartite matching.
+
+    adjacency[u] lists the right vertices left vertex u may be matched to.
+    Returns match_left (right vertex per left vertex, -1 if unmatched). A
+    partial matching can be passed in to be augmented; vertices matched in it
+    stay matched.
+    """
+    n_left = len(adjacency)
+    match_left = list(match_left) if match_left is not None else [-1] * n_left
+    match_right = [-1] * n_right
+    for u, v in enumerate(match_left):
+        if v >= 0:
+            match_right[v] = u
+    unreached = n_left + 1
+    while True:
+        # Breadth-first layering from the free left vertices
+        dist = [unreached] * n_left
+        queue = [u for u in range(n_left) if match_left[u] < 0]
+        for u in queue:
+            dist[u] = 0
+        found = False
+        for u in queue:
+            for v in adjacency[u]:
+                w = match_right[v]
+                if w < 0:
+                    found = True
+                elif dist[w] == unreached:
+                    dist[w] = dist[u] + 1
+                    queue.append(w)
+        if not found:
+            return match_left
+
+        # Vertex-disjoint shortest augmenting paths along the layers
+        def augment(u):
+            for v in adjacency[u]:
+                w = match_right[v]
+                if w < 0 or (dist[w] == dist[u] + 1 and augment(w)):
+                    match_left[u] = v
+                    match_right[v] = u
+                    return True
+            dist[u] = unreached
+            return False
+
+        for u in range(n_left):
+            if match_left[u] < 0:
+                augment(u)
+
+
+def assign_rooms(blocks, rooms, time_slots, fixed_rooms=None):
+    """Give every block a room so that no room is used twice at the same time.
+
+    blocks is a list of (course, [(day, hour), ...]). Every day is handled
+    on its own, its blocks in order of their start time: those starting
+    together are matched to the compatible rooms that are free for their
+    whole duration (Hopcroft-Karp), rooms of the course's own type first.
+    The matching never looks ahead, so a long block may take the only room
+    a later block could use; a day it cannot settle is searched
+    exhaustively instead. fixed_rooms optionally gives a Room (or None) per
+    block: those blocks keep that room and the others are assigned around
+    them. Returns one Room per block, or None if no assignment exists.
+    """
+    grid = TimeGrid(time_slots)
+    block_bits = []  # block -> bitmask of its slot ids
+    for _, slots in blocks:
+        bits = 0
+        for day, hour in slots:
+            bits |= 1 << grid.lookup(day, hour)
+        block_bits.append(bits)
+    busy = [0] * len(rooms)  # room index -> bitmask of used slot ids
+    assigned = [None] * len(blocks)
+    if fixed_rooms is not None:
+        room_index = {id(room): r for r, room in enumerate(rooms)}
+        for i, room in enumerate(fixed_rooms):
+            if room is not None:
+                assigned[i] = room
+                busy[room_index[id(room)]] |= block_bits[i]
+    compatible = []  # block -> suitable room indexes, the course's own room type first
+    for course, _ in blocks:
+        suitable = [r for r, room in enumerate(rooms) if is_valid_room_for_course(room, course)]
+        suitable.sort(key=lambda r: rooms[r].room_type != course.course_type)
+        compatible.append(suitable)
+    days = defaultdict(list)  # day id -> [(start minute, block)] of the blocks to assign
+    for i, (_, slots) in enumerate(blocks):
+        if assigned[i] is None:
+            slot_ids = [grid.lookup(day, hour) for day, hour in slots]
+            start = min(slot_ids, key=lambda slot_id: grid.slot_minute[slot_id])
+            days[grid.slot_day[start]].append((grid.slot_minute[start], i))
+
+    def match_by_start(day_blocks):
+        """Match the blocks starting together, one start time after the other."""
+        for _, group in groupby(day_blocks, key=lambda item: item[0]):
+            group = [i for _, i in group]
+            preferred = []
+            allowed = []
+            for i in group:
+                free = [r for r in compatible[i] if not busy[r] & block_bits[i]]
+                preferred.append([r for r in free if rooms[r].room_type == blocks[i][0].course_type])
+                allowed.append(free)
+            match = hopcroft_karp(allowed, len(rooms), hopcroft_karp(preferred, len(rooms)))
+            if min(match) < 0:
+                return False
+            for i, r in zip(group, match):
+                assigned[i] = rooms[r]
+                busy[r] |= block_bits[i]
+        return True
+
+    def search(day_id, day_blocks):
+        """Try every room for every block (in start order); True once all have one.
+
+        Rooms of the same type and capacity that are busy at the same slots
+        from a block's start on are interchangeable for it and every later
+        block, so only one of them is tried.
+        """
+        later = {}  # start minute -> bitmask of the day's slots from then on
+        for minute, _ in day_blocks:
+            if minute not in later:
+                later[minute] = sum(1 << slot_id for slot_id, slot_day in enumerate(grid.slot_day)
+                                    if slot_day == day_id and grid.slot_minute[slot_id] >= minute)
+        choice = [-1] * len(day_blocks)  # position in compatible[] of the room taken
+        tried = [set() for _ in day_blocks]  # room kinds already tried per block
+        k = 0
+        while 0 <= k < len(day_blocks):
+            minute, i = day_blocks[k]
+            bits = block_bits[i]
+            options = compatible[i]
+            if choice[k] >= 0:
+                busy[options[choice[k]]] &= ~bits
+            for position in range(choice[k] + 1, len(options)):
+                r = options[position]
+                if busy[r] & bits:
+                    continue
+                kind = (rooms[r].room_type, rooms[r].capacity, busy[r] & later[minute])
+                if kind not in tried[k]:
+                    tried[k].add(kind)
+                    choice[k] = position
+                    assigned[i] = rooms[r]
+                    busy[r] |= bits
+                    k += 1
+                    break
+            else:
+                choice[k] = -1
+                tried[k] = set()
+                k -= 1
+        return k == len(day_blocks)
+
+    for day_id, day_blocks in days.items():
+        day_blocks.sort()
+        before = list(busy)
+        if not match_by_start(day_blocks):
+            busy[:] = before
+            if not search(day_id, day_blocks):
+                return None
+    return assigned
+
+
+def required_block_hours(course):
+    """Number of consecutive hour slots a course block occupies."""
+    if course.course_type == 'lab':
+        required_hours = course.lab_hours if course.lab_hours > 0 else course.hours
+    else:  # theory
+        required_hours = course.theory_hours if course.theory_hours > 0 else course.hours
+    return max(required_hours, 1)
+
+
+class StaticFeasibility:
+    """Course x slot x room feasibility of everything that ignores the partial schedule.
+
+    Computed once before the search: fixed time slots, slot existence,
+    consecutive-block availability, the exam block and room type/capacity.
+    The matrix is a NumPy bool array when NumPy is installed, otherwise one
+    bytearray per course. candidates[c] lists course c's feasible
+    (slot ids, room index) placements in search order (slot, then room).
+    """
+    def __init__(self, state):
+        courses, rooms = state.courses, state.rooms
+        n_slots, n_rooms = len(state.slots), len(rooms)
+        grid = state.grid
+
+        # Per course: the block starting at each slot id, or None if unusable
+        self.blocks = []
+        slot_ok = []
+        for course in courses:
+            usable = grid.usable_blocks(required_block_hours(course))
+            if course.fixed_time_slot:
+                fixed_id = grid.lookup(*course.fixed_time_slot)
+                blocks = [None] * n_slots
+                if fixed_id is not None:
+                    blocks[fixed_id] = usable[fixed_id]
+            else:
+                blocks = usable
+            self.blocks.append(blocks)
+            slot_ok.append([block is not None for block in blocks])
+        room_ok = [[is_valid_room_for_course(room, course) for room in rooms] for course in courses]
+
+        if np is not None:
+            self.matrix = (np.array(slot_ok, dtype=bool).reshape(len(courses), n_slots, 1) &
+                           np.array(room_ok, dtype=bool).reshape(len(courses), 1, n_rooms))
+            self.candidates = [
+                [(self.blocks[c][slot_id], int(room_idx)) for slot_id, room_idx in np.argwhere(self.matrix[c])]
+                for c in range(len(courses))
+            ]
+        else:
+            self.matrix = []
+            self.candidates = []
+            for c in range(len(courses)):
+                row = bytearray(n_slots * n_rooms)
+                course_candidates = []
+                for slot_id in range(n_slots):
+                    if not slot_ok[c][slot_id]:
+                        continue
+                    for room_idx in range(n_rooms):
+                        if room_ok[c][room_idx]:
+                            row[slot_id * n_rooms + room_idx] = 1
+                            course_candidates.append((self.blocks[c][slot_id], room_idx))
+                self.matrix.append(row)
+                self.candidates.append(course_candidates)
+        self.n_rooms = n_rooms
+        if state.stats is not None:
+            self.count_rejections(state)
+
+    @staticmethod
+    def count_rejections(state):
+        """Record in state.stats what the static rules rule out, per course slot and room."""
+        check = state.stats.check
+        grid = state.grid
+        for course in state.courses:
+            fixed_id = grid.lookup(*course.fixed_time_slot) if course.fixed_time_slot else None
+            for slot_id, block in enumerate(grid.blocks(required_block_hours(course))):
+                if course.fixed_time_slot and check("fixed_time_slot", lambda: slot_id != fixed_id):
+                    continue
+                if check("consecutive_hours", lambda: block is None):
+                    continue
+                check("is_exam_block", lambda: any(is_exam_block(*grid.slots[i]) for i in block))
+            for room in state.rooms:
+                check("is_valid_room_for_course", lambda: not is_valid_room_for_course(room, course))
+
+    def time_candidates(self):
+        """Per course, (slot ids, -1) for every start slot with some feasible room."""
+        return [
+            [(slot_ids, -1) for slot_ids in dict.fromkeys(slot_ids for slot_ids, _ in course_candidates)]
+            for course_candidates in self.candidates
+        ]
+
+    def is_feasible(self, course_idx, slot_id, room_idx):
+        if np is not None:
+            return bool(self.matrix[course_idx, slot_id, room_idx])
+        return bool(self.matrix[course_idx][slot_id * self.n_rooms + room_idx])
+
+
+def is_valid_schedule(schedule, courses, rooms, time_slots, instructors=None, soft_electives=False):
+    """True if schedule places every section of every course and breaks no hard constraint.
+
+    The blocks (matched to courses and rooms by identity) are replayed on a
+    ScheduleState, theory courses first, with the checks the search makes.
+    soft_electives=True accepts overlapping CENG and SENG electives.
+    """
+    instructors_dict = {inst.name: inst for inst in instructors} if instructors else {}
+    state = ScheduleState(courses, rooms, time_slots, instructors_dict, soft_electives)
+    feasibility = StaticFeasibility(state)
+    course_index = {id(course): i for i, course in enumerate(courses)}
+    room_index = {id(room): r for r, room in enumerate(rooms)}
+    blocks = []
+    for course, room, slots in schedule_blocks(schedule):
+        course_idx = course_index.get(id(course))
+        room_idx = room_index.get(id(room))
+        slot_ids = [state.grid.lookup(day, hour) for day, hour in slots]
+        if course_idx is None or room_idx is None or not slot_ids or None in slot_ids:
+            return False
+        start = min(slot_ids, key=lambda slot_id: state.slot_minute[slot_id])
+        block = feasibility.blocks[course_idx][start]
+        if (block is None or sorted(block) != sorted(slot_ids) or
+                not feasibility.is_feasible(course_idx, start, room_idx)):
+            return False
+        blocks.append((course_idx, block, room_idx))
+    blocks.sort(key=lambda block: courses[block[0]].course_type != 'theory')
+    for course_idx, block, room_idx in blocks:
+        if len(state.starts[course_idx]) == courses[course_idx].sections or \
+                not state.can_place(course_idx, block, room_idx):
+            return False
+        state.place(course_idx, block, room_idx)
+    return all(state.is_fully_placed(course_idx) for course_idx in range(len(courses)))
+
+
+# Violation kinds reported by ScheduleValidator
+EXAM_BLOCK = "exam_block"
+FIXED_TIME_SLOT = "fixed_time_slot"
+ROOM_TYPE = "room_type"
+ROOM_CAPACITY = "room_capacity"
+DAILY_THEORY_LIMIT = "daily_theory_limit"
+LAB_BEFORE_THEORY = "lab_before_theory"
+INSTRUCTOR_CONFLICT = "instructor_conflict"
+ROOM_CONFLICT = "room_conflict"
+YEAR_MANDATORY_CONFLICT = "year_mandatory_conflict"
+ELECTIVE_CONFLICT = "elective_conflict"
+
+
+class Violation(NamedTuple):
+    """One broken hard constraint.
+
+    courses are the courses involved: one, a clashing pair, or every theory
+    course of an instructor's overloaded day. hour is None for rules that
+    hold per day. room, instructor, hours and limit are set where the kind
+    has them.
+    """
+    kind: str
+    courses: Tuple[Course, ...]
+    day: str
+    hour: Optional[str] = None
+    room: Optional[Room] = None
+    instructor: Optional[str] = None
+    hours: Optional[int] = None
+    limit: Optional[int] = None
+
+    def as_dict(self) -> Dict:
+        return {
+            "kind": self.kind,
+            "courses": [course.code for course in self.courses],
+            "day": self.day,
+            "hour": self.hour,
+            "room": self.room.name if self.room is not None else None,
+            "instructor": self.instructor,
+            "hours": self.hours,
+            "limit": self.limit,
+        }
+
+    def __str__(self):
+        where = f"{self.day} {self.hour}" if self.hour else self.day
+        text = f"{self.kind}: {', '.join(course.code for course in self.courses)} ({where})"
+        if self.room is not None:
+            text += f" room {self.room.name}"
+        if self.limit is not None:
+            text += f" {self.hours}h > {self.limit}h"
+        return text
+
+
+class ScheduleValidator:
+    """Every hard-constraint violation of a schedule, from one set of indexes.
+
+    The schedule is read once into its slots, the theory blocks of each
+    instructor and day, and the first hour of each course on each day. Each
+    rule is checked within its own index, so the work grows with the number
+    of entries and clashing pairs instead of entries squared. Only the
+    (day, hour) dict is read, never Schedule.placements, so a hand-edited
+    schedule is validated as it stands.
+    """
+    def __init__(self, instructors: List[Instructor] = None, all_courses: List[Course] = None,
+                 soft_electives: bool = False):
+        self.instructors_dict = {inst.name: inst for inst in instructors or []}
+        self.soft_electives = soft_electives
+        # Lab course_id -> theory course, or None to pair the scheduled courses
+        self.lab_theory = pair_labs_with_theory(all_courses) if all_courses is not None else None
+
+    def slot_violations(self, day, hour, entries) -> List[Violation]:
+        """Violations within one slot: exam block, room fit and clashing pairs."""
+        violations = []
+        exam_block = is_exam_block(day, hour)
+        by_instructor = defaultdict(list)
+        by_room = defaultdict(list)
+        by_mandatory_year = defaultdict(list)
+        elective_rule = []  # electives and 3rd-year courses
+        for course, room in entries:
+            if exam_block:
+                violations.append(Violation(EXAM_BLOCK, (course,), day, hour, room))
+            if course.course_type == 'lab':
+                if room.room_type != 'lab':
+                    violations.append(Violation(ROOM_TYPE, (course,), day, hour, room))
+                elif room.capacity < course.capacity:
+                    violations.append(Violation(ROOM_CAPACITY, (course,), day, hour, room))
+            by_instructor[course.instructor].append(course)
+            by_room[room.name].append((course, room))
+            if course.is_mandatory:
+                by_mandatory_year[course.year].append(course)
+            if not course.is_mandatory or course.year == 3:
+                elective_rule.append(course)
+
+        for instructor, group in by_instructor.items():
+            for course, other in combinations(group, 2):
+                violations.append(Violation(INSTRUCTOR_CONFLICT, (course, other), day, hour,
+                                            instructor=instructor))
+        for group in by_room.values():
+            for (course, room), (other, _) in combinations(group, 2):
+                violations.append(Violation(ROOM_CONFLICT, (course, other), day, hour, room))
+        for group in by_mandatory_year.values():
+            for course, other in combinations(group, 2):
+                if course.course_id != other.course_id:
+                    violations.append(Violation(YEAR_MANDATORY_CONFLICT, (course, other), day, hour))
+        for course, other in combinations(elective_rule, 2):
+            if course.course_id != other.course_id and electives_clash(course, other, self.soft_electives):
+                violations.append(Violation(ELECTIVE_CONFLICT, (course, other), day, hour))
+        return violations
+
+    def daily_limit_violation(self, instructor, day, sections) -> Optional[Violation]:
+        """The instructor's theory load on day, given {course: blocks that day}, if over the limit."""
+        instructor_obj = self.instructors_dict.get(instructor)
+        excluding_graduate = instructor_obj is not None and instructor_obj.exclude_graduate_from_limit
+        total_hours = sum(course.theory_hours * blocks for course, blocks in sections.items()
+                          if not (excluding_graduate and course.is_graduate))
+        limit = instructor_obj.max_daily_theory_hours if instructor_obj else 4
+        if total_hours > limit:
+            return Violation(DAILY_THEORY_LIMIT, tuple(sorted(sections, key=lambda course: course.code)), day,
+                             instructor=instructor, hours=total_hours, limit=limit)
+        return None
+
+    def course_day_violations(self, course, day, hour, theory_first, lab_theory) -> List[Violation]:
+        """Fixed time slot and lab order for course, whose first hour on day is hour.
+
+        theory_first maps (theory course_id, day) to its first minute that day.
+        """
+        violations = []
+        if course.fixed_time_slot and (day, hour) != tuple(course.fixed_time_slot):
+            violations.append(Violation(FIXED_TIME_SLOT, (course,), day, hour))
+        if course.course_type == 'lab':
+            theory_course = lab_theory.get(course.course_id)
+            if theory_course is None:
+                violations.append(Violation(LAB_BEFORE_THEORY, (course,), day, hour))
+            else:
+                first = theory_first.get((theory_course.course_id, day))
+                if first is None or TimeGrid.to_minutes(hour) <= first:
+                    violations.append(Violation(LAB_BEFORE_THEORY, (course, theory_course), day, hour))
+        return violations
+
+    def validate(self, schedule) -> List[Violation]:
+        violations = []
+        first_hour = {}  # (course_id, day) -> (minute, hour, course)
+        theory_hours = defaultdict(int)  # (course_id, room name, day) -> hours
+        scheduled = {}
+        for (day, hour), entries in schedule.items():
+            if not entries:
+                continue
+            violations.extend(self.slot_violations(day, hour, entries))
+            minute = TimeGrid.to_minutes(hour)
+            for course, room in entries:
+                scheduled[course.course_id] = course
+                key = (course.course_id, day)
+                if key not in first_hour or minute < first_hour[key][0]:
+                    first_hour[key] = (minute, hour, course)
+                if course.course_type == 'theory':
+                    theory_hours[(course.course_id, room.name, day)] += 1
+
+        # Hours of a course in one room and day are cut into blocks as schedule_blocks does
+        sections = defaultdict(lambda: defaultdict(int))  # (instructor, day) -> course -> blocks
+        for (course_id, _, day), hours in theory_hours.items():
+            course = scheduled[course_id]
+            sections[(course.instructor, day)][course] += -(-hours // required_block_hours(course))
+        for (instructor, day), course_blocks in sections.items():
+            violation = self.daily_limit_violation(instructor, day, course_blocks)
+            if violation:
+                violations.append(violation)
+
+        lab_theory = self.lab_theory
+        if lab_theory is None:
+            lab_theory = pair_labs_with_theory(list(scheduled.values()))
+        theory_first = {key: minute for key, (minute, _, course) in first_hour.items()
+                        if course.course_type == 'theory'}
+        for (_, day), (_, hour, course) in first_hour.items():
+            violations.extend(self.course_day_violations(course, day, hour, theory_first, lab_theory))
+        return violations
+
+
+class IncrementalValidator(ScheduleValidator):
+    """Keeps the violations of a schedule current while it is edited by hand.
+
+    Violations are stored per scope: a slot (exam block, room fit and
+    clashing pairs), an instructor's day (theory limit) or a course's day
+    (fixed time slot, lab order). Next to the (day, hour) dict it keeps each
+    course's hours per day and each instructor's theory hours per course and
+    room, so an edit re-checks only the scopes it touches: the changed
+    slots, the days of the courses and instructors involved, and the labs
+    of a moved theory course.
+    """
+    def __init__(self, schedule, all_courses: List[Course], instructors: List[Instructor] = None,
+                 soft_electives: bool = False):
+        super().__init__(instructors, all_courses, soft_electives)
+        self.schedule = schedule
+        self.labs_of = defaultdict(list)  # theory course_id -> lab course_ids
+        for lab_id, theory_course in self.lab_theory.items():
+            self.labs_of[theory_course.course_id].append(lab_id)
+        self.course_hours = {}  # (course_id, day) -> {hour: entries}
+        self.theory_hours = {}  # (instructor, day) -> {(course, room name): hours}
+        self.first_hour = {}  # (course_id, day) -> (minute, hour, course)
+        self.theory_first = {}  # (theory course_id, day) -> first minute
+        self.courses_by_id = {}
+        self.violations = {}  # scope -> [Violation]
+        dirty = set()
+        for (day, hour), entries in schedule.items():
+            for course, room in entries:
+                self._index(course, room, day, hour, 1, dirty)
+        self._recheck(dirty)
+
+    def all_violations(self) -> List[Violation]:
+        return [violation for violations in self.violations.values() for violation in violations]
+
+    def edit(self, removed=(), added=()) -> Tuple[List[Violation], List[Violation]]:
+        """Apply an edit to the schedule and re-check what it touches.
+
+        removed and added are (course, room, [(day, hour), ...]) blocks;
+        removed entries are matched by identity. Returns (resolved,
+        introduced): the violations the edit cleared and the ones it caused.
+        """
+        dirty = set()
+        for course, room, slots in removed:
+            for day, hour in slots:
+                entries = self.schedule.get((day, hour), [])
+                for i, (scheduled_course, scheduled_room) in enumerate(entries):
+                    if scheduled_course is course and scheduled_room is room:
+                        del entries[i]
+                        break
+                else:
+                    continue
+                if not entries:
+                    del self.schedule[(day, hour)]
+                self._index(course, room, day, hour, -1, dirty)
+        for course, room, slots in added:
+            for day, hour in slots:
+                self.schedule.setdefault((day, hour), []).append((course, room))
+                self._index(course, room, day, hour, 1, dirty)
+        return self._recheck(dirty)
+
+    def _index(self, course, room, day, hour, delta, dirty):
+        """Count one entry in (delta 1) or out (delta -1) and mark the scopes it affects."""
+        self.courses_by_id[course.course_id] = course
+        key = (course.course_id, day)
+        hours = self.course_hours.setdefault(key, {})
+        hours[hour] = hours.get(hour, 0) + delta
+        if not hours[hour]:
+            del hours[hour]
+            if not hours:
+                del self.course_hours[key]
+        dirty.add(("slot", day, hour))
+        dirty.add(("course", course.course_id, day))
+        if course.course_type == 'theory':
+            key = (course.instructor, day)
+            load = self.theory_hours.setdefault(key, {})
+            block = (course, room.name)
+            load[block] = load.get(block, 0) + delta
+            if not load[block]:
+                del load[block]
+                if not load:
+                    del self.theory_hours[key]
+            dirty.add(("instructor", course.instructor, day))
+            for lab_id in self.labs_of.get(course.course_id, ()):
+                dirty.add(("course", lab_id, day))
+
+    def _recheck(self, dirty):
+        # First hours go first: a lab's scope reads its theory course's
+        for scope in dirty:
+            if scope[0] == "course":
+                key = scope[1:]
+                hours = self.course_hours.get(key)
+                if hours:
+                    hour = min(hours, key=TimeGrid.to_minutes)
+                    course = self.courses_by_id[key[0]]
+                    self.first_hour[key] = (TimeGrid.to_minutes(hour), hour, course)
+                    if course.course_type == 'theory':
+                        self.theory_first[key] = self.first_hour[key][0]
+                else:
+                    self.first_hour.pop(key, None)
+                    self.theory_first.pop(key, None)
+
+        resolved, introduced = [], []
+        for scope in dirty:
+            old = self.violations.pop(scope, [])
+            new = self._check(scope)
+            if new:
+                self.violations[scope] = new
+            if old != new:
+                # Counted, since a scope can hold the same violation twice
+                resolved.extend((Counter(old) - Counter(new)).elements())
+                introduced.extend((Counter(new) - Counter(old)).elements())
+        return resolved, introduced
+
+    def _check(self, scope) -> List[Violation]:
+        kind, key, day = scope
+        if kind == "slot":
+            entries = self.schedule.get((key, day))
+            return self.slot_violations(key, day, entries) if entries else []
+        if kind == "instructor":
+            sections = defaultdict(int)
+            for (course, _), hours in self.theory_hours.get((key, day), {}).items():
+                sections[course] += -(-hours // required_block_hours(course))
+            violation = self.daily_limit_violation(key, day, sections) if sections else None
+            return [violation] if violation else []
+        first = self.first_hour.get((key, day))
+        if first is None:
+            return []
+        _, hour, course = first
+        return self.course_day_violations(course, day, hour, self.theory_first, self.lab_theory)
+
+
+def find_violations(schedule, instructors=None, all_courses=None, soft_electives=False) -> List[Violation]:
+    """Every hard-constraint violation of schedule (see ScheduleValidator).
+
+    all_courses is searched for each lab's theory course; by default the
+    scheduled courses are. soft_electives=True accepts overlapping CENG and
+    SENG electives.
+    """
+    return ScheduleValidator(instructors, all_courses, soft_electives).validate(schedule)
+
+
+class CourseDomains:
+    """Live domains of the unplaced courses, used for forward checking.
+
+    Each course's candidate placements (slot ids, room index) are numbered
+    once; the live domain is an int bitmask over those numbers. After every
+    placement only the candidates that touch the consumed slots, the
+    instructor's day (daily limit) or a lab's theory course are re-checked.
+    Pruned domains are pushed on a trail and restored on backtrack.
+    """
+    def __init__(self, state, candidates):
+        self.state = state
+        self.candidates = candidates
+        self.alive = []
+        self.by_slot = []  # course index -> slot id -> candidate bitmask
+        self.by_day = []  # course index -> day id -> candidate bitmask
+        self.trail = []
+        for course_idx, course_candidates in enumerate(candidates):
+            alive = 0
+            by_slot = defaultdict(int)
+            by_day = defaultdict(int)
+            for k, (slot_ids, room_idx) in enumerate(course_candidates):
+                bit = 1 << k
+                for slot_id in slot_ids:
+                    by_slot[slot_id] |= bit
+                by_day[state.slot_day[slot_ids[0]]] |= bit
+                if state.can_place(course_idx, slot_ids, room_idx, require_theory=False):
+                    alive |= bit
+            self.alive.append(alive)
+            self.by_slot.append(by_slot)
+            self.by_day.append(by_day)
+
+    def size(self, course_idx):
+        return bin(self.alive[course_idx]).count("1")
+
+    def contains(self, course_idx, candidate):
+        return self.alive[course_idx] >> candidate & 1
+
+    def prune(self, placed_idx, slot_ids, unplaced):
+        """Remove candidates invalidated by a placement; False on a domain wipe-out."""
+        state = self.state
+        instructor_id = state.course_instructor[placed_idx]
+        day_id = state.slot_day[slot_ids[0]]
+        placed_theory = state.courses[placed_idx].course_type == 'theory'
+        for course_idx in unplaced:
+            by_slot = self.by_slot[course_idx]
+            affected = 0
+            for slot_id in slot_ids:
+                affected |= by_slot.get(slot_id, 0)
+            if placed_theory and state.course_instructor[course_idx] == instructor_id:
+                affected |= self.by_day[course_idx].get(day_id, 0)
+            if state.lab_theory[course_idx] == placed_idx:
+                affected = -1  # every candidate depends on where the theory went
+            affected &= self.alive[course_idx]
+            removed = 0
+            course_candidates = self.candidates[course_idx]
+            while affected:
+                low = affected & -affected
+                affected ^= low
+                candidate_slots, room_idx = course_candidates[low.bit_length() - 1]
+                if not state.can_place(course_idx, candidate_slots, room_idx, require_theory=False):
+                    removed |= low
+            if removed:
+                self.trail.append((course_idx, self.alive[course_idx]))
+                self.alive[course_idx] &= ~removed
+                if not self.alive[course_idx]:
+                    return False
+        return True
+
+    def mark(self):
+        return len(self.trail)
+
+    def restore(self, mark):
+        """Undo every prune() since mark()."""
+        while len(self.trail) > mark:
+            course_idx, alive = self.trail.pop()
+            self.alive[course_idx] = alive
+
+
+class NogoodStore:
+    """Bounded store of learned nogoods with LRU eviction.
+
+    A nogood is a frozenset of placements (course index, start slot id,
+    room index) that has been shown to admit no complete schedule. Each
+    nogood is watched by all of its placements, so checking a new placement
+    only looks at the nogoods that contain it.
+    """
+    def __init__(self, limit, max_size=16):
+        self.limit = limit
+        self.max_size = max_size  # longer nogoods are unlikely to be met again
+        self.nogoods = OrderedDict()  # nogood -> None, least recently used first
+        self.watches = defaultdict(set)  # placement -> nogoods containing it
+
+    def add(self, nogood):
+        if not nogood or len(nogood) > self.max_size:
+            return
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        self.nogoods[nogood] = None
+        for placement in nogood:
+            self.watches[placement].add(nogood)
+        while len(self.nogoods) > self.limit:
+            evicted, _ = self.nogoods.popitem(last=False)
+            for placement in evicted:
+                watching = self.watches[placement]
+                watching.discard(evicted)
+                if not watching:
+                    del self.watches[placement]
+
+    def find_violated(self, placement, assigned):
+        """Return a nogood that placement would complete given the assigned placements."""
+        for nogood in self.watches.get(placement, ()):
+            if all(other == placement or other in assigned for other in nogood):
+                self.nogoods.move_to_end(nogood)
+                return nogood
+        return None
+
+    def __len__(self):
+        return len(self.nogoods)
+
+
+ORDERING_MODES = ("static", "mrv")
+
+# Seconds between two calls of generate_schedule's progress callback
+PROGRESS_INTERVAL = 0.2
+
+
+def partial_schedule(placements, courses, rooms, time_slots, slots):
+    """Schedule of the courses fully placed in placements, the others listed as unplaced.
+
+    placements are ScheduleState placements (course index, room index, slot
+    ids). Blocks without a room (two-phase mode) are matched to rooms; a
+    course one of whose blocks gets none is moved to unplaced.
+    """
+    blocks = [(courses[course_idx], [slots[slot_id] for slot_id in slot_ids])
+              for course_idx, _, slot_ids in placements]
+    placed_rooms = [rooms[room_idx] if room_idx >= 0 else None for _, room_idx, _ in placements]
+    if None in placed_rooms:
+        matched = assign_rooms(blocks, rooms, time_slots)
+        if matched is not None:
+            placed_rooms = matched
+        else:
+            # Keep whatever fits, one block at a time in placement order
+            grid = TimeGrid(time_slots)
+            busy = defaultdict(set)  # room index -> slot ids
+            for i, (course, block_slots) in enumerate(blocks):
+                slot_ids = {grid.lookup(day, hour) for day, hour in block_slots}
+                room_idx = next((r for r, room in enumerate(rooms)
+                                 if is_valid_room_for_course(room, course) and not busy[r] & slot_ids), -1)
+                placed_rooms[i] = rooms[room_idx] if room_idx >= 0 else None
+                if room_idx >= 0:
+                    busy[room_idx] |= slot_ids
+    roomless = {id(course) for (course, _), room in zip(blocks, placed_rooms) if room is None}
+    schedule = defaultdict(list)
+    kept = []
+    for (course, block_slots), room in zip(blocks, placed_rooms):
+        if id(course) in roomless:
+            continue
+        for slot in block_slots:
+            schedule[slot].append((course, room))
+        kept.append((course, room, block_slots))
+    placed_ids = {id(course) for course, _, _ in kept}
+    unplaced = [course for course in courses if id(course) not in placed_ids and course.sections > 0]
+    return Schedule(schedule, placements=kept, unplaced=unplaced)
+
+
+class ScheduleCancelled(RuntimeError):
+    """Raised when generate_schedule is stopped through its cancel_token."""
+
+
+class ConstraintCounter:
+    """Checks, rejections and cumulative seconds of one constraint."""
+    __slots__ = ("checks", "rejections", "seconds")
+
+    def __init__(self):
+        self.checks = 0
+        self.rejections = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return f"{self.rejections}/{self.checks} rejected, {self.seconds:.4f}s"
+
+
+class SearchStats:
+    """Where a generate_schedule run spent its effort; pass one as stats=.
+
+    nodes: search nodes expanded (one per course section placement tried)
+    backtracks: placements undone
+    max_depth: most course sections placed at the same time
+    constraints: constraint name -> ConstraintCounter; the static rules
+        (fixed_time_slot, consecutive_hours, is_exam_block,
+        is_valid_room_for_course) count once per course slot or room, the
+        others once per candidate placement checked, including forward
+        checking, nogood and room-matching outcomes
+    course_seconds: course code -> seconds spent choosing its placements,
+        not counting the search below them
+    elapsed: seconds of the whole run
+    """
+    def __init__(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.constraints = defaultdict(ConstraintCounter)
+        self.course_seconds = defaultdict(float)
+        self.elapsed = 0.0
+        self._courses = []  # course code (None until chosen) per open search node
+        self._clock = 0.0
+
+    def count(self, name, rejected, seconds):
+        counter = self.constraints[name]
+        counter.checks += 1
+        counter.rejections += bool(rejected)
+        counter.seconds += seconds
+
+    def check(self, name, rejects):
+        """Evaluate rejects(), counting it under name; returns its result."""
+        started = time.perf_counter()
+        rejected = rejects()
+        self.count(name, rejected, time.perf_counter() - started)
+        return rejected
+
+    def _charge(self):
+        now = time.perf_counter()
+        if self._courses and self._courses[-1] is not None:
+            self.course_seconds[self._courses[-1]] += now - self._clock
+        self._clock = now
+
+    def enter_node(self, depth):
+        self.nodes += 1
+        self.max_depth = max(self.max_depth, depth)
+        self._charge()
+        self._courses.append(None)
+
+    def choose_course(self, code):
+        self._courses[-1] = code
+
+    def leave_node(self):
+        self._charge()
+        self._courses.pop()
+
+    def as_dict(self):
+        return {
+            "nodes": self.nodes,
+            "backtracks": self.backtracks,
+            "max_depth": self.max_depth,
+            "elapsed": self.elapsed,
+            "constraints": {name: {"checks": c.checks, "rejections": c.rejections, "seconds": c.seconds}
+                            for name, c in self.constraints.items()},
+            "course_seconds": dict(self.course_seconds),
+        }
+
+    def report(self):
+        """Human-readable summary, costliest constraints and courses first."""
+        lines = [f"nodes={self.nodes} backtracks={self.backtracks} max_depth={self.max_depth} "
+                 f"elapsed={self.elapsed:.3f}s"]
+        for name, c in sorted(self.constraints.items(), key=lambda item: -item[1].seconds):
+            lines.append(f"  {name:<30} {c.checks:>10} checks {c.rejections:>10} rejected {c.seconds:9.4f}s")
+        for code, seconds in sorted(self.course_seconds.items(), key=lambda item: -item[1]):
+            lines.append(f"  {code:<30} {seconds:9.4f}s")
+        return "\n".join(lines)
+
+
+class SearchBudgetExhausted(Exception):
+    """Internal: unwinds generate_schedule's search once its node or time budget is spent."""
+
+
+class SearchNode:
+    """Internal: an open node of generate_schedule's search (one course section)."""
+    __slots__ = ("depth", "course_index", "next_candidate", "conflict_set", "rejected",
+                 "placement", "mark", "domain_mark")
+
+    def __init__(self, depth, course_index):
+        self.depth = depth
+        self.course_index = course_index
+        self.next_candidate = 0
+        self.conflict_set = set()
+        self.rejected = []  # explained only if the course turns out to be a dead end
+        self.placement = None  # current placement and the marks to undo it
+        self.mark = None
+        self.domain_mark = None
+
+
 def generate_schedule(courses: List[Course], rooms: List[Room], time_slots: List[Tuple[str, str]], 
-                     instructors: List[Instructor] = None):
+                     instructors: List[Instructor] = None, ordering: str = "static",
+                     forward_checking: bool = False, backjumping: bool = False,
+                     nogood_limit: int = 0, seed: Optional[int] = None,
+                     cancel_token=None, two_phase: bool = False, keep=None,
+                     node_limit: Optional[int] = None, time_limit: Optional[float] = None,
+                     stats: Optional[SearchStats] = None, progress=None):
     """
     Generates a conflict-free schedule using backtracking.
     Returns the schedule if successful, otherwise raises RuntimeError.
+    Every section of a course is placed as its own block; a lab section
+    must follow one of its theory course's sections on the same day.
     
     Priority order:
     1. Common courses (PHYS, MATH, ENG, TURK, HIST) - scheduled first
@@ -327,17 +1754,92 @@ def generate_schedule(courses: List[Course], rooms: List[Room], time_slots: List
     3. Lower year courses before higher year courses
     4. Mandatory courses before electives
     
+    With ordering="mrv" the priority order only breaks ties: the next course
+    is the one with the fewest feasible (slot, room) options left (minimum
+    remaining values), then the one linked to most unplaced courses (degree).
+    Labs are only chosen once their theory course has been placed. The
+    option counts are kept up to date after every placement, as the live
+    domains of forward checking are.
+    
+    With forward_checking=True a live domain of feasible placements is kept
+    for every unplaced course and pruned after each placement; the search
+    backtracks as soon as any domain becomes empty.
+    
+    With backjumping=True every rejected placement records the earlier
+    placements that caused it; when a course runs out of options the search
+    jumps straight back to the most recent of those culprits instead of the
+    previous course (conflict-directed backjumping).
+    
+    With nogood_limit > 0 the placements behind every dead end are learned
+    as a nogood (up to nogood_limit of them, least recently used evicted
+    first) and any branch that recreates one is skipped right away. Since a
+    learned nogood that is still in place dooms every branch below it, the
+    search also unwinds straight to its most recent placement, as with
+    backjumping. An empty nogood proves that no schedule exists and stops
+    the search.
+    
+    With two_phase=True the search only chooses time slots. It keeps, for
+    every slot, how many blocks need each kind of room (any room, a lab of
+    sufficient capacity) so that the rooms free at a slot always suffice;
+    concrete rooms are assigned at the end (assign_rooms). If they cannot
+    be, the search backtracks as from any other dead end, so no schedule is
+    missed. Interchangeable rooms no longer multiply the search.
+    
+    With a seed the search is diversified reproducibly: courses of equal
+    priority are ordered randomly, and so are the rooms and the days tried
+    for each course (hours within a day stay in order). Used to run several
+    differently-behaving searches side by side.
+    
+    With keep (blocks as in Schedule.placements, e.g. from an earlier
+    schedule) the blocks of every course that are all still placeable on
+    their own (same slots, room still there and suitable) are the only
+    option of that course; courses are matched by course_id and rooms by
+    name. Every other course is searched as usual (in two-phase mode the
+    kept blocks keep their rooms and the others are matched around them).
+    Used to repair a schedule without reshuffling unrelated courses.
+    
+    With node_limit and/or time_limit the search stops once it has
+    expanded that many nodes or run that many seconds. It then returns the
+    best partial schedule it came across - the most courses with all their
+    sections placed - with the remaining courses in schedule.unplaced,
+    instead of raising. RuntimeError still means that no schedule exists.
+    
+    With stats (a SearchStats) the run is instrumented: nodes, backtracks,
+    depth, every constraint check with its outcome and time, and the time
+    spent on each course. This slows the search down somewhat.
+    
+    With progress, progress(courses placed, total courses, nodes expanded,
+    best depth) is called from the search every PROGRESS_INTERVAL seconds;
+    a course counts as placed once all its sections are, and the depth is
+    the most sections placed at once so far.
+    
     Args:
         courses: List of Course objects
         rooms: List of Room objects
         time_slots: List of (day, hour) tuples, e.g., [("Monday", "09:00"), ...]
         instructors: Optional list of Instructor objects for constraint checking
+        ordering: "static" (fixed priority order) or "mrv" (dynamic ordering)
+        forward_checking: Prune the domains of unplaced courses after each placement
+        backjumping: Jump back to the most recent culprit on a dead end
+        nogood_limit: Maximum number of learned nogoods kept (0 disables learning)
+        seed: Optional random seed for tie-breaking and room/day order
+        cancel_token: Optional object with is_set() (e.g. threading.Event or
+            multiprocessing.Event); once set, the search raises ScheduleCancelled
+        two_phase: Search time slots only and match rooms afterwards
+        keep: Optional (course, room, [(day, hour), ...]) blocks to keep in place
+        node_limit: Optional maximum number of search nodes
+        time_limit: Optional wall-clock limit in seconds
+        stats: Optional SearchStats to fill in
+        progress: Optional callable receiving progress reports
     
     Returns:
         Dictionary mapping (day, hour) to list of (course, room) tuples
+        (a partial schedule, see Schedule.unplaced, if a budget ran out)
     """
     if not courses or not rooms or not time_slots:
         raise ValueError("Courses, rooms, and time slots must be non-empty lists.")
+    if ordering not in ORDERING_MODES:
+        raise ValueError(f"Unknown ordering mode: {ordering!r} (expected one of {ORDERING_MODES}).")
 
     # Create instructors dictionary for quick lookup
     instructors_dict = {}
@@ -355,92 +1857,333 @@ def generate_schedule(courses: List[Course], rooms: List[Room], time_slots: List
         fixed_priority = 0 if c.fixed_time_slot else 1
         common_priority = 0 if c.is_common_course else 1
         type_priority = 0 if c.course_type == 'theory' else 1
-        return (fixed_priority, common_priority, type_priority, c.year, not c.is_mandatory, c.code)
+        return (fixed_priority, common_priority, type_priority, c.year, not c.is_mandatory,
+                tie_break.get(id(c), 0), c.code)
     
+    tie_break = {}
+    if seed is not None:
+        rng = random.Random(seed)
+        tie_break = {id(c): rng.random() for c in courses}
+        rooms = rng.sample(rooms, len(rooms))
     sorted_courses = sorted(courses, key=course_priority)
     
-    schedule = defaultdict(list)
+    state = ScheduleState(sorted_courses, rooms, time_slots, instructors_dict)
+    state.stats = stats
+    started = time.perf_counter()
+    placed = [course.sections < 1 for course in sorted_courses]  # all sections placed
+    section_picks = [[] for _ in sorted_courses]  # course index -> (candidate, depth) per placed section
+    static_order = [i for i, course in enumerate(sorted_courses) for _ in range(course.sections)]
+    neighbours = build_constraint_graph(sorted_courses) if ordering == "mrv" else None
 
-    def backtrack(course_index):
-        # Base case: all courses are scheduled
-        if course_index == len(sorted_courses):
-            return True
+    feasibility = StaticFeasibility(state)
+    if not all(feasibility.candidates):
+        raise RuntimeError("No valid schedule could be generated with the given constraints.")
+    candidates = feasibility.time_candidates() if two_phase else feasibility.candidates
+    kept_rooms = {}  # (course index, slot ids) of a kept block -> Room, for two-phase matching
+    if keep:
+        kept_blocks = defaultdict(list)  # course_id -> [(room name, [(day, hour), ...])]
+        for course, room, slots in keep:
+            kept_blocks[course.course_id].append((room.name, slots))
+        room_index = {room.name: r for r, room in enumerate(rooms)}
+        for course_index, course in enumerate(sorted_courses):
+            blocks = kept_blocks.get(course.course_id, [])
+            kept = []
+            for room_name, slots in blocks:
+                slot_ids = [state.grid.lookup(day, hour) for day, hour in slots]
+                room_idx = room_index.get(room_name, -1)
+                if room_idx < 0 or None in slot_ids:
+                    break
+                start = min(slot_ids, key=lambda slot_id: state.slot_minute[slot_id])
+                block = feasibility.blocks[course_index][start]
+                if block is None or sorted(block) != sorted(slot_ids) or \
+                        not feasibility.is_feasible(course_index, start, room_idx):
+                    break
+                kept.append((block, -1 if two_phase else room_idx, room_idx))
+            if blocks and len(kept) == course.sections == len(blocks):
+                kept.sort()
+                candidates[course_index] = [(block, room_idx) for block, room_idx, _ in kept]
+                kept_rooms.update(((course_index, block), rooms[room_idx]) for block, _, room_idx in kept)
+    if seed is not None:
+        day_rank = rng.sample(range(state.n_days), state.n_days)
+        for course_candidates in candidates:
+            course_candidates.sort(key=lambda candidate: day_rank[state.slot_day[candidate[0][0]]])
 
-        course = sorted_courses[course_index]
+    # Live domains for forward checking; in mrv mode they also keep the
+    # option counts up to date instead of recounting them at every node
+    domains = None
+    if forward_checking or ordering == "mrv":
+        domains = CourseDomains(state, candidates)
 
-        # For each section of the course
-        for section in range(course.sections):
-            # If course has fixed time slot, only try that slot
-            if course.fixed_time_slot:
-                day, start_hour = course.fixed_time_slot
-                slots_to_try = [(day, start_hour)]
-            else:
-                slots_to_try = time_slots
+    def select_course(depth):
+        """Pick the next course to place: priority order, or MRV with degree tie-break."""
+        if ordering == "static":
+            return static_order[depth]
+        best = None
+        best_key = None
+        for course_index, course in enumerate(sorted_courses):
+            if placed[course_index]:
+                continue
+            theory_index = state.lab_theory[course_index]
+            if course.course_type == 'lab' and theory_index >= 0 and not placed[theory_index]:
+                continue  # not ready until its theory course is placed
+            options = domains.size(course_index)
+            if options == 0:
+                return course_index  # dead end: fail as early as possible
+            degree = sum(1 for other in neighbours[course_index] if not placed[other])
+            key = (options, -degree, course_index)
+            if best_key is None or key < best_key:
+                best, best_key = course_index, key
+        return best
+
+    def explain(course_index, slot_ids, room_idx, require_theory=True):
+        """Depths of the placements that rule out a candidate (all depths if unknown)."""
+        culprits = state.explain_conflict(course_index, slot_ids, room_idx, require_theory)
+        if culprits is None:
+            return set(range(len(state.placements)))
+        return culprits
+
+    def explain_wipeout(depth):
+        """Depths that together emptied some unplaced course's domain."""
+        for course_index, alive in enumerate(domains.alive):
+            if not placed[course_index] and not alive:
+                culprits = set()
+                for slot_ids, room_idx in domains.candidates[course_index]:
+                    culprits |= explain(course_index, slot_ids, room_idx, require_theory=False)
+                culprits.discard(depth)
+                return culprits
+        return set(range(depth))
+
+    nogoods = NogoodStore(nogood_limit) if nogood_limit > 0 else None
+    # Sections take candidates in increasing order, so a dead end met while a
+    # course is partly placed only holds for that order of its sections:
+    # conflict sets with a placement of a multi-section course are not learned
+    multi_section = [course.sections > 1 for course in sorted_courses]
+    track_conflicts = backjumping or nogoods is not None
+    assigned = {}  # placement (course index, start slot id, room index) -> depth
+    proven_infeasible = [False]
+    deadline = time.monotonic() + time_limit if time_limit is not None else None
+    nodes = [0]
+    best_partial = [-1, []]  # most fully placed courses seen, and their placements
+    best_depth = [0]
+    next_report = [time.monotonic()]
+    n_courses = sum(1 for course in sorted_courses if course.sections > 0)
+    placement_rooms = []  # rooms matched to state.placements in two-phase mode
+
+    def open_node(depth):
+        """Open the search node that places the course section at this depth.
+
+        Returns its SearchNode, or directly (True, None) / (False, conflict
+        set) once every section is placed: the outcome of the whole branch.
+        A conflict set holds the depths of the earlier placements responsible
+        for a dead end.
+        """
+        if cancel_token is not None and cancel_token.is_set():
+            raise ScheduleCancelled("Schedule generation was cancelled.")
+        nodes[0] += 1
+        if ((node_limit is not None and nodes[0] > node_limit) or
+                (deadline is not None and time.monotonic() > deadline)):
+            raise SearchBudgetExhausted()
+        if stats is not None:
+            stats.enter_node(depth)
+        if node_limit is not None or deadline is not None:
+            n_placed = sum(1 for course_index in range(len(sorted_courses))
+                           if placed[course_index] and sorted_courses[course_index].sections > 0)
+            if n_placed > best_partial[0]:
+                best_partial[:] = [n_placed, [placement for placement in state.placements if placed[placement[0]]]]
+        if progress is not None:
+            best_depth[0] = max(best_depth[0], depth)
+            now = time.monotonic()
+            if now >= next_report[0]:
+                next_report[0] = now + PROGRESS_INTERVAL
+                n_placed = sum(1 for course_index in range(len(sorted_courses))
+                               if placed[course_index] and sorted_courses[course_index].sections > 0)
+                progress(n_placed, n_courses, nodes[0], best_depth[0])
+
+        # Base case: all course sections are scheduled
+        if depth == len(static_order):
+            outcome = True, None
+            if two_phase:
+                outcome = match_rooms(depth)
+            if stats is not None:
+                stats.leave_node()
+            return outcome
+
+        course_index = select_course(depth)
+        if stats is not None:
+            stats.choose_course(sorted_courses[course_index].code)
+        node = SearchNode(depth, course_index)
+        picks = section_picks[course_index]
+        # Sections are interchangeable, so they take candidates in increasing order
+        if picks:
+            node.next_candidate = picks[-1][0] + 1
+            if track_conflicts:
+                node.conflict_set.add(picks[-1][1])
+        return node
+
+    def match_rooms(depth):
+        """Two-phase mode: give every placed block a room, or fail the leaf."""
+        blocks = [(sorted_courses[course_index], [state.slots[slot_id] for slot_id in slot_ids])
+                  for course_index, _, slot_ids in state.placements]
+        fixed_rooms = None
+        if kept_rooms:
+            fixed_rooms = [kept_rooms.get((course_index, slot_ids))
+                           for course_index, _, slot_ids in state.placements]
+        matching_started = time.perf_counter()
+        matched = assign_rooms(blocks, rooms, time_slots, fixed_rooms)
+        if stats is not None:
+            stats.count("assign_rooms", matched is None, time.perf_counter() - matching_started)
+        if matched is None:
+            return False, set(range(depth))
+        placement_rooms[:] = matched
+        return True, None
+
+    def advance(node):
+        """Place the node's next viable candidate and open the node below it.
+
+        Returns the child's open_node() result ((False, conflict set) if
+        forward checking rejects the placement), or None once the node has
+        no candidates left.
+        """
+        depth = node.depth
+        course_index = node.course_index
+        course = sorted_courses[course_index]
+        picks = section_picks[course_index]
+        course_candidates = candidates[course_index]
+        for candidate in range(node.next_candidate, len(course_candidates)):
+            slot_ids, room_idx = course_candidates[candidate]
+            if ((domains is not None and not domains.contains(course_index, candidate)) or
+                    not state.can_place(course_index, slot_ids, room_idx)):
+                if track_conflicts:
+                    node.rejected.append((slot_ids, room_idx))
+                continue
             
-            # Determine how many consecutive hours this course needs
-            if course.course_type == 'lab':
-                required_hours = course.lab_hours if course.lab_hours > 0 else course.hours
-            else:  # theory
-                required_hours = course.theory_hours if course.theory_hours > 0 else course.hours
+            placement = (course_index, slot_ids[0], room_idx)
+            if nogoods is not None and not multi_section[course_index]:
+                lookup_started = time.perf_counter()
+                nogood = nogoods.find_violated(placement, assigned)
+                if stats is not None:
+                    stats.count("nogood", nogood is not None, time.perf_counter() - lookup_started)
+                if nogood is not None:
+                    # A known dead end: blame the earlier placements of the nogood
+                    node.conflict_set.update(assigned[other] for other in nogood if other != placement)
+                    continue
             
-            # Try all combinations of day, start_hour, and room
-            for day, start_hour in slots_to_try:
-                for room in rooms:
-                    if is_valid_assignment(schedule, course, day, start_hour, room, instructors_dict, sorted_courses):
-                        scheduled_hours = []  # Track all hours for this course
-                        
-                        # If course needs multiple hours, schedule them consecutively
-                        if required_hours > 1:
-                            start_decimal = time_to_decimal(start_hour)
-                            all_hours_scheduled = True
-                            scheduled_hours = [(day, start_hour)]
-                            
-                            for hour_num in range(1, required_hours):
-                                next_hour_decimal = start_decimal + hour_num
-                                next_hour_h = int(next_hour_decimal)
-                                next_hour_m = int((next_hour_decimal % 1) * 60)
-                                next_hour = f"{next_hour_h}:{next_hour_m:02d}"
-                                
-                                # Check if next hour slot exists and is valid
-                                if (day, next_hour) in time_slots:
-                                    # Check if this slot is also valid for the course
-                                    if is_valid_assignment(schedule, course, day, next_hour, room, instructors_dict, sorted_courses):
-                                        scheduled_hours.append((day, next_hour))
-                                    else:
-                                        all_hours_scheduled = False
-                                        break
-                                else:
-                                    all_hours_scheduled = False
-                                    break
-                            
-                            if not all_hours_scheduled:
-                                # If not all hours available, skip this assignment
-                                continue
-                            
-                            # Schedule all consecutive hours
-                            for hour_slot in scheduled_hours:
-                                schedule[hour_slot].append((course, room))
-                        else:
-                            # Single hour course
-                            scheduled_hours = [(day, start_hour)]
-                            schedule[(day, start_hour)].append((course, room))
-                        
-                        # Recur to schedule the next course/section
-                        if backtrack(course_index + 1):
-                            return True
-
-                        # Backtrack: remove the course from the schedule
-                        for hour_slot in scheduled_hours:
-                            if hour_slot in schedule:
-                                schedule[hour_slot] = [
-                                    (c, r) for c, r in schedule[hour_slot]
-                                    if c.course_id != course.course_id
-                                ]
+            node.next_candidate = candidate + 1
+            node.placement = placement
+            node.mark = state.mark()
+            state.place(course_index, slot_ids, room_idx)
+            picks.append((candidate, depth))
+            placed[course_index] = len(picks) == course.sections
+            assigned[placement] = depth
+            
+            # Forward checking: give up on this placement if it empties a domain
+            if domains is not None:
+                node.domain_mark = domains.mark()
+                unplaced = [i for i, done in enumerate(placed) if not done]
+                pruning_started = time.perf_counter()
+                consistent = domains.prune(course_index, slot_ids, unplaced)
+                if stats is not None:
+                    stats.count("forward_checking" if forward_checking else "mrv_domains", not consistent,
+                                time.perf_counter() - pruning_started)
+                if not consistent and forward_checking:
+                    return False, (explain_wipeout(depth) | {depth} if track_conflicts else None)
+                # Otherwise the emptied course is chosen next (no options) and fails there
+            
+            # Go on to schedule the next course/section
+            return open_node(depth + 1)
+        return None
 
-        return False
+    def retract(node, child_conflicts):
+        """Undo the node's current placement after the branch below it failed.
+
+        Returns the conflict set to hand further up if the search should
+        leave this node right away (backjumping, or a proof that no schedule
+        exists), otherwise None to try the node's next candidate.
+        """
+        depth = node.depth
+        course_index = node.course_index
+        # Backtrack: pop exactly what this placement pushed
+        if domains is not None:
+            domains.restore(node.domain_mark)
+        del assigned[node.placement]
+        section_picks[course_index].pop()
+        placed[course_index] = False
+        state.restore(node.mark)
+        if stats is not None:
+            stats.backtracks += 1
+        
+        if proven_infeasible[0]:
+            return set()
+        if track_conflicts:
+            if depth not in child_conflicts:
+                # This placement played no part in the failure: jump further back
+                return child_conflicts
+            node.conflict_set |= child_conflicts
+            node.conflict_set.discard(depth)
+        return None
+
+    def exhaust(node):
+        """Close a node whose candidates have all failed; returns its conflict set."""
+        conflict_set = node.conflict_set
+        if track_conflicts:
+            for slot_ids, room_idx in node.rejected:
+                conflict_set |= explain(node.course_index, slot_ids, room_idx)
+        if nogoods is not None:
+            if not conflict_set:
+                proven_infeasible[0] = True
+            else:
+                by_depth = {d: p for p, d in assigned.items()}
+                nogood = frozenset(by_depth[d] for d in conflict_set)
+                if not any(multi_section[other[0]] for other in nogood):
+                    nogoods.add(nogood)
+        return conflict_set
+
+    def search():
+        """Depth-first search; True once every section is placed.
+
+        The open nodes are kept on an explicit stack (one per placed
+        section) rather than the call stack, so the number of sections is
+        not bounded by Python's recursion limit.
+        """
+        stack = []
+        try:
+            outcome = open_node(0)
+            while True:
+                if isinstance(outcome, SearchNode):
+                    stack.append(outcome)
+                elif not stack or outcome[0]:
+                    return outcome[0]
+                else:
+                    jump = retract(stack[-1], outcome[1])
+                    if jump is not None:
+                        stack.pop()
+                        if stats is not None:
+                            stats.leave_node()
+                        outcome = False, jump
+                        continue
+                node = stack[-1]
+                outcome = advance(node)
+                if outcome is None:
+                    stack.pop()
+                    if stats is not None:
+                        stats.leave_node()
+                    outcome = False, exhaust(node)
+        finally:
+            if stats is not None:
+                for _ in stack:
+                    stats.leave_node()
 
     # Start the backtracking process
-    if backtrack(0):
-        return dict(schedule)
+    if domains is not None and not all(domains.alive):
+        raise RuntimeError("No valid schedule could be generated with the given constraints.")
+    try:
+        solved = search()
+    except SearchBudgetExhausted:
+        return partial_schedule(best_partial[1], sorted_courses, rooms, time_slots, state.slots)
+    finally:
+        if stats is not None:
+            stats.elapsed = time.perf_counter() - started
+    if solved:
+        return state.to_schedule(placement_rooms if two_phase else None)
 
     raise RuntimeError("No valid schedule could be generated with the given constraints.")
@@ -0,0 +1,157 @@
+"""
+BeePlan - On-disk solution cache
+Schedules are stored under a hash of everything that determines them
+(courses, rooms, instructors, time slots and solver options), so
+re-generating an unchanged configuration is a file read. The directory is
+kept to a fixed number of entries, least recently used evicted first, and
+every cached schedule is checked against the hard constraints before it
+is returned.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from scheduler import Course, Instructor, Room, Schedule, is_valid_schedule, schedule_blocks
+
+# Bumped whenever the key or file layout changes; old entries then never match
+CACHE_VERSION = 1
+
+
+def canonical_key(courses: List[Course], rooms: List[Room], instructors: List[Instructor],
+                  time_slots: List[Tuple[str, str]], options: Dict) -> str:
+    """SHA-256 of the scheduling inputs, independent of the order of the lists."""
+    def canonical(items):
+        return sorted(json.dumps(item, sort_keys=True, default=str) for item in items)
+
+    content = {
+        "version": CACHE_VERSION,
+        "courses": canonical(vars(course) for course in courses),
+        "rooms": canonical(vars(room) for room in rooms),
+        "instructors": canonical(vars(inst) for inst in instructors or []),
+        "time_slots": sorted(list(slot) for slot in time_slots),
+        "options": json.dumps(options, sort_keys=True, default=str),
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SolutionCache:
+    """Directory of <key>.json schedules with least-recently-used eviction.
+
+    A file's modification time is its last use. Schedules are stored as
+    blocks of course_id, room name and (day, hour) slots and rebuilt with
+    the caller's objects, so a cache hit looks like a fresh result.
+    """
+    def __init__(self, directory: str, max_entries: int = 128):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str, courses: List[Course], rooms: List[Room],
+            time_slots: List[Tuple[str, str]], instructors: List[Instructor] = None,
+            soft_electives: bool = False) -> Optional[Schedule]:
+        """The cached schedule for key, or None if missing, unreadable or no longer valid.
+
+        soft_electives=True accepts overlapping CENG and SENG electives (see
+        optimizer.py).
+        """
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        schedule = self.rebuild(data, courses, rooms)
+        if schedule is None or not is_valid_schedule(schedule, courses, rooms, time_slots,
+                                                      instructors, soft_electives):
+            self.discard(key)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return schedule
+
+    @staticmethod
+    def rebuild(data, courses, rooms) -> Optional[Schedule]:
+        """Schedule from stored blocks, or None if they do not fit the given courses and rooms."""
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return None
+        courses_by_id = {course.course_id: course for course in courses}
+        rooms_by_name = {room.name: room for room in rooms}
+        schedule = defaultdict(list)
+        placements = []
+        try:
+            for course_id, room_name, slots in data["placements"]:
+                course, room = courses_by_id[course_id], rooms_by_name[room_name]
+                slots = [(day, hour) for day, hour in slots]
+                for slot in slots:
+                    schedule[slot].append((course, room))
+                placements.append((course, room, slots))
+        except (KeyError, TypeError, ValueError):
+            return None
+        return Schedule(schedule, placements=placements)
+
+    def put(self, key: str, schedule: Schedule) -> None:
+        """Store schedule under key (atomically) and evict the least recently used entries."""
+        data = {
+            "version": CACHE_VERSION,
+            "placements": [[course.course_id, room.name, [list(slot) for slot in slots]]
+                           for course, room, slots in schedule_blocks(schedule)],
+        }
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return  # caching is best effort
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path(key))
+        except (OSError, TypeError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def discard(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def clear(self) -> int:
+        """Remove every cached schedule; returns how many were removed."""
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name.endswith((".json", ".tmp")):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                removed += name.endswith(".json")
+        return removed
+
+    def evict(self) -> None:
+        """Remove the least recently used entries beyond max_entries."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    entries.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+                except OSError:
+                    continue
+        entries.sort(reverse=True)
+        for _, name in entries[self.max_entries:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
@@ -0,0 +1,121 @@
+"""
+Tests for the dataset loader: valid files load into objects, and every
+problem in a bad file is reported with its line or field path.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loader import DatasetError, load_dataset, parse_dataset, parse_time_slots
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LoadDatasetTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, text):
+        path = os.path.join(self.directory.name, "data.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_example_data(self):
+        dataset = load_dataset(os.path.join(DATA_DIR, "example_data.json"))
+        self.assertEqual(len(dataset.courses), 33)
+        self.assertEqual(len(dataset.instructors), 6)
+        self.assertEqual(len(dataset.rooms), 7)
+        self.assertEqual(len(dataset.time_slots), 42)
+        self.assertEqual([course.course_id for course in dataset.courses], list(range(33)))
+
+    def test_syntax_error_reports_line_and_column(self):
+        path = self.write('{\n "courses": [\n  {"code": "X",}\n ]\n}')
+        with self.assertRaises(DatasetError) as raised:
+            load_dataset(path)
+        self.assertEqual(raised.exception.source, path)
+        self.assertEqual(len(raised.exception.errors), 1)
+        self.assertTrue(raised.exception.errors[0].startswith("line 3, column 16: "))
+        self.assertTrue(str(raised.exception).startswith(f"{path}: line 3"))
+
+    def test_missing_file(self):
+        path = os.path.join(self.directory.name, "missing.json")
+        with self.assertRaises(DatasetError) as raised:
+            load_dataset(path)
+        self.assertEqual(raised.exception.source, path)
+
+    def test_schema_errors_carry_the_file(self):
+        path = self.write('{"rooms": [{"capacity": 30}]}')
+        with self.assertRaises(DatasetError) as raised:
+            load_dataset(path)
+        self.assertEqual(raised.exception.source, path)
+        self.assertEqual(raised.exception.errors, ["rooms[0].name: missing required field"])
+
+
+class ParseDatasetTest(unittest.TestCase):
+    def errors(self, data):
+        with self.assertRaises(DatasetError) as raised:
+            parse_dataset(data)
+        return raised.exception.errors
+
+    def test_every_problem_is_reported_with_its_path(self):
+        errors = self.errors({
+            "instructors": [{"name": "A"}, {"name": "A", "max_daily_theory_hours": "4"}],
+            "rooms": [{"capacity": 30}, 5],
+            "courses": [{"code": "X", "year": "two", "type": "seminar"},
+                        {"code": "Y", "fixed_time_slot": ["Monday", "9"]}],
+            "time_slots": [["Monday", "09:00"], ["Tuesday"]],
+        })
+        self.assertEqual(errors, [
+            "instructors[1].max_daily_theory_hours: expected an integer, got '4'",
+            "instructors[1].name: duplicate of instructors[0] ('A')",
+            "rooms[0].name: missing required field",
+            "rooms[1]: expected an object, got int",
+            "courses[0].type: expected one of theory, lab, got 'seminar'",
+            "courses[0].year: expected an integer, got 'two'",
+            "courses[1].fixed_time_slot: expected an hour as \"HH:MM\", got '9'",
+            "time_slots[1]: expected [day, \"HH:MM\"], got ['Tuesday']",
+        ])
+
+    def test_section_that_is_not_a_list(self):
+        self.assertEqual(self.errors({"courses": {"code": "X"}}),
+                         ["courses: expected a list, got dict"])
+
+    def test_top_level_that_is_not_an_object(self):
+        self.assertEqual(self.errors([]), ["expected an object at the top level, got list"])
+
+    def test_booleans_are_not_integers(self):
+        self.assertEqual(self.errors({"rooms": [{"name": "R", "capacity": True}]}),
+                         ["rooms[0].capacity: expected an integer, got True"])
+
+    def test_missing_sections_are_none(self):
+        dataset = parse_dataset({"rooms": []})
+        self.assertEqual(dataset.rooms, [])
+        self.assertIsNone(dataset.courses)
+        self.assertIsNone(dataset.instructors)
+        self.assertIsNone(dataset.time_slots)
+
+    def test_defaults_and_conversions(self):
+        dataset = parse_dataset({"courses": [{"code": "SENG101", "type": "Lab", "credits": 3,
+                                              "fixed_time_slot": ["Monday", "09:20"]}]})
+        course = dataset.courses[0]
+        self.assertEqual(course.course_type, "lab")
+        self.assertEqual(course.credits, "3")
+        self.assertEqual(course.year, 1)
+        self.assertEqual(course.sections, 1)
+        self.assertEqual(course.fixed_time_slot, ("Monday", "09:20"))
+
+    def test_time_slots(self):
+        self.assertEqual(parse_time_slots([["Monday", "9:20"]]), [("Monday", "9:20")])
+        with self.assertRaises(DatasetError) as raised:
+            parse_time_slots([["Monday", "25:00"]])
+        self.assertEqual(raised.exception.errors,
+                         ["time_slots[0]: expected an hour as \"HH:MM\", got '25:00'"])
+
+
+if __name__ == "__main__":
+    unittest.main()
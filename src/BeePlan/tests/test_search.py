@@ -0,0 +1,309 @@
+"""
+Tests for the scheduling engines: every search option and every engine
+must agree with the plain search on whether a schedule exists, and every
+schedule they return must be valid.
+"""
+import os
+import random
+import sys
+import tempfile
+import unittest
+from itertools import product
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controller import PORTFOLIO_VARIANTS, ScheduleController
+from local_search import local_search_schedule
+from optimizer import optimize_schedule
+from scheduler import (Course, Instructor, Room, assign_rooms, generate_schedule, is_valid_room_for_course,
+                       is_valid_schedule)
+
+
+def small_instance(seed):
+    """Four courses of one or two sections, tight enough that many instances are infeasible."""
+    rng = random.Random(seed)
+    hours = ["09:00", "10:00", "11:00", "12:00"][:rng.randint(2, 4)]
+    time_slots = [(day, hour) for day in ("Monday", "Tuesday") for hour in hours]
+    instructors = [Instructor(name, max_daily_theory_hours=rng.randint(2, 4)) for name in ("A", "B")]
+    courses = [Course(i, f"C{i}", f"Course {i}", rng.choice("AB"), rng.randint(1, 2), "theory",
+                      rng.randint(1, 2), rng.random() < 0.5, sections=rng.randint(1, 2))
+               for i in range(4)]
+    rooms = [Room(0, "R0", 50), Room(1, "R1", 50)][:rng.randint(1, 2)]
+    return courses, rooms, time_slots, instructors
+
+
+def wide_instance(n_sections, n_rooms=20, last_hour=17):
+    """Single-hour electives with their own instructors: easy, but one search level per section."""
+    days = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")
+    time_slots = [(day, f"{hour:02d}:00") for day in days for hour in range(9, last_hour + 1)]
+    courses = [Course(i, f"C{i:04d}", f"Course {i}", f"I{i}", 1, "theory", i % 2 + 1, False)
+               for i in range(n_sections)]
+    rooms = [Room(r, f"R{r}", 100) for r in range(n_rooms)]
+    return courses, rooms, time_slots
+
+
+def mixed_room_instance(room_order):
+    """Y (two hours) must take the theory room at 10:00 so that the lab room is free for WL at 11:00."""
+    rooms = {"L1": Room(0, "L1", 40, "lab"), "T1": Room(1, "T1", 60, "theory")}
+    time_slots = [("Monday", hour) for hour in ("09:00", "10:00", "11:00")]
+    courses = [Course(0, "W", "W", "C", 1, "theory", 1, fixed_time_slot=("Monday", "09:00")),
+               Course(1, "X", "X", "A", 1, "theory", 2, fixed_time_slot=("Monday", "10:00")),
+               Course(2, "Y", "Y", "B", 2, "theory", 3, fixed_time_slot=("Monday", "10:00")),
+               Course(3, "WL", "WL", "C", 1, "lab", 1, fixed_time_slot=("Monday", "11:00"))]
+    return courses, [rooms[name] for name in room_order], time_slots, None
+
+
+def random_blocks(seed):
+    """Up to six blocks of one to three hours over two days, for up to three rooms of both types."""
+    rng = random.Random(seed)
+    hours = ["09:00", "10:00", "11:00", "12:00"]
+    time_slots = [(day, hour) for day in ("Monday", "Tuesday") for hour in hours]
+    rooms = [Room(r, f"R{r}", rng.choice((30, 60)), rng.choice(("theory", "lab")))
+             for r in range(rng.randint(1, 3))]
+    blocks = []
+    for i in range(rng.randint(2, 6)):
+        length = rng.randint(1, 3)
+        start = rng.randint(0, len(hours) - length)
+        course = Course(i, f"C{i}", f"Course {i}", "A", length, rng.choice(("theory", "theory", "lab")), 1)
+        day = rng.choice(("Monday", "Tuesday"))
+        blocks.append((course, [(day, hour) for hour in hours[start:start + length]]))
+    return blocks, rooms, time_slots
+
+
+def room_clashes(blocks, block_rooms):
+    """True if the rooms do not fit the blocks or one room is used twice at once."""
+    used = [(room.name, slot) for (_, slots), room in zip(blocks, block_rooms) for slot in slots]
+    return (len(used) != len(set(used)) or
+            not all(is_valid_room_for_course(room, course) for (course, _), room in zip(blocks, block_rooms)))
+
+
+def solve(courses, rooms, time_slots, instructors, **options):
+    """The schedule found, or None if the search proves there is none."""
+    try:
+        return generate_schedule(courses, rooms, time_slots, instructors, **options)
+    except RuntimeError:
+        return None
+
+
+class NogoodSearchTest(unittest.TestCase):
+    SEEDS = range(200)  # seed 44: a nogood once pruned the only schedule
+
+    def check_agrees(self, **options):
+        for seed in self.SEEDS:
+            courses, rooms, time_slots, instructors = small_instance(seed)
+            expected = solve(courses, rooms, time_slots, instructors) is not None
+            schedule = solve(courses, rooms, time_slots, instructors, **options)
+            with self.subTest(seed=seed):
+                self.assertEqual(schedule is not None, expected)
+                if schedule is not None:
+                    self.assertTrue(is_valid_schedule(schedule, courses, rooms, time_slots, instructors))
+
+    def test_nogoods_agree_with_plain_search(self):
+        self.check_agrees(nogood_limit=1000)
+
+    def test_nogoods_with_backjumping_agree_with_plain_search(self):
+        self.check_agrees(nogood_limit=1000, backjumping=True)
+
+    def test_nogoods_with_static_ordering_agree_with_plain_search(self):
+        self.check_agrees(nogood_limit=1000, ordering="static", two_phase=False)
+
+
+class DeepSearchTest(unittest.TestCase):
+    def test_search_depth_is_not_bounded_by_the_recursion_limit(self):
+        # 600 sections: past the recursion limit once a level took two frames
+        courses, rooms, time_slots = wide_instance(600)
+        for options in ({}, {"ordering": "mrv", "forward_checking": True, "two_phase": True},
+                        {"backjumping": True, "nogood_limit": 100},
+                        {"ordering": "mrv"}):  # took minutes when mrv recounted every node's options
+            with self.subTest(**options):
+                schedule = generate_schedule(courses, rooms, time_slots, **options)
+                self.assertEqual(len(schedule.placements), 600)
+                self.assertTrue(is_valid_schedule(schedule, courses, rooms, time_slots))
+
+    def test_thousands_of_sections(self):
+        # No late hours and no gaps: the optimizer proves its first schedule optimal
+        courses, rooms, time_slots = wide_instance(1200, n_rooms=40, last_hour=15)
+        for solver in (generate_schedule, optimize_schedule):
+            with self.subTest(solver=solver.__name__):
+                schedule = solver(courses, rooms, time_slots, time_limit=None)
+                self.assertEqual(len(schedule.placements), 1200)
+                self.assertTrue(is_valid_schedule(schedule, courses, rooms, time_slots))
+
+
+class RoomAssignmentTest(unittest.TestCase):
+    SEEDS = range(500)
+
+    def test_agrees_with_trying_every_assignment(self):
+        for seed in self.SEEDS:
+            blocks, rooms, time_slots = random_blocks(seed)
+            expected = any(not room_clashes(blocks, block_rooms)
+                           for block_rooms in product(rooms, repeat=len(blocks)))
+            with self.subTest(seed=seed):
+                block_rooms = assign_rooms(blocks, rooms, time_slots)
+                self.assertEqual(block_rooms is not None, expected)
+                if block_rooms is not None:
+                    self.assertFalse(room_clashes(blocks, block_rooms))
+
+    def test_two_phase_looks_ahead_past_a_start_time(self):
+        for room_order in (["L1", "T1"], ["T1", "L1"]):
+            courses, rooms, time_slots, instructors = mixed_room_instance(room_order)
+            with self.subTest(rooms=room_order):
+                schedule = solve(courses, rooms, time_slots, instructors, two_phase=True)
+                self.assertIsNotNone(schedule)
+                self.assertTrue(is_valid_schedule(schedule, courses, rooms, time_slots))
+
+    def test_local_search_looks_ahead_past_a_start_time(self):
+        # Every time is fixed, so the search only succeeds if the rooms can be matched
+        for room_order in (["L1", "T1"], ["T1", "L1"]):
+            courses, rooms, time_slots, _ = mixed_room_instance(room_order)
+            with self.subTest(rooms=room_order):
+                schedule = local_search_schedule(courses, rooms, time_slots, max_iterations=200, seed=0)
+                self.assertTrue(is_valid_schedule(schedule, courses, rooms, time_slots))
+
+
+class PortfolioTest(unittest.TestCase):
+    SEEDS = range(50)
+    VARIANT_SEEDS = list(range(50)) + [1559]  # 1559: a nogood variant once reported no schedule
+
+    def test_every_variant_agrees_with_plain_search(self):
+        # The first variant to fail ends the race, so each must be a complete search
+        instances = [(seed, small_instance(seed)) for seed in self.VARIANT_SEEDS]
+        instances += [(room_order, mixed_room_instance(room_order)) for room_order in (["L1", "T1"], ["T1", "L1"])]
+        for options in PORTFOLIO_VARIANTS:
+            for name, (courses, rooms, time_slots, instructors) in instances:
+                expected = solve(courses, rooms, time_slots, instructors) is not None
+                with self.subTest(instance=name, **options):
+                    schedule = solve(courses, rooms, time_slots, instructors, **options)
+                    self.assertEqual(schedule is not None, expected)
+
+    def test_portfolio_agrees_with_plain_search(self):
+        for seed in self.SEEDS:
+            courses, rooms, time_slots, instructors = small_instance(seed)
+            expected = solve(courses, rooms, time_slots, instructors) is not None
+            controller = ScheduleController()
+            controller.set_instructors(instructors)
+            controller.set_rooms(rooms)
+            controller.set_time_slots(time_slots)
+            with self.subTest(seed=seed):
+                try:
+                    schedule = controller.generate_schedule_portfolio(courses, workers=2)
+                except RuntimeError:
+                    schedule = None
+                self.assertEqual(schedule is not None, expected)
+                if schedule is not None:
+                    self.assertTrue(is_valid_schedule(schedule, courses, rooms, time_slots, instructors))
+
+    def test_budget_returns_partial_schedule(self):
+        courses, rooms, time_slots, instructors = DecomposedTest().independent_groups()
+        controller = ScheduleController()
+        controller.set_instructors(instructors)
+        controller.set_rooms(rooms)
+        controller.set_time_slots(time_slots)
+        schedule = controller.generate_schedule_portfolio(courses, workers=2, node_limit=2)
+        placed = {course.code for course, _, _ in schedule.placements}
+        self.assertTrue(schedule.unplaced)
+        self.assertEqual(placed | {course.code for course in schedule.unplaced},
+                         {course.code for course in courses})
+
+
+class DecomposedTest(unittest.TestCase):
+    def independent_groups(self):
+        """Two groups of courses that share no instructor or year."""
+        courses = [Course(i, f"C{i}", f"Course {i}", "AB"[i % 2], 2, "theory", 1 + i % 2, True)
+                   for i in range(6)]
+        rooms = [Room(0, "R0", 50), Room(1, "R1", 50)]
+        time_slots = [(day, hour) for day in ("Monday", "Tuesday")
+                      for hour in ("09:00", "10:00", "11:00", "12:00")]
+        return courses, rooms, time_slots, [Instructor("A"), Instructor("B")]
+
+    def test_budget_leaves_courses_unplaced_and_uncached(self):
+        courses, rooms, time_slots, instructors = self.independent_groups()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            controller = ScheduleController(cache_dir=cache_dir)
+            controller.set_instructors(instructors)
+            controller.set_rooms(rooms)
+            controller.set_time_slots(time_slots)
+            schedule = controller.generate_schedule_decomposed(courses, workers=2, node_limit=2)
+            placed = {course.code for course, _, _ in schedule.placements}
+            self.assertTrue(schedule.unplaced)
+            self.assertEqual(placed | {course.code for course in schedule.unplaced},
+                             {course.code for course in courses})
+            self.assertEqual(os.listdir(cache_dir), [])
+
+            schedule = controller.generate_schedule_decomposed(courses, workers=2)
+            self.assertEqual(schedule.unplaced, [])
+            self.assertTrue(is_valid_schedule(schedule, courses, rooms, time_slots, instructors))
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            self.assertEqual(controller.cache.clear(), 1)
+            self.assertEqual(os.listdir(cache_dir), [])
+
+    def test_whole_problem_fallback_takes_worker_options(self):
+        courses, rooms, time_slots, instructors = self.independent_groups()
+        one_group = [Course(i, f"C{i}", f"Course {i}", "A", 1, "theory", 1, False) for i in range(3)]
+        # One component, then two components that both want the only room first
+        for courses, rooms in ((one_group, rooms), (courses[:4], rooms[:1])):
+            controller = controller_for(rooms, time_slots, instructors)
+            with self.subTest(courses=len(courses), rooms=len(rooms)):
+                schedule = controller.generate_schedule_decomposed(courses, workers=2, seed=3)
+                self.assertTrue(is_valid_schedule(schedule, courses, rooms, time_slots, instructors))
+
+
+def controller_for(rooms, time_slots, instructors):
+    controller = ScheduleController()
+    controller.set_instructors(instructors)
+    controller.set_rooms(rooms)
+    controller.set_time_slots(time_slots)
+    return controller
+
+
+class SolverModesTest(unittest.TestCase):
+    SEEDS = range(60)
+
+    # Complete engines: each must find a schedule exactly when one exists
+    MODES = {
+        "static": lambda controller, courses: controller.generate_schedule(courses),
+        "mrv": lambda controller, courses: controller.generate_schedule(
+            courses, ordering="mrv", forward_checking=True),
+        "backjumping": lambda controller, courses: controller.generate_schedule(
+            courses, ordering="mrv", backjumping=True),
+        "two-phase": lambda controller, courses: controller.generate_schedule(
+            courses, ordering="mrv", forward_checking=True, two_phase=True),
+        "nogoods": lambda controller, courses: controller.generate_schedule(
+            courses, ordering="mrv", forward_checking=True, backjumping=True, nogood_limit=1000,
+            two_phase=True),
+        "decomposed": lambda controller, courses: controller.generate_schedule_decomposed(
+            courses, workers=2, ordering="mrv", forward_checking=True),
+        "optimize": lambda controller, courses: controller.generate_schedule_optimized(
+            courses, time_limit=None),
+    }
+
+    def test_complete_engines_agree(self):
+        for seed in self.SEEDS:
+            courses, rooms, time_slots, instructors = small_instance(seed)
+            expected = solve(courses, rooms, time_slots, instructors) is not None
+            for mode, run in self.MODES.items():
+                with self.subTest(seed=seed, mode=mode):
+                    try:
+                        schedule = run(controller_for(rooms, time_slots, instructors), courses)
+                    except RuntimeError:
+                        schedule = None
+                    self.assertEqual(schedule is not None, expected)
+                    if schedule is not None:
+                        self.assertEqual(getattr(schedule, "unplaced", []), [])
+                        self.assertTrue(is_valid_schedule(schedule, courses, rooms, time_slots, instructors))
+
+    def test_local_search_returns_only_valid_schedules(self):
+        # Local search cannot prove that no schedule exists, so it is only checked one way
+        for seed in self.SEEDS:
+            courses, rooms, time_slots, instructors = small_instance(seed)
+            controller = controller_for(rooms, time_slots, instructors)
+            with self.subTest(seed=seed):
+                try:
+                    schedule = controller.generate_schedule_local_search(courses, max_iterations=2000, seed=seed)
+                except RuntimeError:
+                    continue
+                self.assertTrue(is_valid_schedule(schedule, courses, rooms, time_slots, instructors))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Tests for the schedule checks: the standalone rule functions,
+is_valid_schedule and the violation validators must agree.
+"""
+import os
+import random
+import sys
+import unittest
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loader import load_dataset
+from scheduler import (Course, Instructor, Room, DAILY_THEORY_LIMIT, EXAM_BLOCK, IncrementalValidator,
+                       exceeds_daily_theory_limit, find_violations, generate_schedule, is_valid_schedule,
+                       required_block_hours, schedule_blocks)
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class DailyTheoryLimitTest(unittest.TestCase):
+    def setUp(self):
+        # Two 2-hour sections of one course on Monday: 4 hours, the instructor's limit
+        self.course = Course(0, "C0", "Course 0", "A", 2, "theory", 1, True, sections=2)
+        self.extra = Course(1, "C1", "Course 1", "A", 1, "theory", 2, True)
+        self.rooms = [Room(0, "R0", 50), Room(1, "R1", 50)]
+        self.instructors = [Instructor("A", max_daily_theory_hours=4)]
+        self.time_slots = [("Monday", hour) for hour in ("09:00", "10:00", "11:00", "12:00", "13:00")]
+        self.schedule = {
+            ("Monday", "09:00"): [(self.course, self.rooms[0])],
+            ("Monday", "10:00"): [(self.course, self.rooms[0])],
+            ("Monday", "11:00"): [(self.course, self.rooms[1])],
+            ("Monday", "12:00"): [(self.course, self.rooms[1])],
+        }
+
+    def test_sections_count_once_each(self):
+        self.assertTrue(exceeds_daily_theory_limit(self.schedule, self.extra, self.instructors[0], "Monday"))
+
+    def test_checks_agree_on_sections_over_the_limit(self):
+        schedule = dict(self.schedule)
+        schedule[("Monday", "13:00")] = [(self.extra, self.rooms[0])]
+        courses = [self.course, self.extra]
+        self.assertFalse(is_valid_schedule(schedule, courses, self.rooms, self.time_slots, self.instructors))
+        kinds = [violation.kind for violation in find_violations(schedule, self.instructors, courses)]
+        self.assertEqual(kinds, [DAILY_THEORY_LIMIT])
+
+    def test_checks_agree_on_sections_within_the_limit(self):
+        self.assertFalse(exceeds_daily_theory_limit({}, self.course, self.instructors[0], "Monday"))
+        self.assertTrue(is_valid_schedule(self.schedule, [self.course], self.rooms, self.time_slots,
+                                          self.instructors))
+        self.assertEqual(find_violations(self.schedule, self.instructors, [self.course]), [])
+
+
+class IncrementalValidatorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        dataset = load_dataset(os.path.join(DATA_DIR, "example_data.json"))
+        cls.courses, cls.rooms = dataset.courses, dataset.rooms
+        cls.time_slots, cls.instructors = dataset.time_slots, dataset.instructors
+        cls.solved = generate_schedule(cls.courses[:10], cls.rooms, cls.time_slots, cls.instructors,
+                                       ordering="mrv", forward_checking=True, two_phase=True)
+
+    def random_edit(self, rng, schedule):
+        """(removed, added) blocks: move, change room or course, remove or add a block."""
+        blocks = schedule_blocks(schedule)
+        kind = rng.random()
+        if blocks and kind < 0.8:
+            course, room, slots = rng.choice(blocks)
+            if kind < 0.3:
+                day = rng.choice(self.time_slots)[0]
+                return [(course, room, slots)], [(course, room, [(day, hour) for _, hour in slots])]
+            if kind < 0.5:
+                return [(course, room, slots)], [(course, rng.choice(self.rooms), slots)]
+            if kind < 0.7:
+                return [(course, room, slots)], [(rng.choice(self.courses), room, slots)]
+            return [(course, room, slots)], []
+        course = rng.choice(self.courses)
+        start = rng.randrange(len(self.time_slots))
+        return [], [(course, rng.choice(self.rooms), self.time_slots[start:start + required_block_hours(course)])]
+
+    def test_edits_agree_with_full_validation(self):
+        rng = random.Random(5)
+        schedule = {slot: list(entries) for slot, entries in self.solved.items()}
+        validator = IncrementalValidator(schedule, self.courses, self.instructors)
+        running = Counter(validator.all_violations())
+        self.assertEqual(running, Counter(find_violations(schedule, self.instructors, self.courses)))
+        for step in range(400):
+            resolved, introduced = validator.edit(*self.random_edit(rng, schedule))
+            running = running - Counter(resolved) + Counter(introduced)
+            expected = Counter(find_violations(schedule, self.instructors, self.courses))
+            with self.subTest(step=step):
+                self.assertEqual(Counter(validator.all_violations()), expected)
+                self.assertEqual(running, expected)
+
+    def test_undoing_an_edit_resolves_what_it_introduced(self):
+        schedule = {slot: list(entries) for slot, entries in self.solved.items()}
+        validator = IncrementalValidator(schedule, self.courses, self.instructors)
+        self.assertEqual(validator.all_violations(), [])
+        course, room, slots = next(block for block in schedule_blocks(schedule)
+                                   if required_block_hours(block[0]) == 1)
+        moved = [(course, room, [("Friday", "13:20")])]
+        resolved, introduced = validator.edit([(course, room, slots)], moved)
+        self.assertEqual(resolved, [])
+        self.assertIn(EXAM_BLOCK, [violation.kind for violation in introduced])
+        before = Counter(validator.all_violations())
+        resolved, introduced = validator.edit(moved, [(course, room, slots)])
+        self.assertEqual(Counter(resolved), before)
+        self.assertEqual(introduced, [])
+        self.assertEqual(validator.all_violations(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()